@@ -1,15 +1,22 @@
 # app/api/routes/attendance.py
-from fastapi import APIRouter, Depends, HTTPException
+import os
+import json
+import base64
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete, text, tuple_
+from sqlalchemy.orm import raiseload
 from typing import List, Optional
 from datetime import datetime, time, date
 
 from app.db.database import get_db
 from app.models.attendance import Attendance
+from app.models.attendance_summary import AttendanceDailySummary
 from app.schemas.attendance import AttendanceCreate, AttendanceManualCreate, AttendanceOut
 from app.core.dependencies import get_current_user
 from app.services.attendance_service import create_attendance_manual
+from app.services import attendance_summary, attendance_export
 
 router = APIRouter(prefix="/attendance", tags=["Attendance"])
 
@@ -42,52 +49,189 @@ async def create_attendance(
     return AttendanceOut.model_validate(new_att)
 
 
+# =========================
+#   Keyset pagination
+# =========================
+# sahifa hajmi chegarasi (katta hajmlar uchun: /attendance/export)
+ATTENDANCE_PAGE_MAX = int(os.getenv("ATTENDANCE_PAGE_MAX", "1000"))
+
+
+def _encode_cursor(row: Attendance) -> str:
+    """Oxirgi satrning (date, id) juftligi — mijoz uchun shaffof bo'lmagan token."""
+    raw = json.dumps([row.date.isoformat(), row.id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(token: str) -> tuple:
+    try:
+        d, i = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return date.fromisoformat(d), int(i)
+    except Exception:
+        raise HTTPException(status_code=400, detail="cursor noto'g'ri")
+
+
+async def _estimate_rows(db: AsyncSession, stmt) -> Optional[int]:
+    """Planner statistikasi bo'yicha taxminiy satrlar soni (COUNT(*) siz)."""
+    sql = stmt.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+    plan = (await db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    try:
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+async def _keyset_page(
+    db: AsyncSession,
+    response: Response,
+    conditions: list,
+    *,
+    limit: int,
+    cursor: Optional[str],
+    estimate: bool,
+    offset: int = 0,
+) -> List[AttendanceOut]:
+    """
+    (date DESC, id DESC) bo'yicha sahifa: keyingi sahifa WHERE (date, id) < cursor —
+    chuqur sahifalar ham 1-sahifadek arzon. Keyingi token X-Next-Cursor headerida,
+    estimate=true bo'lsa taxminiy jami X-Total-Estimate da.
+    """
+    limit = max(1, min(limit, ATTENDANCE_PAGE_MAX))
+    base = select(Attendance.id).where(*conditions) if conditions else select(Attendance.id)
+    if estimate:
+        total = await _estimate_rows(db, base)
+        if total is not None:
+            response.headers["X-Total-Estimate"] = str(total)
+
+    stmt = select(Attendance).where(*conditions)
+    if cursor:
+        c_date, c_id = _decode_cursor(cursor)
+        stmt = stmt.where(tuple_(Attendance.date, Attendance.id) < tuple_(c_date, c_id))
+    elif offset:
+        # eski mijozlar uchun (deprecated): chuqur sahifalarda sekin
+        stmt = stmt.offset(offset)
+    stmt = (
+        stmt
+        # ro'yxatga student/teacher kerak emas (lazy="joined" JOIN'larini o'chiramiz)
+        .options(raiseload(Attendance.student), raiseload(Attendance.teacher))
+        .order_by(Attendance.date.desc(), Attendance.id.desc())
+        .limit(limit + 1)
+    )
+    rows = (await db.execute(stmt)).scalars().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1])
+    return [AttendanceOut.model_validate(r) for r in rows]
+
+
+def _school_conditions(
+    school_id: int,
+    date_from: Optional[date],
+    date_to: Optional[date],
+    student_id: Optional[int],
+) -> list:
+    """/by-school va /export uchun umumiy filtrlar."""
+    conditions = [Attendance.school_id == school_id]
+    if date_from:
+        conditions.append(Attendance.date >= date_from)
+    if date_to:
+        conditions.append(Attendance.date <= date_to)
+    if student_id:
+        conditions.append(Attendance.student_id == student_id)
+    return conditions
+
+
 @router.get("/by-school", response_model=List[AttendanceOut], response_model_by_alias=True)
 async def get_attendance_by_school(
     school_id: int,
+    response: Response,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
     student_id: Optional[int] = None,
     limit: int = 200,
-    offset: int = 0,
+    cursor: Optional[str] = None,
+    estimate: bool = False,
+    offset: int = Query(0, deprecated=True),
     db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user),
 ):
     """
     Attendance ro'yxatini maktab bo'yicha filtrlab olish.
     Qo'shimcha filtrlash: date_from, date_to, student_id.
-    Pagination: limit/offset.
+    Pagination: limit (<= ATTENDANCE_PAGE_MAX) + cursor (oldingi javobning X-Next-Cursor headeri);
+    header yo'q — oxirgi sahifa. estimate=true — X-Total-Estimate (taxminiy jami).
     """
-    conditions = [Attendance.school_id == school_id]
-    if date_from:
-        conditions.append(Attendance.date >= date_from)
-    if date_to:
-        conditions.append(Attendance.date <= date_to)
-    if student_id:
-        conditions.append(Attendance.student_id == student_id)
-
-    stmt = (
-        select(Attendance)
-        .where(*conditions)  # bir nechta shart -> AND
-        .order_by(Attendance.date.desc(), Attendance.id.desc())
-        .offset(offset)
-        .limit(limit)
+    conditions = _school_conditions(school_id, date_from, date_to, student_id)
+    return await _keyset_page(
+        db, response, conditions, limit=limit, cursor=cursor, estimate=estimate, offset=offset,
     )
-    result = await db.execute(stmt)
-    rows = result.scalars().all()
-    return [AttendanceOut.model_validate(r) for r in rows]
 
 @router.get("/", response_model=List[AttendanceOut], response_model_by_alias=True)
 async def get_all_attendance(
+    response: Response,
+    limit: int = 200,
+    cursor: Optional[str] = None,
+    estimate: bool = False,
     db: AsyncSession = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
-    result = await db.execute(
-        select(Attendance).order_by(Attendance.date.desc(), Attendance.id.desc())
+    """Barcha davomat (sahifalab): /by-school bilan bir xil cursor/X-Next-Cursor."""
+    return await _keyset_page(db, response, [], limit=limit, cursor=cursor, estimate=estimate)
+
+
+@router.get("/summary")
+async def get_attendance_summary(
+    school_id: int,
+    date_from: date,
+    date_to: date,
+    user_type: str = Query("student", pattern="^(student|teacher)$"),
+    class_id: Optional[int] = None,
+    group_by: str = Query("day", pattern="^(day|class)$"),
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user),
+):
+    """
+    Dashboard uchun kunlik yig'indi (attendance_daily_summary): kelgan, kechikkan,
+    ketgan, kelmagan, kutilgan. group_by=day — kunlar bo'yicha, class — sinflar bo'yicha.
+    """
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to date_from dan oldin bo'lishi mumkin emas")
+    if (date_to - date_from).days > 366:
+        raise HTTPException(status_code=400, detail="Oraliq 1 yildan oshmasin")
+    return await attendance_summary.month_view(
+        db, school_id=school_id, date_from=date_from, date_to=date_to,
+        user_type=user_type, class_id=class_id, group_by=group_by,
+    )
+
+
+@router.get("/export")
+async def export_attendance(
+    school_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    student_id: Optional[int] = None,
+    format: str = Query("csv", pattern="^(csv|xlsx)$"),
+    current_user=Depends(get_current_user),
+):
+    """
+    Davomatni fayl sifatida yuklab olish (/by-school filtrlari bilan, limit'siz).
+    Satrlar server-side cursor orqali bo'laklab o'qiladi va darhol javobga yoziladi.
+    """
+    if date_from and date_to and date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to date_from dan oldin bo'lishi mumkin emas")
+    conditions = _school_conditions(school_id, date_from, date_to, student_id)
+    name = f"attendance_{school_id}_{date_from or 'all'}_{date_to or 'all'}.{format}"
+    if format == "xlsx":
+        body = attendance_export.xlsx_stream(conditions)
+        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        body = attendance_export.csv_stream(conditions)
+        media_type = "text/csv; charset=utf-8"
+    return StreamingResponse(
+        body, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}"'},
     )
-    rows = result.scalars().all()
-    # ⚠️ ORM -> Schema (alias/validatorlar ishga tushadi)
-    return [AttendanceOut.model_validate(r) for r in rows]
 
 
 @router.get("/{attendance_id}", response_model=AttendanceOut, response_model_by_alias=True)
@@ -127,6 +271,7 @@ async def delete_attendance_by_id(
     attendance = result.scalar_one_or_none()
     if not attendance:
         raise HTTPException(status_code=404, detail="Attendance not found")
+    await attendance_summary.forget_row(db, attendance)
     await db.delete(attendance)
     await db.commit()
     return {"detail": "Attendance deleted"}
@@ -142,5 +287,6 @@ async def delete_all_attendance(
         raise HTTPException(status_code=404, detail="No attendance records found")
     for attendance in attendances:
         await db.delete(attendance)
+    await db.execute(delete(AttendanceDailySummary))
     await db.commit()
     return {"detail": "All attendance records deleted"}
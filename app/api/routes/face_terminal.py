@@ -1,5 +1,6 @@
 # app/api/routes/face_terminal.py
 from fastapi import APIRouter, Request, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.db.database import get_db
@@ -7,9 +8,8 @@ from app.models.student import Student
 from app.models.attendance import Attendance
 from datetime import datetime, date as _date, time
 from typing import Optional, List, Dict, Tuple
-import os, json, asyncio, time as _time
+import os, json
 import logging
-import httpx
 
 # Ixtiyoriy: o‘qituvchi modeli bo‘lsa
 try:
@@ -21,6 +21,24 @@ except Exception:
 from app.services.sms.sms_templates import (
     sms_keldi, sms_kechikib_keldi, sms_ketdi, sms_kelmagan
 )
+from app.services.face_identity import face_identity
+from app.services.face_dedupe import face_dedupe
+from app.crud import attendance as crud_attendance
+from app.services.face_ingest import IngestQueue, INGEST_RETRY_AFTER_SEC
+from app.services import face_prefilter, face_multipart
+from app.services.face_snapshots import snapshot_store
+from app.services.face_journal import face_journal, JOURNAL_LOG_EVENTS
+from app.services.face_names import face_names
+from app.services.face_telemetry import face_telemetry
+from app.services.sms.gateway import sms_gateway
+from app.services.sms.token import eskiz_tokens
+from app.services.sms.eskiz import send_sms_batch, SMS_BATCH_SIZE
+from app.services.sms.receipts import callback_url, delivery_receipts
+from app.services.sms import coalesce as sms_coalesce
+from app.services.sms.phone import msisdn
+from app.services.sms.outbox import SmsDispatcher
+from app.services.sms import jobs as sms_jobs
+from app.db.session import async_session
 
 logger = logging.getLogger("uvicorn.error")
 router = APIRouter(prefix="/face-terminal", tags=["Face Terminal"])
@@ -36,156 +54,113 @@ ESKIZ_FROM = settings.ESKIZ_FROM
 
 
 # Blok: daqiqalarda (default 240 = 4 soat). Test uchun 1 qo‘yib ko‘rishingiz mumkin.
-BLOCK_MINUTES = int(os.getenv("FACE_BLOCK_MINUTES", "1"))
+BLOCK_MINUTES = crud_attendance.BLOCK_MINUTES   # FACE_BLOCK_MINUTES
 
-# Kechikish chegarasi (HH:MM). default 08:00
-_LATE_HHMM = os.getenv("FACE_LATE_HHMM", "8:00")
-try:
-    _hh, _mm = map(int, _LATE_HHMM.split(":"))
-    LATE_THRESHOLD = time(_hh, _mm)
-except Exception:
-    LATE_THRESHOLD = time(8, 0)
+# Kechikish chegarasi: crud_attendance.LATE_CUTOFF (LATE_CUTOFF / FACE_LATE_HHMM), default 08:00
 
-# dedupe (bir necha soniyada ketma-ket urish bo‘lsa skip)
-_DEDUPE: Dict[Tuple[str, str], float] = {}
-_DEDUPE_WINDOW_SEC = float(os.getenv("FACE_DEDUPE_SEC", "4"))
+# dedupe (bir necha soniyada ketma-ket urish bo‘lsa skip) — FACE_DEDUPE_SEC / FACE_DEDUPE_BACKEND
+# app/services/face_dedupe.py ga qarang
 
 # =========================
 #   Eskiz SMS (inline)
 # =========================
-_TOKEN: Optional[str] = None
-_TOKEN_EXPIRES_AT: float = 0.0
-_TOKEN_LOCK = asyncio.Lock()
-
-def _normalize_uz_phone(raw: Optional[str]) -> Optional[str]:
-    if not raw:
-        return None
-    digits = "".join(ch for ch in raw if ch.isdigit())
-    if not digits:
-        return None
-    if digits.startswith("998") and len(digits) == 12:
-        return digits
-    if len(digits) == 9:              # 90xxxxxxx
-        return "998" + digits
-    if len(digits) == 10 and digits.startswith("0"):  # 0 90xxxxxxx
-        return "998" + digits[1:]
-    if len(digits) == 11 and digits.startswith("8"):  # 8 90xxxxxxx
-        return "9" + digits
-    if digits.startswith("998") and len(digits) > 12:
-        return digits[:12]
-    return None
-
-async def _eskiz_login(client: "httpx.AsyncClient") -> str:
-    """POST /api/auth/login → {data: {token}}"""
-    global _TOKEN, _TOKEN_EXPIRES_AT
-    r = await client.post(
-        f"{ESKIZ_BASE_URL}/api/auth/login",
-        data={"email": ESKIZ_EMAIL, "password": ESKIZ_PASSWORD},
-        timeout=20
-    )
-    try:
-        r.raise_for_status()
-    except httpx.HTTPStatusError as e:
-        raise RuntimeError(f"Eskiz login failed {r.status_code}: {r.text}") from e
-    data = r.json()
-    token = data.get("data", {}).get("token") or data.get("token")
-    if not token:
-        raise RuntimeError(f"Eskiz token not found in response: {data}")
-    _TOKEN = token
-    _TOKEN_EXPIRES_AT = _time.time() + 55*60  # ~55 min
-    return _TOKEN
-
-async def _eskiz_get_token(client: "httpx.AsyncClient") -> str:
-    async with _TOKEN_LOCK:
-        if _TOKEN and _time.time() < (_TOKEN_EXPIRES_AT - 60):
-            return _TOKEN
-        return await _eskiz_login(client)
+# Token: yagona single-flight menejer (app/services/sms/token.py)
 
 async def _send_sms(phone_998: str, message: str):
     if not phone_998 or not message:
         raise RuntimeError("phone/message empty")
 
-    async with httpx.AsyncClient() as client:
-        token = await _eskiz_get_token(client)
-        headers = {"Authorization": f"Bearer {token}"}
+    # yagona pool'langan klient (app/services/sms/gateway.py)
+    client = sms_gateway.client
+    token = await eskiz_tokens.get()
+    headers = {"Authorization": f"Bearer {token}"}
 
-        # callback_url YO'Q
-        payload = {
-            "mobile_phone": phone_998,
-            "message": message,
-        }
-        if ESKIZ_FROM:
-            payload["from"] = ESKIZ_FROM
+    payload = {
+        "mobile_phone": phone_998,
+        "message": message,
+    }
+    if ESKIZ_FROM:
+        payload["from"] = ESKIZ_FROM
+    # delivery report: POST /sms/eskiz/callback (ESKIZ_CALLBACK_URL sozlangan bo'lsa)
+    cb = callback_url()
+    if cb:
+        payload["callback_url"] = cb
+
+    # 1) JSON
+    r = await client.post(
+        "/api/message/sms/send",
+        json=payload, headers=headers
+    )
 
-        # 1) JSON
+    # 401 → relogin
+    if r.status_code == 401:
+        token = await eskiz_tokens.invalidate(token)
+        headers["Authorization"] = f"Bearer {token}"
         r = await client.post(
-            f"{ESKIZ_BASE_URL}/api/message/sms/send",
-            json=payload, headers=headers, timeout=25
+            "/api/message/sms/send",
+            json=payload, headers=headers
         )
 
-        # 401 → relogin
-        if r.status_code == 401:
-            token = await _eskiz_login(client)
-            headers["Authorization"] = f"Bearer {token}"
-            r = await client.post(
-                f"{ESKIZ_BASE_URL}/api/message/sms/send",
-                json=payload, headers=headers, timeout=25
-            )
+    # JSON rad etilsa → form-data fallback
+    if r.status_code in (400, 415, 422):
+        r = await client.post(
+            "/api/message/sms/send",
+            data=payload, headers=headers
+        )
 
-        # JSON rad etilsa → form-data fallback
-        if r.status_code in (400, 415, 422):
-            r = await client.post(
-                f"{ESKIZ_BASE_URL}/api/message/sms/send",
-                data=payload, headers=headers, timeout=25
+    if r.is_error:
+        # FROM sabab xato bo'lsa, FROMsiz qayta urinib ko'ramiz
+        if "from" in payload and r.status_code in (400, 422):
+            payload2 = {k: v for k, v in payload.items() if k != "from"}
+            r2 = await client.post(
+                "/api/message/sms/send",
+                json=payload2, headers=headers
             )
+            if r2.is_error:
+                raise RuntimeError(f"Eskiz send failed {r.status_code}: {r.text}; retry {r2.status_code}: {r2.text}")
+            return r2.json()
+        raise RuntimeError(f"Eskiz send failed {r.status_code}: {r.text}")
 
-        if r.is_error:
-            # FROM sabab xato bo'lsa, FROMsiz qayta urinib ko'ramiz
-            if "from" in payload and r.status_code in (400, 422):
-                payload2 = {"mobile_phone": phone_998, "message": message}
-                r2 = await client.post(
-                    f"{ESKIZ_BASE_URL}/api/message/sms/send",
-                    json=payload2, headers=headers, timeout=25
-                )
-                if r2.is_error:
-                    raise RuntimeError(f"Eskiz send failed {r.status_code}: {r.text}; retry {r2.status_code}: {r2.text}")
-                return r2.json()
-            raise RuntimeError(f"Eskiz send failed {r.status_code}: {r.text}")
-
-        return r.json()
-
-
-
-async def _send_bulk_sms(phones: List[str], message: str) -> dict:
-    results = {}
-    for raw in phones:
-        normalized = _normalize_uz_phone(raw)
-        if not normalized:
-            results[raw] = {"ok": False, "error": "invalid_phone"}
-            continue
-        try:
-            resp = await _send_sms(normalized, message)
-            results[normalized] = {"ok": True, "resp": resp}
-        except Exception as e:
-            results[normalized or raw] = {"ok": False, "error": str(e)}
-    return results
+    return r.json()
 
 
-async def _notify_parents(student, text: str):
-    # Avval ota raqami, agar yo‘q bo‘lsa – ona raqami
-    phone = None
-    father = getattr(student, "parent_father_phone", None)
-    mother = getattr(student, "parent_mother_phone", None)
 
-    if father:
-        phone = father
-    elif mother:
-        phone = mother
-    else:
-        return  # hech kimga yuborilmaydi
+def _sms_event(student, kind: str, t: time, late_minutes: int = 0) -> dict:
+    """Birlashtirilgan SMS uchun hodisa (outbox payload)."""
+    return {
+        "kind": kind,
+        "student_id": student.id,
+        "name": f"{(student.first_name or '').strip()} {(student.last_name or '').strip()}".strip(),
+        "time": t.strftime("%H:%M"),
+        "late": late_minutes,
+    }
+
+
+async def _notify_parents(db: AsyncSession, student, text: str, event: dict) -> bool:
+    """
+    Ota-onaga SMS'ni outbox'ga qo'yadi (commit — chaqiruvchining tranzaksiyasida).
+    Yuborishni sms_dispatcher bajaradi; worker qayta ishga tushsa ham xabar yo'qolmaydi.
+    SMS_NOTIFY_MODE=coalesce|digest bo'lsa hodisalar bitta SMS'ga yig'iladi.
+    """
+    # Avval ota raqami, agar yo‘q bo‘lsa – ona raqami (yozishda normallashtirilgan E.164)
+    normalized = msisdn(getattr(student, "parent_father_e164", None) or getattr(student, "parent_mother_e164", None))
+    if not normalized:
+        return False  # hech kimga yuborilmaydi
+    await sms_coalesce.notify(
+        db, phone=normalized, message=text, event=event, kind=event["kind"],
+        student_id=student.id, school_id=getattr(student, "school_id", None),
+    )
+    return True
 
-    # _send_bulk_sms ro‘yxat kutadi
-    asyncio.create_task(_send_bulk_sms([phone], text))
+
+# Outbox dispatcher: main.py startup'da ishga tushadi (app/services/sms/outbox.py)
+sms_dispatcher = SmsDispatcher(
+    _send_sms, send_batch=send_sms_batch, batch_size=SMS_BATCH_SIZE, render=sms_coalesce.render, breaker=sms_gateway.breaker,
+)
+# Kelmaganlar bildirishi fon ishlari (app/services/sms/jobs.py)
+no_show_jobs = sms_jobs.NoShowJobs(
+    sms_kelmagan, on_enqueued=sms_dispatcher.wake,
+)
 
 # =========================
 #   Yordamchi
@@ -202,9 +177,6 @@ def _parse_dt(dt_str: str) -> datetime:
         except Exception as e:
             raise ValueError(f"dateTime parse error: {dt_str}") from e
 
-def _cols(model):
-    return set(getattr(model.__table__, "columns").keys())
-
 def _iso_hms(t: Optional[time]) -> Optional[str]:
     return t.strftime("%H:%M:%S") if t else None
 
@@ -230,7 +202,7 @@ def _attendance_out(a: Attendance) -> dict:
 # ---- Tezkor diagnostika (Postman’ga mos test) ----
 # @router.post("/sms-test")
 # async def sms_test(number: str, message: str = "Eskiz API ping", _db: AsyncSession = Depends(get_db)):
-#     norm = _normalize_uz_phone(number)
+#     norm = eskiz_phone(number)  # app/services/sms/phone.py
 #     if not norm:
 #         raise HTTPException(status_code=400, detail="invalid phone; use 9989XXXXXXXX")
 #     try:
@@ -240,66 +212,73 @@ def _attendance_out(a: Attendance) -> dict:
 #         return {"ok": False, "to": norm, "error": str(e), "base_url": ESKIZ_BASE_URL, "from": ESKIZ_FROM}
 
 # =========================
-#   Face ID log endpoint
+#   Hodisa (event) yadrosi
 # =========================
-@router.post("/log")
-async def receive_log(request: Request, db: AsyncSession = Depends(get_db)):
-    # --- Body parsing ---
-    ctype = (request.headers.get("content-type") or "").lower()
-    if ctype.startswith("application/json"):
-        raw = await request.body()
-        data = json.loads(raw.decode("utf-8", errors="ignore") or "{}")
-    elif ctype.startswith("multipart/form-data"):
-        form = await request.form()
-        part = form.get("AccessControllerEvent") or form.get("json") or form.get("payload")
-        if part is None:
-            raise HTTPException(status_code=400, detail="AccessControllerEvent not found in form-data")
-        text = (await part.read()).decode("utf-8", errors="ignore") if hasattr(part, "read") else str(part)
-        data = json.loads(text or "{}")
-    else:
-        raise HTTPException(status_code=400, detail=f"Unsupported Content-Type: {ctype}")
-
-    # --- Event object ---
+def _normalize_event(data: dict) -> Tuple[Optional[dict], Optional[dict]]:
+    """
+    Terminal JSON'idan kerakli maydonlarni ajratadi.
+    return: (ev, None) — qayta ishlanadigan hodisa; (None, skip_javob) — o'tkazib yuboriladi.
+    dateTime yo'q bo'lsa 400.
+    """
     event = data.get("AccessControllerEvent") or data
 
     # Faqat AccessControllerEvent + subEventType=75
     evt_type = event.get("eventType") or data.get("eventType")
     if evt_type and str(evt_type) not in ("AccessControllerEvent",):
-        return {"ok": True, "skip": True, "reason": f"eventType={evt_type}"}
+        return None, {"ok": True, "skip": True, "reason": f"eventType={evt_type}"}
 
     sub_event_type = int(event.get("subEventType", -1))
     if sub_event_type != 75:
-        return {"ok": True, "skip": True, "reason": f"subEventType={sub_event_type}"}
+        return None, {"ok": True, "skip": True, "reason": f"subEventType={sub_event_type}"}
 
     # --- Maydonlar ---
     name_val = (event.get("name") or "").strip()
-    emp_str = (event.get("employeeNoString") or event.get("employeeNo") or "").strip()
+    emp_str = str(event.get("employeeNoString") or event.get("employeeNo") or "").strip()
     if not emp_str:
-        return {"ok": True, "skip": True, "reason": "employeeNoString missing"}
-
-    # dedupe window
-    key = (name_val, emp_str)
-    now_ts = datetime.utcnow().timestamp()
-    last_ts = _DEDUPE.get(key, 0.0)
-    if now_ts - last_ts < _DEDUPE_WINDOW_SEC:
-        return {"ok": True, "skip": True, "reason": "dedupe_window"}
-    _DEDUPE[key] = now_ts
+        return None, {"ok": True, "skip": True, "reason": "employeeNoString missing"}
 
     # Sana/vaqt
     dt_str = event.get("dateTime") or data.get("dateTime")
     if not dt_str:
         raise HTTPException(status_code=400, detail="dateTime yo‘q")
-    dt = _parse_dt(dt_str)
+
+    return {
+        "name": name_val,
+        "emp": emp_str,
+        "dt": _parse_dt(dt_str),
+        "user_type": event.get("userType"),
+    }, None
+
+
+async def _process_event(
+    db: AsyncSession, ev: dict, *, commit: bool = True, notify: bool = True,
+) -> Tuple[dict, list]:
+    """
+    Bitta normallashtirilgan hodisani attendance'ga qo'llaydi.
+    notify=True bo'lsa SMS'lar attendance bilan bitta tranzaksiyada outbox'ga yoziladi.
+    return: (javob, [(student, sms matni, hodisa), ...]).
+    Foydalanuvchi topilmasa HTTPException(404).
+    """
+    result, notes = await _apply_event(db, ev)
+    if notify:
+        for student, msg, event in notes:
+            await _notify_parents(db, student, msg, event)
+    if commit:
+        await db.commit()
+        if notify and notes:
+            sms_dispatcher.wake()
+    return result, notes
+
+
+async def _apply_event(db: AsyncSession, ev: dict) -> Tuple[dict, list]:
+    """_process_event yadrosi: attendance yozuvi (commit'siz) va SMS matnlari."""
+    emp_str = ev["emp"]
+    dt = ev["dt"]
     d = dt.date()
     t = dt.time()
 
     # Kechikish (daqiqada)
-    if t > LATE_THRESHOLD:
-        late_minutes = int((datetime.combine(d, t) - datetime.combine(d, LATE_THRESHOLD)).total_seconds() // 60)
-        arrival_status = "late"
-    else:
-        late_minutes = 0
-        arrival_status = "on_time"
+    arrival_status, late_minutes = crud_attendance._calc_late(t)
 
     # Kim?
     try:
@@ -307,150 +286,368 @@ async def receive_log(request: Request, db: AsyncSession = Depends(get_db)):
     except ValueError:
         face_id = None
 
-    student = None
-    teacher = None
-    if face_id is not None:
-        student = await db.scalar(select(Student).where(Student.face_terminal_id == face_id))
-        if (student is None) and (Teacher is not None):
-            teacher = await db.scalar(select(Teacher).where(Teacher.face_terminal_id == face_id))
+    # Keshdan (FacePerson); odatda DB so'rovisiz
+    person = await face_identity.resolve(db, face_id) if face_id is not None else None
+    student = person if person and person.role == "student" else None
+    teacher = person if person and person.role == "teacher" else None
 
     if not student and not teacher:
         raise HTTPException(status_code=404, detail=f"Foydalanuvchi topilmadi (employeeNoString={emp_str})")
 
-    # Dinamik ustunlar
-    att_cols = _cols(Attendance) if Attendance else set()
-    has_departure = "departure_time" in att_cols
-    has_status = "status" in att_cols         # umumiy holat (mas: 'left')
-    has_is_present = "is_present" in att_cols
-    has_school = "school_id" in att_cols
-    has_user_type = "user_type" in att_cols
-    has_arrival_status = "arrival_status" in att_cols  # on_time/late
-
     # =============================
     #         O'QUVCHI oqimi
     # =============================
+    # KELDI / arrival tuzatish / blok / KETDI — bitta INSERT … ON CONFLICT da
     if student:
-        existing = await db.scalar(
-            select(Attendance).where(
-                Attendance.student_id == student.id,
-                Attendance.date == d
-            )
+        outcome, att, diff_min = await crud_attendance.record_terminal_pass(
+            db,
+            student_id=student.id,
+            day=d,
+            tm=t,
+            late_minutes=late_minutes,
+            arrival_status=arrival_status,
+            school_id=student.school_id,
+            user_type=ev.get("user_type") or "student",
+            block_minutes=BLOCK_MINUTES,
+            commit=False,
         )
+        face_telemetry.applied(ev.get("device"), outcome)
 
-        # 1-urinish: KELDI
-        if existing is None:
-            payload = {
-                "student_id": student.id,
-                "date": d,
-                "arrival_time": t,
-                "late_minutes": late_minutes,
-            }
-            if has_is_present:     payload["is_present"] = True
-            if has_user_type:      payload["user_type"] = event.get("userType") or "student"
-            if has_arrival_status: payload["arrival_status"] = arrival_status
-            if has_school:         payload["school_id"] = getattr(student, "school_id", None)
-
-            att = Attendance(**payload)
-            db.add(att)
-            await db.commit()
-            await db.refresh(att)
-
-            # SMS: keldi vs kechikib keldi
-            try:
-                msg = sms_kechikib_keldi(student, late_minutes) if late_minutes > 0 else sms_keldi(student, t.strftime("%H:%M"))
-                await _notify_parents(student, msg)
-            except Exception:
-                pass
-
-            return {"ok": True, "attendance": _attendance_out(att), "role": "student"}
-
-        # 2-urinish: blok yoki KETDI
-        if has_departure and getattr(existing, "departure_time", None) is None:
-            # agar arrival yo'q bo'lsa, uni to'g'rilab qo'yamiz
-            if existing.arrival_time is None:
-                existing.arrival_time = t
-                existing.late_minutes = late_minutes
-                if has_arrival_status:
-                    existing.arrival_status = arrival_status
-                await db.commit()
-                await db.refresh(existing)
-                return {"ok": True, "attendance": _attendance_out(existing), "role": "student"}
-
-            diff_min = int((datetime.combine(d, t) - datetime.combine(d, existing.arrival_time)).total_seconds() // 60)
-            if diff_min < BLOCK_MINUTES:
-                return {"ok": True, "skip": True, "reason": "block_minutes", "diff_min": diff_min, "need_min": BLOCK_MINUTES}
-
-            # Ketish
-            existing.departure_time = t
-            if has_status:
-                existing.status = "left"
-            await db.commit()
-            await db.refresh(existing)
+        # 1-urinish: KELDI — SMS: keldi vs kechikib keldi
+        if outcome == "arrived":
+            msg = sms_kechikib_keldi(student, late_minutes) if late_minutes > 0 else sms_keldi(student, t.strftime("%H:%M"))
+            event = _sms_event(student, "late" if late_minutes > 0 else "arrived", t, late_minutes)
+            return {"ok": True, "attendance": _attendance_out(att), "role": "student"}, [(student, msg, event)]
+
+        # arrival yo'q bo'lgan satr to'g'rilandi
+        if outcome == "arrival_fixed":
+            return {"ok": True, "attendance": _attendance_out(att), "role": "student"}, []
 
-            # SMS: ketdi
-            try:
-                msg = sms_ketdi(student, t.strftime("%H:%M"))
-                await _notify_parents(student, msg)
-            except Exception:
-                pass
+        if outcome == "block_minutes":
+            return {"ok": True, "skip": True, "reason": "block_minutes", "diff_min": diff_min, "need_min": BLOCK_MINUTES}, []
 
-            return {"ok": True, "attendance": _attendance_out(existing), "role": "student"}
+        # 2-urinish: KETDI — SMS: ketdi
+        if outcome == "departed":
+            msg = sms_ketdi(student, t.strftime("%H:%M"))
+            return {"ok": True, "attendance": _attendance_out(att), "role": "student"}, [(student, msg, _sms_event(student, "departed", t))]
 
-        return {"ok": True, "skip": True, "reason": "no_departure_or_already_set"}
+        return {"ok": True, "skip": True, "reason": "no_departure_or_already_set"}, []
 
     # =============================
     #         O'QITUVCHI oqimi
     # =============================
-    if teacher:
-        existing = await db.scalar(
-            select(Attendance).where(
-                Attendance.teacher_id == teacher.id,
-                Attendance.date == d
+    outcome, att, diff_min = await crud_attendance.record_terminal_pass(
+        db,
+        teacher_id=teacher.id,
+        day=d,
+        tm=t,
+        late_minutes=late_minutes,
+        arrival_status=arrival_status,
+        school_id=teacher.school_id,
+        user_type=ev.get("user_type") or "teacher",
+        block_minutes=BLOCK_MINUTES,
+        commit=False,
+    )
+    face_telemetry.applied(ev.get("device"), outcome)
+    if att is not None:
+        return {"ok": True, "attendance": _attendance_out(att), "role": "teacher"}, []
+    if outcome == "block_minutes":
+        return {"ok": True, "skip": True, "reason": "block_minutes_teacher", "diff_min": diff_min, "need_min": BLOCK_MINUTES}, []
+    return {"ok": True, "skip": True, "reason": "no_departure_or_already_set_teacher"}, []
+
+
+async def _apply_batch(events: list) -> None:
+    """Navbatdan kelgan hodisalar: bitta tranzaksiya (attendance + SMS outbox); xato bo'lsa bittalab qayta."""
+    async with async_session() as db:
+        try:
+            for ev in events:
+                try:
+                    await _process_event(db, ev, commit=False)
+                except HTTPException:
+                    # noma'lum foydalanuvchi
+                    face_telemetry.applied(ev.get("device"), "unknown_user")
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.warning("face ingest batch (%s ta) rollback, bittalab yoziladi: %s", len(events), e)
+            for ev in events:
+                try:
+                    await _process_event(db, ev)
+                except HTTPException:
+                    pass
+                except Exception:
+                    await db.rollback()
+                    logger.exception("face ingest: hodisa yozilmadi emp=%s", ev.get("emp"))
+    sms_dispatcher.wake()
+
+
+# Writer main.py startup'da ishga tushadi; FACE_INGEST_MODE=sync bo'lsa ishlatilmaydi
+INGEST_MODE = os.getenv("FACE_INGEST_MODE", "queue").lower()
+ingest_queue = IngestQueue(_apply_batch, name="face_log")
+
+# =========================
+#   Face ID log endpoint
+# =========================
+LOG_JSON_FIELDS = ("AccessControllerEvent", "json", "payload")
+
+async def _log_event_bytes(chunks, ctype: str) -> bytes:
+    """/log body'si (bayt oqimi) -> hodisa JSON baytlari. Jurnal replay ham shu yo'ldan o'tadi."""
+    kind = ctype.lower()
+    if kind.startswith("application/json"):
+        return b"".join([chunk async for chunk in chunks])
+    if kind.startswith("multipart/form-data"):
+        # faqat JSON qismi oqim bilan olinadi (rasm buferlanmaydi)
+        raw = await face_multipart.extract_event_bytes(chunks, ctype, fields=LOG_JSON_FIELDS)
+        if raw is None:
+            raise HTTPException(status_code=400, detail="AccessControllerEvent not found in form-data")
+        return raw
+    raise HTTPException(status_code=400, detail=f"Unsupported Content-Type: {kind}")
+
+
+def _decode_event(raw: bytes) -> Tuple[Optional[dict], Optional[dict]]:
+    """Xom JSON baytlari -> (ev, None) yoki (None, skip javobi)."""
+    # Tezkor filtr: heartbeat / subEventType != 75 — JSON qurmasdan
+    reason = face_prefilter.prefilter(raw)
+    if reason is not None:
+        return None, {"ok": True, "skip": True, "reason": reason}
+
+    data = json.loads(raw.decode("utf-8", errors="ignore") or "{}")
+
+    ev, skip = _normalize_event(data)
+    if skip is not None:
+        face_prefilter.record_parsed_skip(skip["reason"])
+    return ev, skip
+
+
+@router.post("/log")
+async def receive_log(request: Request, db: AsyncSession = Depends(get_db)):
+    device = face_telemetry.device_key(request)
+    return await face_telemetry.observe(device, _receive_log(request, db, device))
+
+
+async def _receive_log(request: Request, db: AsyncSession, device: str):
+    raw = await _log_event_bytes(request.stream(), request.headers.get("content-type") or "")
+
+    if JOURNAL_LOG_EVENTS:
+        face_journal.append(
+            raw,
+            content_type="application/json",
+            ip=request.client.host if request.client else None,
+            user_agent=request.headers.get("user-agent"),
+        )
+
+    ev, skip = _decode_event(raw)
+    if skip is not None:
+        return skip
+    ev["device"] = device
+
+    # dedupe window (barcha workerlar uchun umumiy)
+    if await face_dedupe.seen(f"{ev['name']}|{ev['emp']}", db):
+        return {"ok": True, "skip": True, "reason": "dedupe_window"}
+
+    # Navbat rejimi: terminal DB ni kutmaydi
+    if INGEST_MODE == "queue" and ingest_queue.running:
+        if not ingest_queue.offer(ev):
+            raise HTTPException(
+                status_code=503,
+                detail="Ingest navbati to'la, keyinroq qayta yuboring",
+                headers={"Retry-After": str(INGEST_RETRY_AFTER_SEC)},
             )
+        return {"ok": True, "queued": True}
+
+    result, _ = await _process_event(db, ev)
+    return result
+
+# =========================
+#   Offline replay (bulk)
+# =========================
+BULK_MAX_EVENTS = int(os.getenv("FACE_BULK_MAX_EVENTS", "5000"))
+# body hajmi chegarasi (oqim paytida tekshiriladi)
+BULK_MAX_BYTES = int(os.getenv("FACE_BULK_MAX_BYTES", str(16 * 1024 * 1024)))
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"So'rov hajmi {BULK_MAX_BYTES} baytdan oshmasin")
+
+async def _read_bulk_items(request: Request) -> List:
+    """JSON massiv yoki NDJSON (har qatorda bitta hodisa). Buzuq qator -> None."""
+    ctype = (request.headers.get("content-type") or "").lower()
+    try:
+        declared = int(request.headers.get("content-length") or 0)
+    except ValueError:
+        declared = 0
+    if declared > BULK_MAX_BYTES:
+        raise _too_large()
+
+    buf = bytearray()
+    size = 0
+    items: List = []
+    is_array = None
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > BULK_MAX_BYTES:
+            raise _too_large()
+        buf += chunk
+        if is_array is None and buf.strip():
+            is_array = buf.lstrip().startswith(b"[") and "ndjson" not in ctype
+        if is_array is False:
+            # NDJSON: tugagan qatorlarni darhol parse qilamiz
+            end = buf.rfind(b"\n")
+            if end >= 0:
+                for line in bytes(buf[:end]).split(b"\n"):
+                    if line.strip():
+                        items.append(_loads_or_none(line))
+                del buf[:end + 1]
+        if len(items) > BULK_MAX_EVENTS:
+            raise HTTPException(status_code=413, detail=f"Ko'pi bilan {BULK_MAX_EVENTS} ta hodisa")
+
+    if is_array:
+        try:
+            items = json.loads(buf.decode("utf-8", errors="ignore"))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="JSON massiv noto'g'ri")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="JSON massiv kutilgan")
+    elif buf.strip():
+        items.append(_loads_or_none(bytes(buf)))
+
+    if len(items) > BULK_MAX_EVENTS:
+        raise HTTPException(status_code=413, detail=f"Ko'pi bilan {BULK_MAX_EVENTS} ta hodisa")
+    return items
+
+def _loads_or_none(raw: bytes):
+    try:
+        return json.loads(raw.decode("utf-8", errors="ignore"))
+    except ValueError:
+        return None
+
+
+@router.post("/log/bulk")
+async def receive_log_bulk(request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Tarmoqsiz qolgan terminal yig'ilgan AccessControllerEvent'larni qayta yuboradi.
+    Hodisalar (kishi, kun) bo'yicha xotirada yig'iladi: eng erta — kelish, eng kechi — ketish.
+    Eski hodisalar bo'lgani uchun ota-onalarga SMS yuborilmaydi.
+    """
+    items = await _read_bulk_items(request)
+
+    results: List[dict] = [None] * len(items)
+    parsed: List[Tuple[int, dict]] = []
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[i] = {"index": i, "outcome": "invalid_json"}
+            continue
+        try:
+            ev, skip = _normalize_event(item)
+        except (HTTPException, ValueError, TypeError, AttributeError) as e:
+            # noto'g'ri tuzilgan bitta hodisa butun replay'ni 500 bilan yiqitmasin
+            results[i] = {"index": i, "outcome": "invalid", "detail": getattr(e, "detail", str(e))}
+            continue
+        if skip is not None:
+            results[i] = {"index": i, "outcome": "skip", "reason": skip["reason"]}
+            continue
+        parsed.append((i, ev))
+
+    # Barcha employeeNoString — bitta IN (...) so'rovi (keshda bo'lmaganlari)
+    face_ids = {}
+    for i, ev in parsed:
+        try:
+            face_ids[i] = int(ev["emp"])
+        except ValueError:
+            face_ids[i] = None
+    people = await face_identity.resolve_many(db, [f for f in face_ids.values() if f is not None])
+
+    # (rol, id, kun) bo'yicha yig'ish
+    groups: Dict[tuple, dict] = {}
+    members: Dict[tuple, List[Tuple[int, time]]] = {}
+    for i, ev in parsed:
+        person = people.get(face_ids[i]) if face_ids[i] is not None else None
+        if person is None:
+            results[i] = {"index": i, "outcome": "not_found", "employeeNoString": ev["emp"]}
+            continue
+        d, t = ev["dt"].date(), ev["dt"].time()
+        key = (person.role, person.id, d)
+        g = groups.setdefault(key, {"school_id": person.school_id, "user_type": ev.get("user_type") or person.role, "times": []})
+        g["times"].append(t)
+        members.setdefault(key, []).append((i, t))
+
+    applied = {}
+    if groups:
+        applied = await crud_attendance.bulk_record_terminal_passes(
+            db, groups, block_minutes=BLOCK_MINUTES,
         )
-        if existing is None:
-            payload = {
-                "teacher_id": teacher.id,
-                "date": d,
-                "arrival_time": t,
-                "late_minutes": late_minutes,
-            }
-            if has_is_present:     payload["is_present"] = True
-            if has_user_type:      payload["user_type"] = event.get("userType") or "teacher"
-            if has_arrival_status: payload["arrival_status"] = arrival_status
-            if has_school:         payload["school_id"] = getattr(teacher, "school_id", None)
-
-            att = Attendance(**payload)
-            db.add(att)
-            await db.commit()
-            await db.refresh(att)
-            return {"ok": True, "attendance": _attendance_out(att), "role": "teacher"}
-        else:
-            if has_departure and getattr(existing, "departure_time", None) is None:
-                base = existing.arrival_time or t
-                diff_min = int((datetime.combine(d, t) - datetime.combine(d, base)).total_seconds() // 60)
-                if diff_min < BLOCK_MINUTES:
-                    return {"ok": True, "skip": True, "reason": "block_minutes_teacher", "diff_min": diff_min, "need_min": BLOCK_MINUTES}
-                existing.departure_time = t
-                if has_status:
-                    existing.status = "left"
-                await db.commit()
-                await db.refresh(existing)
-                return {"ok": True, "attendance": _attendance_out(existing), "role": "teacher"}
-            return {"ok": True, "skip": True, "reason": "no_departure_or_already_set_teacher"}
-
-    return {"ok": True, "skip": True, "reason": "unhandled"}
+        await db.commit()
+
+    for key, evs in members.items():
+        res = applied[key]
+        arrival_marked = departure_marked = False
+        for i, t in evs:
+            base = {"index": i, "role": key[0], "person_id": key[1], "date": str(key[2])}
+            if res["new_arrival"] and not arrival_marked and t == res["arrival_time"]:
+                arrival_marked = True
+                results[i] = {**base, "outcome": "arrival", "time": _iso_hms(t)}
+            elif res["new_departure"] and not departure_marked and t == res["departure_time"]:
+                departure_marked = True
+                results[i] = {**base, "outcome": "departure", "time": _iso_hms(t)}
+            else:
+                results[i] = {**base, "outcome": "folded", "time": _iso_hms(t)}
+
+    counts: Dict[str, int] = {}
+    for r in results:
+        counts[r["outcome"]] = counts.get(r["outcome"], 0) + 1
+    return {"ok": True, "count": len(items), "groups": len(groups), "counts": counts, "results": results}
+
+# =========================
+#   Diagnostika
+# =========================
+@router.get("/stats")
+async def ingest_stats():
+    """Kesh va dedupe hisoblagichlari (shu worker bo'yicha)."""
+    return {
+        "identity": face_identity.stats(),
+        "dedupe": face_dedupe.stats(),
+        "ingest": {"mode": INGEST_MODE, **ingest_queue.stats()},
+        "skips": face_prefilter.stats(),
+        "snapshots": snapshot_store.stats(),
+        "journal": face_journal.stats(),
+        "names": face_names.stats(),
+        "outbox": sms_dispatcher.stats(),
+        "jobs": no_show_jobs.stats(),
+        "eskiz_token": eskiz_tokens.stats(),
+        "eskiz_http": sms_gateway.stats(),
+        "receipts": delivery_receipts.stats(),
+    }
+
+@router.get("/metrics")
+async def device_metrics(
+    db: AsyncSession = Depends(get_db),
+    format: str = Query("json", description="json | prometheus"),
+):
+    """Qurilmalar bo'yicha latency/DB vaqti gistogrammalari va natijalar hisobi (shu worker)."""
+    if format == "prometheus":
+        return PlainTextResponse(face_telemetry.prometheus(), media_type="text/plain; version=0.0.4")
+    return {"pid": os.getpid(), "devices": await face_telemetry.snapshot(db)}
+
+
+@router.get("/metrics/live")
+async def device_metrics_live():
+    """Qurilmalar hozirgi tezlik (hodisa/s) bo'yicha saralangan."""
+    return {"pid": os.getpid(), "devices": face_telemetry.live()}
 
 # =======================================
 #   Kelmadi (no-show) batch bildirishi
 # =======================================
-@router.post("/notify-no-show")
+@router.post("/notify-no-show", status_code=202)
 async def notify_no_show(
     db: AsyncSession = Depends(get_db),
     the_date: Optional[str] = Query(None, description="YYYY-MM-DD; default: today"),
     only_active: bool = Query(True),
     dry_run: bool = Query(False, description="True bo'lsa SMS yubormaydi, faqat ro'yxat qaytaradi"),
 ):
+    """
+    Fon ish yaratadi va darhol job id qaytaradi; SMS'lar outbox orqali
+    (parallel, SMS_RATE_PER_SEC tezligida) yuboriladi. Holat: GET /notify-no-show/{job_id}.
+    Shu kun uchun tugallanmagan ish bo'lsa, yangisi yaratilmaydi.
+    """
     # Sana
     if the_date:
         try:
@@ -460,89 +657,47 @@ async def notify_no_show(
     else:
         d = datetime.utcnow().date()
 
-    # Bugun kelmagan o'quvchilar (attendance yo'q)
-    subq = select(Attendance.student_id).where(Attendance.date == d)
-    q = select(Student)
-    if only_active:
-        q = q.where(Student.is_active.is_(True))
-    q = q.where(~Student.id.in_(subq))
-    students = (await db.execute(q)).scalars().all()
-
-    sent, skipped = [], []
     if dry_run:
-        for s in students:
-            sent.append({"student_id": s.id, "name": f"{s.first_name} {s.last_name}"})
-        return {"date": str(d), "count": len(sent), "dry_run": True, "students": sent}
-
-    for s in students:
-        phones = []
-        if s.parent_father_phone: phones.append(s.parent_father_phone)
-        if s.parent_mother_phone: phones.append(s.parent_mother_phone)
-        if not phones:
-            skipped.append({"student_id": s.id, "reason": "no_parent_phone"})
-            continue
-        try:
-            msg = sms_kelmagan(s)
-            res = await _send_bulk_sms(phones, msg)
-            sent.append({"student_id": s.id, "resp": res})
-        except Exception as e:
-            skipped.append({"student_id": s.id, "reason": str(e)})
-
-    return {"date": str(d), "sent": sent, "skipped": skipped, "counts": {"sent": len(sent), "skipped": len(skipped)}}
-
-import os, json
-from datetime import datetime
-
-# ... (mavjud importlar saqlansin)
-
-# Xom POST loglar joyi: .env da FACE_RAW_LOG_DIR berib qo‘ysangiz bo‘ladi
-FACE_RAW_LOG_DIR = os.getenv("FACE_RAW_LOG_DIR", "logs/face_raw")
+        # Bugun kelmagan o'quvchilar (attendance yo'q)
+        subq = select(Attendance.student_id).where(Attendance.date == d)
+        q = select(Student)
+        if only_active:
+            q = q.where(Student.is_active.is_(True))
+        q = q.where(~Student.id.in_(subq))
+        students = (await db.execute(q)).scalars().all()
+        listed = [{"student_id": s.id, "name": f"{s.first_name} {s.last_name}"} for s in students]
+        return {"date": str(d), "count": len(listed), "dry_run": True, "students": listed}
+
+    job, created = await sms_jobs.create_no_show_job(db, d, only_active)
+    if created:
+        no_show_jobs.wake()
+    return {"job_id": job.id, "date": str(d), "status": job.status, "created": created}
+
+
+@router.get("/notify-no-show/{job_id}")
+async def notify_no_show_status(job_id: int, db: AsyncSession = Depends(get_db)):
+    """Ish holati: o'quvchilar bo'yicha progress va SMS'lar (sent / failed / pending)."""
+    status = await sms_jobs.job_status(db, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Ish topilmadi")
+    return status
 
+# =========================
+#   Xom POST jurnali
+# =========================
 @router.post("/dump")
 async def dump_raw_post(request: Request):
     """
-    Nima POST qilinsa, o‘sha xom bodyni txt faylga yozib qo‘yadi.
-    Har kuni bitta faylga append bo‘ladi: logs/face_raw/2025-09-16.txt
+    Nima POST qilinsa, o‘sha xom bodyni jurnalga yozib qo‘yadi (event loop bloklanmaydi).
+    Segmentlar: FACE_RAW_LOG_DIR/journal-*.ndjson(.gz) — app/services/face_journal.py ga qarang.
     """
-    # meta
-    ctype = (request.headers.get("content-type") or "")
-    client_ip = request.client.host if request.client else None
-    ua = request.headers.get("user-agent")
-
-    # xom body
     body_bytes = await request.body()
-    # UTF-8 bo‘lmasa ham yozila olishi uchun "latin-1" fallback
-    try:
-        body_text = body_bytes.decode("utf-8")
-    except UnicodeDecodeError:
-        body_text = body_bytes.decode("latin-1", errors="ignore")
-
-    # fayl nomi: kunlik
-    utc_now = datetime.utcnow()
-    day_str = utc_now.strftime("%Y-%m-%d")
-    ts = utc_now.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3] + "Z"
-
-    os.makedirs(FACE_RAW_LOG_DIR, exist_ok=True)
-    file_path = os.path.join(FACE_RAW_LOG_DIR, f"{day_str}.txt")
-
-    # yoziladigan blok (ajratkichlar bilan)
-    header = {
-        "time": ts,
-        "ip": client_ip,
-        "content_type": ctype,
-        "user_agent": ua,
-        "content_length": len(body_bytes),
-    }
-    block = (
-        "\n==================== POST ====================\n"
-        + json.dumps(header, ensure_ascii=False)
-        + "\n----------------------------------------------\n"
-        + body_text
-        + "\n================== END POST ==================\n"
+    ok = face_journal.append(
+        body_bytes,
+        content_type=request.headers.get("content-type") or "",
+        ip=request.client.host if request.client else None,
+        user_agent=request.headers.get("user-agent"),
     )
-
-    # yozish (oddiy sync; kichik fayllar uchun yetarli)
-    with open(file_path, "a", encoding="utf-8") as f:
-        f.write(block)
-
-    return {"ok": True, "saved_to": file_path, "bytes": len(body_bytes)}
+    if not ok:
+        raise HTTPException(status_code=503, detail="Jurnal navbati to'la yoki ishlamayapti")
+    return {"ok": True, "queued": True, "segment": face_journal.current_path, "bytes": len(body_bytes)}
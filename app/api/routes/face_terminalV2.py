@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Request, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_
-from datetime import datetime, time as dt_time, timedelta, timezone
+from datetime import datetime, timedelta, timezone
 import json, os
 
 from app.db.database import get_db
 from app.models.student import Student
-from app.models.attendance import Attendance
+from app.services.face_identity import face_identity
+from app.services.face_names import face_names, name_tokens
+from app.services.face_telemetry import face_telemetry
+from app.crud import attendance as crud_attendance
+from app.services import face_prefilter, face_multipart
 try:
     from app.models.teacher import Teacher
 except Exception:
@@ -15,13 +18,10 @@ except Exception:
 router = APIRouter(prefix="/face-terminal", tags=["Face Terminal"])
 
 # ---- sozlamalar (xohlasangiz .env orqali) ----
-BLOCK_MINUTES = int(os.getenv("FACE_BLOCK_MINUTES", "4"))        # kelganidan keyin necha daqiqada "ketdi" yozishga ruxsat
-LATE_HHMM = os.getenv("FACE_LATE_HHMM", "08:00")                  # kechikish chegarasi
+# blok va kechikish chegarasi /log bilan umumiy: crud_attendance.BLOCK_MINUTES, LATE_CUTOFF
+BLOCK_MINUTES = crud_attendance.BLOCK_MINUTES   # FACE_BLOCK_MINUTES
 LOCAL_TZ = timezone(timedelta(hours=int(os.getenv("LOCAL_TZ_HOURS", "5"))))  # +05:00 default
 
-hh, mm = (int(x) for x in LATE_HHMM.split(":"))
-LATE_THRESHOLD = dt_time(hh, mm)
-
 def _parse_dt_any(s: str) -> datetime:
     # "2025-09-17T02:56:26+08:00" yoki "YYYY-MM-DD HH:MM:SS"
     try:
@@ -38,33 +38,30 @@ def _cols(model):
 def _name_matches(person, posted_name: str) -> bool:
     if not posted_name or not person:
         return False
-    p = posted_name.strip().lower()
-    first = (getattr(person, "first_name", "") or "").lower()
-    last = (getattr(person, "last_name", "") or "").lower()
-    full = f"{first} {last}".strip()
-    return p in {first, last, full}
+    p = set(name_tokens(posted_name))
+    first = set(name_tokens(getattr(person, "first_name", "")))
+    last = set(name_tokens(getattr(person, "last_name", "")))
+    return bool(p) and p in (first, last, first | last)
 
-async def _extract_event(request: Request) -> dict:
-    """event_log | AccessControllerEvent | json | payload dagidan JSON ni ajratadi va AccessControllerEvent obyektini qaytaradi."""
+async def _read_event_bytes(request: Request) -> bytes:
+    """event_log | AccessControllerEvent | json | payload qismining xom JSON baytlari (multipart oqim bilan)."""
     ctype = (request.headers.get("content-type") or "").lower()
-    data = {}
     if ctype.startswith("multipart/form-data"):
-        form = await request.form()
-        part = form.get("event_log") or form.get("AccessControllerEvent") or form.get("json") or form.get("payload")
-        if part is None:
+        raw = await face_multipart.read_event_bytes(request)
+        if raw is None:
             raise HTTPException(status_code=400, detail="event_log yo‘q (form-data)")
-        text = (await part.read()).decode("utf-8", errors="ignore") if hasattr(part, "read") else str(part)
-        data = json.loads(text or "{}")
-    elif ctype.startswith("application/json"):
-        raw = await request.body()
+        return raw
+    # application/json va boshqa holatlar: xom bodyni JSON deb ko‘ramiz
+    return await request.body()
+
+def _extract_event(raw: bytes, ctype: str) -> dict:
+    """JSON ni ajratadi va AccessControllerEvent obyektini qaytaradi."""
+    try:
         data = json.loads(raw.decode("utf-8", errors="ignore") or "{}")
-    else:
-        # boshqa holatlar: xom bodyni ham JSON deb ko‘ramiz
-        raw = await request.body()
-        try:
-            data = json.loads(raw.decode("utf-8", errors="ignore"))
-        except Exception:
-            raise HTTPException(status_code=400, detail=f"Unsupported Content-Type: {ctype}")
+    except ValueError:
+        if ctype.startswith(("multipart/form-data", "application/json")):
+            raise
+        raise HTTPException(status_code=400, detail=f"Unsupported Content-Type: {ctype}")
 
     # ayrim modellarda butun paket ichida AccessControllerEvent mavjud
     evt = data.get("AccessControllerEvent") or data
@@ -72,15 +69,28 @@ async def _extract_event(request: Request) -> dict:
 
 @router.post("/logV2")
 async def receive_log(request: Request, db: AsyncSession = Depends(get_db)):
-    evt = await _extract_event(request)
+    device = face_telemetry.device_key(request)
+    return await face_telemetry.observe(device, _receive_log(request, db, device))
+
+async def _receive_log(request: Request, db: AsyncSession, device: str):
+    raw = await _read_event_bytes(request)
+
+    # Tezkor filtr: subEventType != 75 bo'lsa JSON qurilmaydi
+    reason = face_prefilter.prefilter(raw, event_types=None)
+    if reason is not None:
+        return {"ok": True, "skip": True, "reason": reason}
+
+    evt = _extract_event(raw, (request.headers.get("content-type") or "").lower())
 
     # Tekshirish uchun kerak bo'lgan maydonlar
     posted_name = (evt.get("name") or "").strip()
     emp_str = str(evt.get("employeeNoString") or evt.get("employeeNo") or "").strip()
     sub_event = int(evt.get("subEventType", -1))
     if not emp_str:
+        face_prefilter.record_parsed_skip("employeeNoString missing")
         return {"ok": True, "skip": True, "reason": "employeeNoString missing"}
     if sub_event != 75:  # access pass success
+        face_prefilter.record_parsed_skip(f"subEventType={sub_event}")
         return {"ok": True, "skip": True, "reason": f"subEventType={sub_event}"}
 
     # Sana/vaqt
@@ -105,13 +115,8 @@ async def receive_log(request: Request, db: AsyncSession = Depends(get_db)):
     d = dt_local.date()
     t = dt_local.time()
 
-    # Kechikish
-    if t > LATE_THRESHOLD:
-        late_minutes = int((_to_local(datetime.combine(d, t)) - _to_local(datetime.combine(d, LATE_THRESHOLD))).total_seconds() // 60)
-        arrival_status = "late"
-    else:
-        late_minutes = 0
-        arrival_status = "on_time"
+    # Kechikish (/log bilan bir xil: crud_attendance.LATE_CUTOFF)
+    arrival_status, late_minutes = crud_attendance._calc_late(t)
 
     # Kim?
     try:
@@ -124,24 +129,26 @@ async def receive_log(request: Request, db: AsyncSession = Depends(get_db)):
 
     # 1) ID bo‘yicha moslash
     if face_id is not None:
-        student = await db.scalar(select(Student).where(Student.face_terminal_id == face_id))
-        if (student is None) and (Teacher is not None):
-            teacher = await db.scalar(select(Teacher).where(Teacher.face_terminal_id == face_id))
+        person = await face_identity.resolve(db, face_id)
+        if person is not None:
+            student = person if person.role == "student" else None
+            teacher = person if person.role == "teacher" else None
 
     # 2) ID topilmasa — posted name bo‘yicha moslash (ixtiyoriy)
     if not student and not teacher and posted_name:
-        # first_name/last_name bo‘yicha sodda qidiruv
-        student = await db.scalar(
-            select(Student).where(
-                or_(Student.first_name.ilike(posted_name), Student.last_name.ilike(posted_name))
-            )
-        )
-        if (student is None) and (Teacher is not None):
-            teacher = await db.scalar(
-                select(Teacher).where(
-                    or_(Teacher.first_name.ilike(posted_name), Teacher.last_name.ilike(posted_name))
-                )
-            )
+        # normallashtirilgan kalit (kirill/lotin, imlo farqlari) — xotiradagi xarita, kerak bo‘lsa trigram
+        school_id = request.query_params.get("school_id")
+        ref, ambiguous = await face_names.lookup(db, posted_name, int(school_id) if school_id and school_id.isdigit() else None)
+        if ambiguous:
+            raise HTTPException(status_code=404, detail=f"Ism bo‘yicha bir nechta odam topildi: name={posted_name!r}")
+        if ref is not None:
+            model = Student if ref[0] == "student" else Teacher
+            found = await db.get(model, ref[1])
+            if found is None:
+                # indeksda o'chirilgan odam qolgan — keyingi so'rovlar uchun olib tashlaymiz
+                face_names.remove(ref[0], ref[1])
+            student = found if ref[0] == "student" else None
+            teacher = found if ref[0] == "teacher" else None
 
     if not student and not teacher:
         raise HTTPException(status_code=404, detail=f"Foydalanuvchi topilmadi: name={posted_name!r}, employeeNoString={emp_str!r}")
@@ -155,104 +162,37 @@ async def receive_log(request: Request, db: AsyncSession = Depends(get_db)):
     else:
         name_warning = None
 
-    # Attendance modelining dinamik ustunlarini tekshiramiz
-    att_cols = _cols(Attendance)
-    has_departure = "departure_time" in att_cols
-    has_status = "status" in att_cols
-    has_is_present = "is_present" in att_cols
-    has_arrival_status = "arrival_status" in att_cols
-    has_school = "school_id" in att_cols
-    has_user_type = "user_type" in att_cols
-
-    # ---- STUDENT oqimi ----
-    if student:
-        existing = await db.scalar(
-            select(Attendance).where(
-                Attendance.student_id == student.id,
-                Attendance.date == d,
-            )
-        )
-        if existing is None:
-            payload = {
-                "student_id": student.id,
-                "date": d,
-                "arrival_time": t,
-                "late_minutes": late_minutes,
-            }
-            if has_is_present:     payload["is_present"] = True
-            if has_arrival_status: payload["arrival_status"] = arrival_status
-            if has_school:         payload["school_id"] = getattr(student, "school_id", None)
-            if has_user_type:      payload["user_type"] = "student"
-
-            att = Attendance(**payload)
-            db.add(att)
-            await db.commit()
-            await db.refresh(att)
-            return {"ok": True, "role": "student", "name_warning": name_warning, "attendance": {
-                "id": att.id, "date": str(att.date), "arrival_time": str(att.arrival_time), "late_minutes": att.late_minutes
-            }}
-
-        # KETDI (agar departure_time yo‘q va blokdan o‘tgan bo‘lsa)
-        if has_departure and getattr(existing, "departure_time", None) is None:
-            base = existing.arrival_time or t
-            diff_min = int((datetime.combine(d, t) - datetime.combine(d, base)).total_seconds() // 60)
-            if diff_min < BLOCK_MINUTES:
-                return {"ok": True, "role": "student", "skip": True, "reason": "block_minutes", "diff_min": diff_min, "need_min": BLOCK_MINUTES}
-            existing.departure_time = t
-            if has_status: existing.status = "left"
-            await db.commit()
-            await db.refresh(existing)
-            return {"ok": True, "role": "student", "attendance": {
-                "id": existing.id, "date": str(existing.date),
-                "arrival_time": str(existing.arrival_time),
-                "departure_time": str(existing.departure_time)
-            }}
-
-        return {"ok": True, "role": "student", "skip": True, "reason": "no_departure_or_already_set"}
-
-    # ---- TEACHER oqimi ----
-    if teacher:
-        existing = await db.scalar(
-            select(Attendance).where(
-                Attendance.teacher_id == teacher.id,
-                Attendance.date == d,
-            )
-        )
-        if existing is None:
-            payload = {
-                "teacher_id": teacher.id,
-                "date": d,
-                "arrival_time": t,
-                "late_minutes": late_minutes,
-            }
-            if has_is_present:     payload["is_present"] = True
-            if has_arrival_status: payload["arrival_status"] = arrival_status
-            if has_school:         payload["school_id"] = getattr(teacher, "school_id", None)
-            if has_user_type:      payload["user_type"] = "teacher"
-
-            att = Attendance(**payload)
-            db.add(att)
-            await db.commit()
-            await db.refresh(att)
-            return {"ok": True, "role": "teacher", "name_warning": name_warning, "attendance": {
-                "id": att.id, "date": str(att.date), "arrival_time": str(att.arrival_time), "late_minutes": att.late_minutes
-            }}
-
-        if has_departure and getattr(existing, "departure_time", None) is None:
-            base = existing.arrival_time or t
-            diff_min = int((datetime.combine(d, t) - datetime.combine(d, base)).total_seconds() // 60)
-            if diff_min < BLOCK_MINUTES:
-                return {"ok": True, "role": "teacher", "skip": True, "reason": "block_minutes", "diff_min": diff_min, "need_min": BLOCK_MINUTES}
-            existing.departure_time = t
-            if has_status: existing.status = "left"
-            await db.commit()
-            await db.refresh(existing)
-            return {"ok": True, "role": "teacher", "attendance": {
-                "id": existing.id, "date": str(existing.date),
-                "arrival_time": str(existing.arrival_time),
-                "departure_time": str(existing.departure_time)
-            }}
-
-        return {"ok": True, "role": "teacher", "skip": True, "reason": "no_departure_or_already_set"}
-
-    return {"ok": True, "skip": True, "reason": "unhandled"}
+    # ---- STUDENT / TEACHER oqimi: bitta INSERT … ON CONFLICT ----
+    role = "student" if student else "teacher"
+    person = student or teacher
+    outcome, att, diff_min = await crud_attendance.record_terminal_pass(
+        db,
+        student_id=person.id if student else None,
+        teacher_id=person.id if teacher else None,
+        day=d,
+        tm=t,
+        late_minutes=late_minutes,
+        arrival_status=arrival_status,
+        school_id=getattr(person, "school_id", None),
+        user_type=role,
+        block_minutes=BLOCK_MINUTES,
+    )
+    face_telemetry.applied(device, outcome)
+
+    if outcome in ("arrived", "arrival_fixed"):
+        return {"ok": True, "role": role, "name_warning": name_warning, "attendance": {
+            "id": att.id, "date": str(att.date), "arrival_time": str(att.arrival_time), "late_minutes": att.late_minutes
+        }}
+
+    # KETDI (agar departure_time yo‘q va blokdan o‘tgan bo‘lsa)
+    if outcome == "departed":
+        return {"ok": True, "role": role, "attendance": {
+            "id": att.id, "date": str(att.date),
+            "arrival_time": str(att.arrival_time),
+            "departure_time": str(att.departure_time)
+        }}
+
+    if outcome == "block_minutes":
+        return {"ok": True, "role": role, "skip": True, "reason": "block_minutes", "diff_min": diff_min, "need_min": BLOCK_MINUTES}
+
+    return {"ok": True, "role": role, "skip": True, "reason": "no_departure_or_already_set"}
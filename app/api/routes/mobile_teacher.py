@@ -14,6 +14,7 @@ from app.models.schedule import Schedule
 from app.models.student import Student           
 from app.models.score import Score               
 from app.models.chat import ChatRoom, ChatMessage  
+from app.services import student_service
 
 from app.schemas.teacher_mobile import (
     TeacherLogin, TokenOut, TeacherProfileOut, TeacherScoreCreate, TeacherScoreOut,
@@ -65,6 +66,18 @@ async def profile(teacher: Teacher = Depends(get_current_teacher)):
         phone=getattr(teacher, "phone", None)
     )
 
+# ---- Sinf statistikasi (bitta so'rov) ----
+@router.get("/students/stats")
+async def class_students_stats(
+    class_id: int,
+    filter: str = Query(default="monthly", enum=["weekly", "monthly", "yearly"]),
+    teacher: Teacher = Depends(get_current_teacher),
+    db: AsyncSession = Depends(get_db),
+):
+    return await student_service.get_students_stats(
+        db, school_id=teacher.school_id, class_id=class_id, filter=filter,
+    )
+
 DAYS = ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"]
 
 class TeacherWeekDayOut(BaseModel):
@@ -0,0 +1,103 @@
+# app/api/routes/sms.py
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.dependencies import require_role
+from app.db.database import get_db
+from app.models.schools import School
+from app.models.sms_outbox import SmsOutbox
+from app.services.sms.receipts import delivery_receipts
+
+router = APIRouter(prefix="/sms", tags=["SMS"])
+
+
+# =========================
+#   Eskiz delivery report
+# =========================
+@router.post("/eskiz/callback")
+async def eskiz_callback(request: Request, secret: Optional[str] = Query(None)):
+    """
+    Eskiz delivery report'i (JSON yoki form-data). Xotiradagi buferga qo'yiladi,
+    sms_outbox ga fon task batch UPDATE bilan yozadi (app/services/sms/receipts.py).
+    """
+    if settings.ESKIZ_CALLBACK_SECRET and secret != settings.ESKIZ_CALLBACK_SECRET:
+        raise HTTPException(status_code=403, detail="Callback secret noto'g'ri")
+
+    ctype = (request.headers.get("content-type") or "").lower()
+    try:
+        if "json" in ctype:
+            data = await request.json()
+        else:
+            data = dict(await request.form())
+    except Exception:
+        raise HTTPException(status_code=400, detail="Callback body o'qilmadi")
+
+    reports = data if isinstance(data, list) else [data]
+    accepted = sum(1 for r in reports if isinstance(r, dict) and delivery_receipts.offer(r))
+    # Eskiz qayta yubormasligi uchun har doim 200
+    return {"ok": True, "accepted": accepted}
+
+
+# =========================
+#   Yetkazish statistikasi
+# =========================
+@router.get("/delivery-stats")
+async def delivery_stats(
+    db: AsyncSession = Depends(get_db),
+    date_from: Optional[str] = Query(None, description="YYYY-MM-DD; default: 7 kun oldin"),
+    date_to: Optional[str] = Query(None, description="YYYY-MM-DD; default: bugun"),
+    school_id: Optional[int] = Query(None),
+    user=Depends(require_role("superuser")),
+):
+    """Maktablar bo'yicha: yuborilgan, yetkazilgan, yetkazilmagan va yetkazish foizi."""
+    try:
+        d_to = datetime.fromisoformat(date_to).date() if date_to else datetime.utcnow().date()
+        d_from = datetime.fromisoformat(date_from).date() if date_from else d_to - timedelta(days=7)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Sana formati noto'g'ri (YYYY-MM-DD)")
+
+    delivered = SmsOutbox.delivery_status == "delivered"
+    not_delivered = SmsOutbox.delivery_status.in_(("undelivered", "rejected", "expired", "deleted"))
+    q = (
+        select(
+            SmsOutbox.school_id,
+            School.name,
+            func.count().label("total"),
+            func.count().filter(SmsOutbox.status == "sent").label("sent"),
+            func.count().filter(SmsOutbox.status == "failed").label("send_failed"),
+            func.count().filter(delivered).label("delivered"),
+            func.count().filter(not_delivered).label("not_delivered"),
+            func.count().filter(SmsOutbox.status == "sent", SmsOutbox.delivery_status.is_(None)).label("no_report"),
+        )
+        .outerjoin(School, School.id == SmsOutbox.school_id)
+        .where(
+            SmsOutbox.created_at >= datetime.combine(d_from, datetime.min.time()),
+            SmsOutbox.created_at < datetime.combine(d_to + timedelta(days=1), datetime.min.time()),
+        )
+        .group_by(SmsOutbox.school_id, School.name)
+        .order_by(SmsOutbox.school_id)
+    )
+    if school_id is not None:
+        q = q.where(SmsOutbox.school_id == school_id)
+
+    rows = (await db.execute(q)).all()
+    schools = []
+    for r in rows:
+        reported = r.delivered + r.not_delivered
+        schools.append({
+            "school_id": r.school_id,
+            "school_name": r.name,
+            "total": r.total,
+            "sent": r.sent,
+            "send_failed": r.send_failed,
+            "delivered": r.delivered,
+            "not_delivered": r.not_delivered,
+            "no_report": r.no_report,
+            "delivery_rate": round(r.delivered / reported, 4) if reported else None,
+        })
+    return {"date_from": str(d_from), "date_to": str(d_to), "schools": schools}
@@ -1,3 +1,4 @@
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
@@ -19,6 +20,7 @@ from fastapi import status
 from sqlalchemy import or_, select
 from app.models.student import Student
 from app.models.schools import School
+from app.services import student_service
 from fastapi import APIRouter, Depends, HTTPException, Query
 
 
@@ -46,6 +48,19 @@ async def get_students(
 ):
     return await crud_student.get_all_students(db)
 
+@router.get("/stats")
+async def get_students_stats(
+    school_id: Optional[int] = None,
+    class_id: Optional[int] = None,
+    filter: str = Query(default="monthly", enum=["weekly", "monthly", "yearly"]),
+    db: AsyncSession = Depends(get_db),
+    user=Depends(require_role("staff", "superuser"))
+):
+    """Sinf/maktab o'quvchilari: o'rtacha baho va davomat foizi (bitta so'rov)."""
+    if school_id is None and class_id is None:
+        raise HTTPException(status_code=400, detail="school_id yoki class_id kerak")
+    return await student_service.get_students_stats(db, school_id=school_id, class_id=class_id, filter=filter)
+
 @router.get("/{student_id}", response_model=StudentOut)
 async def get_student(
     student_id: int,
@@ -49,6 +49,10 @@ class Settings(BaseSettings):
     ESKIZ_PASSWORD: str
     
     ESKIZ_FROM: str
+    # delivery report: to'liq URL (masalan https://api.example.uz/sms/eskiz/callback); bo'sh — callback so'ralmaydi
+    ESKIZ_CALLBACK_URL: Optional[str] = None
+    # berilsa callback URL'ga ?secret=... qo'shiladi va endpoint uni tekshiradi
+    ESKIZ_CALLBACK_SECRET: Optional[str] = None
 
     model_config = SettingsConfigDict(
         env_file=".env",
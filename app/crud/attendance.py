@@ -1,16 +1,18 @@
 # app/crud/attendance.py
 
 import os
-from typing import Optional
-from datetime import datetime, date as dt_date, time as dt_time
+from typing import Optional, Tuple
+from datetime import datetime, timedelta, date as dt_date, time as dt_time
 
 from fastapi import HTTPException
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, or_, case, func, literal, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.attendance import Attendance
 from app.models.student import Student
 from app.models.teacher import Teacher
+from app.services import attendance_summary
 
 # --- Vaqt zonasi (Heroku: heroku config:set TZ=Asia/Samarkand) ---
 LOCAL_TZ_NAME = os.getenv("APP_TZ") or os.getenv("TZ") or "Asia/Samarkand"
@@ -32,7 +34,11 @@ def _parse_cutoff(s: str) -> dt_time:
     hh, mm = s.split(":")
     return dt_time(int(hh), int(mm))
 
-LATE_CUTOFF = _parse_cutoff(os.getenv("LATE_CUTOFF", "08:00"))  # default 08:00
+# yagona kechikish chegarasi (qo'lda belgilash ham, terminal ham); FACE_LATE_HHMM — eski nomi
+LATE_CUTOFF = _parse_cutoff(os.getenv("LATE_CUTOFF") or os.getenv("FACE_LATE_HHMM") or "08:00")  # default 08:00
+
+# terminal: kelganidan keyin shuncha daqiqa o'tmaguncha "ketdi" yozilmaydi (/log va /logV2 uchun yagona)
+BLOCK_MINUTES = int(os.getenv("FACE_BLOCK_MINUTES", "1"))
 
 
 def _normalize_time(value) -> dt_time:
@@ -65,6 +71,13 @@ def _calc_late(arrival: dt_time) -> tuple[str, int]:
     return "late", mins
 
 
+def _daily_conflict_target(for_student: bool) -> dict:
+    """(student_id, date) yoki (teacher_id, date) unique partial indeksiga mos ON CONFLICT nishoni."""
+    tbl = Attendance.__table__
+    col = tbl.c.student_id if for_student else tbl.c.teacher_id
+    return {"index_elements": [col, tbl.c.date], "index_where": col.is_not(None)}
+
+
 async def _upsert_daily_row(
     db: AsyncSession,
     *,
@@ -73,28 +86,231 @@ async def _upsert_daily_row(
     day: dt_date,
     school_id: Optional[int],
 ) -> Attendance:
-    q = select(Attendance).where(
-        and_(
-            Attendance.date == day,
-            Attendance.student_id == (student_id if student_id is not None else None),
-            Attendance.teacher_id == (teacher_id if teacher_id is not None else None),
+    """
+    Kun + (student yoki teacher) bo'yicha satrni bitta INSERT … ON CONFLICT bilan
+    topadi yoki yaratadi (parallel so'rovlarda dublikat satr paydo bo'lmaydi).
+    """
+    stmt = (
+        pg_insert(Attendance)
+        .values(
+            date=day,
+            student_id=student_id,
+            teacher_id=teacher_id,
+            is_present=True,
+            school_id=school_id,
+            user_type="student" if student_id else "teacher",
         )
+        .on_conflict_do_update(
+            **_daily_conflict_target(student_id is not None),
+            set_={"updated_at": func.now()},
+        )
+        .returning(Attendance)
     )
-    row = await db.scalar(q)
-    if row:
-        return row
+    result = await db.scalars(stmt, execution_options={"populate_existing": True})
+    return result.one()
 
-    row = Attendance(
-        date=day,
+
+# --------------------------
+#  TERMINAL: KELDI / KETDI (bitta so'rov)
+# --------------------------
+
+async def record_terminal_pass(
+    db: AsyncSession,
+    *,
+    student_id: Optional[int] = None,
+    teacher_id: Optional[int] = None,
+    day: dt_date,
+    tm: dt_time,
+    late_minutes: int,
+    arrival_status: str,
+    school_id: Optional[int],
+    user_type: str,
+    block_minutes: int,
+    commit: bool = True,
+) -> Tuple[str, Optional[object], Optional[int]]:
+    """
+    Face terminal urishini bitta `INSERT … ON CONFLICT DO UPDATE … RETURNING` bilan qo'llaydi.
+
+    Holat o'tishlari:
+      - satr yo'q                               -> "arrived"  (arrival_time = tm)
+      - arrival_time yo'q, departure yo'q       -> "arrival_fixed"
+      - arrival bor, departure yo'q, blokdan o'tgan -> "departed" (status = left)
+      - arrival bor, blok tugamagan             -> "block_minutes" (satr qaytmaydi)
+      - departure allaqachon bor                -> "already_set"
+
+    return: (outcome, row | None, diff_min | None); row — RETURNING satri (Attendance ustunlari).
+    """
+    tbl = Attendance.__table__
+    ins = pg_insert(tbl).values(
         student_id=student_id,
         teacher_id=teacher_id,
+        date=day,
+        arrival_time=tm,
+        late_minutes=late_minutes,
         is_present=True,
+        arrival_status=arrival_status,
         school_id=school_id,
-        user_type="student" if student_id else "teacher",
+        user_type=user_type,
     )
-    db.add(row)
-    await db.flush()
-    return row
+    ex = ins.excluded
+    arrival_missing = and_(tbl.c.arrival_time.is_(None), tbl.c.departure_time.is_(None))
+    can_leave = and_(
+        tbl.c.departure_time.is_(None),
+        tbl.c.arrival_time.is_not(None),
+        ex.arrival_time - tbl.c.arrival_time >= literal(timedelta(minutes=block_minutes)),
+    )
+    stmt = ins.on_conflict_do_update(
+        **_daily_conflict_target(student_id is not None),
+        set_={
+            "arrival_time": case((arrival_missing, ex.arrival_time), else_=tbl.c.arrival_time),
+            "late_minutes": case((arrival_missing, ex.late_minutes), else_=tbl.c.late_minutes),
+            "arrival_status": case((arrival_missing, ex.arrival_status), else_=tbl.c.arrival_status),
+            "departure_time": case((arrival_missing, tbl.c.departure_time), else_=ex.arrival_time),
+            "status": case((arrival_missing, tbl.c.status), else_=literal("left")),
+            "updated_at": func.now(),
+        },
+        where=or_(arrival_missing, can_leave),
+    ).returning(*tbl.c, literal_column("(xmax = 0)").label("inserted"))
+
+    row = (await db.execute(stmt)).first()
+    if row is not None:
+        # kunlik yig'indi: kelish (yangi yoki to'ldirilgan) — satr hissasi, ketish — left +1
+        await attendance_summary.apply_delta(
+            db, student_id=student_id, teacher_id=teacher_id, school_id=row.school_id, day=day,
+            delta=attendance_summary.contrib(row) if row.departure_time is None else {"left_count": 1},
+        )
+        if commit:
+            await db.commit()
+        if row.inserted:
+            return "arrived", row, None
+        if row.departure_time is None:
+            return "arrival_fixed", row, None
+        return "departed", row, None
+
+    # WHERE bajarilmadi — sababini aniqlash uchun mavjud satrni o'qiymiz (faqat skip yo'lida)
+    owner = tbl.c.student_id == student_id if student_id is not None else tbl.c.teacher_id == teacher_id
+    existing = (
+        await db.execute(
+            select(tbl.c.arrival_time, tbl.c.departure_time).where(owner, tbl.c.date == day)
+        )
+    ).first()
+    if existing is not None and existing.departure_time is None and existing.arrival_time is not None:
+        diff_min = int((datetime.combine(day, tm) - datetime.combine(day, existing.arrival_time)).total_seconds() // 60)
+        return "block_minutes", None, diff_min
+    return "already_set", None, None
+
+
+def _minutes_between(a: dt_time, b: dt_time) -> int:
+    return int((datetime.combine(dt_date.min, b) - datetime.combine(dt_date.min, a)).total_seconds() // 60)
+
+
+# asyncpg bitta so'rovda ~32k parametr qabul qiladi
+_BULK_CHUNK = 1000
+
+
+async def bulk_record_terminal_passes(
+    db: AsyncSession,
+    groups: dict,
+    *,
+    block_minutes: int,
+) -> dict:
+    """
+    Offline terminal replay'i uchun set-based yozish.
+
+    groups: {(role, person_id, day): {"school_id", "user_type", "times": [time, ...]}}
+    Kechikish — _calc_late (LATE_CUTOFF).
+
+    Har (kishi, kun) uchun eng erta vaqt — kelish, eng kechi — ketish (blokdan o'tsa).
+    Mavjud satrlar bitta SELECT … FOR UPDATE bilan o'qiladi, natija har rol uchun
+    bitta ko'p qatorli INSERT … ON CONFLICT DO UPDATE bilan yoziladi. Commit chaqiruvchida.
+
+    return: {key: {"arrival_time", "departure_time", "new_arrival", "new_departure"}}
+    """
+    tbl = Attendance.__table__
+    out: dict = {}
+    for role in ("student", "teacher"):
+        keys = [k for k in groups if k[0] == role]
+        if not keys:
+            continue
+        col = tbl.c.student_id if role == "student" else tbl.c.teacher_id
+
+        existing_rows = (
+            await db.execute(
+                select(col.label("pid"), tbl.c.date, tbl.c.arrival_time, tbl.c.departure_time)
+                .where(col.in_({k[1] for k in keys}), tbl.c.date.in_({k[2] for k in keys}))
+                .with_for_update()
+            )
+        ).all()
+        existing = {(r.pid, r.date): r for r in existing_rows}
+
+        values = []
+        for key in keys:
+            _, pid, day = key
+            g = groups[key]
+            times = sorted(g["times"])
+            ex = existing.get((pid, day))
+            old_arr = ex.arrival_time if ex else None
+            old_dep = ex.departure_time if ex else None
+
+            arrival = min(times[0], old_arr) if old_arr else times[0]
+            latest = max(times[-1], old_dep) if old_dep else times[-1]
+            departure = latest if _minutes_between(arrival, latest) >= block_minutes else old_dep
+            arrival_status, late_minutes = _calc_late(arrival)
+
+            values.append({
+                "student_id": pid if role == "student" else None,
+                "teacher_id": pid if role == "teacher" else None,
+                "date": day,
+                "arrival_time": arrival,
+                "departure_time": departure,
+                "late_minutes": late_minutes,
+                "arrival_status": arrival_status,
+                "is_present": True,
+                "status": "left" if departure is not None else None,
+                "school_id": g.get("school_id"),
+                "user_type": g.get("user_type") or role,
+            })
+            out[key] = {
+                "arrival_time": arrival,
+                "departure_time": departure,
+                "new_arrival": arrival != old_arr,
+                "new_departure": departure is not None and departure != old_dep,
+            }
+
+        for i in range(0, len(values), _BULK_CHUNK):
+            ins = pg_insert(tbl).values(values[i:i + _BULK_CHUNK])
+            ex = ins.excluded
+            earlier = or_(tbl.c.arrival_time.is_(None), ex.arrival_time < tbl.c.arrival_time)
+            await db.execute(
+                ins.on_conflict_do_update(
+                    **_daily_conflict_target(role == "student"),
+                    set_={
+                        # parallel jonli urishlar bilan to'qnashsa ham ma'lumot orqaga ketmaydi
+                        "arrival_time": func.least(tbl.c.arrival_time, ex.arrival_time),
+                        "late_minutes": case((earlier, ex.late_minutes), else_=tbl.c.late_minutes),
+                        "arrival_status": case((earlier, ex.arrival_status), else_=tbl.c.arrival_status),
+                        "departure_time": func.greatest(tbl.c.departure_time, ex.departure_time),
+                        "status": case(
+                            (and_(ex.departure_time.is_not(None), ex.departure_time.is_distinct_from(tbl.c.departure_time)), literal("left")),
+                            else_=tbl.c.status,
+                        ),
+                        "updated_at": func.now(),
+                    },
+                )
+            )
+
+    # kunlik yig'indi: replay ko'p satrni birdan o'zgartiradi — tegilgan kun/maktablarni qayta hisoblash
+    touched: dict = {}
+    for (_, _, day), g in groups.items():
+        touched.setdefault(day, set()).add(g.get("school_id"))
+    # tartiblangan — parallel replay'lar rebuild qulflarini bir xil tartibda oladi
+    for day, schools in sorted(touched.items()):
+        if None in schools:
+            await attendance_summary.rebuild(db, day, day)
+        else:
+            for sid in sorted(schools):
+                await attendance_summary.rebuild(db, day, day, school_id=sid)
+    return out
 
 
 # --------------------------
@@ -143,6 +359,7 @@ async def mark_attendance_manual(
         day=day,
         school_id=school_id,
     )
+    summary_before = attendance_summary.contrib(row)
 
     # 5) action bo‘yicha
     a = action.upper()
@@ -181,6 +398,7 @@ async def mark_attendance_manual(
     else:
         raise HTTPException(400, "Noto‘g‘ri action (IN/OUT/EXCUSED/ABSENT)")
 
+    await attendance_summary.apply_row_change(db, row, summary_before)
     await db.commit()
     await db.refresh(row)
     return row
@@ -247,6 +465,7 @@ async def delete_attendance(
     )
     row = await db.scalar(stmt)
     if row:
+        await attendance_summary.forget_row(db, row)
         await db.delete(row)
         await db.commit()
         return {"detail": "Attendance record deleted."}
@@ -10,6 +10,10 @@ import re, secrets, string
 from app.models.student import Student
 from app.schemas.student import StudentCreate, StudentUpdate, StudentOut, StudentOutWithPassword
 from app.core.utils import hash_password
+from app.services.face_identity import face_identity
+from app.services.face_names import face_names, name_key
+from app.services.sms.phone import normalize_uz_phone
+from app.services import attendance_summary
 
 
 def _slugify(s: str) -> str:
@@ -57,6 +61,9 @@ async def create_student(db: AsyncSession, data: StudentCreate) -> StudentOutWit
     base = data.model_dump(exclude_none=True)
     base.pop("password", None)   # hech qachon bevosita saqlamaymiz
     base["login"] = login
+    base["name_key"] = name_key(data.first_name, data.last_name)
+    base["parent_father_e164"] = normalize_uz_phone(data.parent_father_phone)
+    base["parent_mother_e164"] = normalize_uz_phone(data.parent_mother_phone)
 
     # --- Parol ustuni nomini modelga qarab moslaymiz ---
     model_cols = {c.key for c in sa_inspect(Student).mapper.column_attrs}
@@ -88,6 +95,9 @@ async def create_student(db: AsyncSession, data: StudentCreate) -> StudentOutWit
             raise HTTPException(409, "Face Terminal ID allaqachon mavjud")
         raise HTTPException(400, "Noto‘g‘ri ma’lumotlar")
 
+    face_identity.invalidate(new_student.face_terminal_id)
+    face_names.put("student", new_student.id, new_student.school_id, new_student.first_name, new_student.last_name)
+
     # 4) relationship xavfsiz yuklash (agar 'school' mavjud bo‘lsa)
     opts = []
     if hasattr(Student, "school"):
@@ -137,10 +147,17 @@ async def update_student(db: AsyncSession, student_id: int, data: StudentUpdate)
     if not student:
         return None
 
+    old_face_id = student.face_terminal_id
     for k, v in data.model_dump(exclude_unset=True).items():
         setattr(student, k, v)
+    student.name_key = name_key(student.first_name, student.last_name)
+    student.parent_father_e164 = normalize_uz_phone(student.parent_father_phone)
+    student.parent_mother_e164 = normalize_uz_phone(student.parent_mother_phone)
 
     await db.commit()
+    # ism/telefon/face ID o'zgargan bo'lishi mumkin — eski va yangi kalit
+    face_identity.invalidate(old_face_id, student.face_terminal_id)
+    face_names.put("student", student.id, student.school_id, student.first_name, student.last_name)
     result = await db.execute(
         select(Student).options(selectinload(Student.school)).where(Student.id == student_id)
     )
@@ -152,8 +169,13 @@ async def delete_student(db: AsyncSession, student_id: int) -> dict:
     student = result.scalar_one_or_none()
     if not student:
         raise HTTPException(status_code=404, detail="O'quvchi topilmadi")
+    face_id = student.face_terminal_id
+    # davomat satrlari cascade bilan o'chadi — yig'indidan hissasini oldin ayiramiz
+    await attendance_summary.forget_students(db, student_id)
     await db.delete(student)
     await db.commit()
+    face_identity.invalidate(face_id)
+    face_names.remove("student", student_id)
     return {"detail": "O'quvchi muvaffaqiyatli o'chirildi"}
 
 async def reset_student_credentials(
@@ -188,7 +210,10 @@ async def delete_all_students(db: AsyncSession) -> bool:
     students = result.scalars().all()
     if not students:
         return False
+    await attendance_summary.forget_students(db)
     for student in students:
         await db.delete(student)
     await db.commit()
+    face_identity.clear()
+    face_names.clear()
     return True
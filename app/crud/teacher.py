@@ -15,6 +15,8 @@ from app.models.teacher import Teacher
 from app.schemas.teacher import TeacherCreate
 from app.core.utils import hash_password
 from app.crud.credentials import gen_password, make_unique_login_for_model
+from app.services.face_identity import face_identity
+from app.services.face_names import face_names, name_key
 
 def _ascii_slug(text: str) -> str:
     # Aksentlarni tushirish va faqat [a-z0-9 .] qoldirish
@@ -73,6 +75,7 @@ async def create_teacher(db: AsyncSession, data: TeacherCreate):
 
     # 3) HASH va saqlash
     payload["hashed_password"] = hash_password(plain_password)
+    payload["name_key"] = name_key(payload.get("first_name"), payload.get("last_name"))
 
     teacher = Teacher(**payload)
     db.add(teacher)
@@ -107,6 +110,9 @@ async def create_teacher(db: AsyncSession, data: TeacherCreate):
             raise HTTPException(status_code=400, detail=msg)
 
     await db.refresh(teacher)
+    # avval "topilmadi" deb keshlangan bo'lishi mumkin
+    face_identity.invalidate(teacher.face_terminal_id)
+    face_names.put("teacher", teacher.id, teacher.school_id, teacher.first_name, teacher.last_name)
 
     # ⚠️ Admin ko'rishi uchun vaqtincha plain parolni qaytarish foydali.
     # Agar API sxemangiz TeacherOut qaytarsa, routerda o'rab yuboring (quyida).
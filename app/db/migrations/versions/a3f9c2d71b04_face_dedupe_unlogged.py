@@ -0,0 +1,35 @@
+"""face_dedupe unlogged table
+
+Revision ID: a3f9c2d71b04
+Revises: 6dd8ce596f9a
+Create Date: 2026-10-18 09:12:40.118231
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f9c2d71b04'
+down_revision: Union[str, None] = '6dd8ce596f9a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('face_dedupe',
+    sa.Column('key', sa.String(length=200), nullable=False),
+    sa.Column('seen_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('key'),
+    prefixes=['UNLOGGED']
+    )
+    op.create_index(op.f('ix_face_dedupe_seen_at'), 'face_dedupe', ['seen_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_face_dedupe_seen_at'), table_name='face_dedupe')
+    op.drop_table('face_dedupe')
@@ -0,0 +1,32 @@
+"""sms_outbox delivery status columns
+
+Revision ID: a6e93b5f0c12
+Revises: f1c6d3a8e247
+Create Date: 2026-10-18 19:05:41.227903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6e93b5f0c12'
+down_revision: Union[str, None] = 'f1c6d3a8e247'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('sms_outbox', sa.Column('delivery_status', sa.String(length=20), nullable=True))
+    op.add_column('sms_outbox', sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_sms_outbox_school_created', 'sms_outbox', ['school_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sms_outbox_school_created', table_name='sms_outbox')
+    op.drop_column('sms_outbox', 'delivered_at')
+    op.drop_column('sms_outbox', 'delivery_status')
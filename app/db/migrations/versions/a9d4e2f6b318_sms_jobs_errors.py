@@ -0,0 +1,28 @@
+"""sms_jobs.errors (fail no-show job after SMS_JOB_MAX_ERRORS)
+
+Revision ID: a9d4e2f6b318
+Revises: f1a8c3d27e65
+Create Date: 2026-10-19 11:02:54.871640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d4e2f6b318'
+down_revision: Union[str, None] = 'f1a8c3d27e65'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('sms_jobs', sa.Column('errors', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('sms_jobs', 'errors')
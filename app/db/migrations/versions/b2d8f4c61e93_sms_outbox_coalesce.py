@@ -0,0 +1,34 @@
+"""sms_outbox coalesce_key and payload
+
+Revision ID: b2d8f4c61e93
+Revises: a6e93b5f0c12
+Create Date: 2026-10-18 20:31:09.884126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d8f4c61e93'
+down_revision: Union[str, None] = 'a6e93b5f0c12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('sms_outbox', sa.Column('coalesce_key', sa.String(length=80), nullable=True))
+    op.add_column('sms_outbox', sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.create_index('ux_sms_outbox_coalesce_pending', 'sms_outbox', ['coalesce_key'], unique=True,
+                    postgresql_where=sa.text("status = 'pending' AND coalesce_key IS NOT NULL"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_sms_outbox_coalesce_pending', table_name='sms_outbox')
+    op.drop_column('sms_outbox', 'payload')
+    op.drop_column('sms_outbox', 'coalesce_key')
@@ -0,0 +1,60 @@
+"""attendance daily unique partial indexes
+
+Revision ID: b7e41d09c6a2
+Revises: a3f9c2d71b04
+Create Date: 2026-10-18 10:03:27.540912
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e41d09c6a2'
+down_revision: Union[str, None] = 'a3f9c2d71b04'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Parallel terminal urishlaridan qolgan dublikatlar: eng kichik id saqlanadi,
+    # ketish vaqti bo'lmasa boshqa nusxadan olinadi.
+    for col in ('student_id', 'teacher_id'):
+        op.execute(f"""
+            UPDATE attendance a
+               SET departure_time = d.departure_time
+              FROM (
+                    SELECT {col}, date, MIN(id) AS keep_id, MAX(departure_time) AS departure_time
+                      FROM attendance
+                     WHERE {col} IS NOT NULL
+                     GROUP BY {col}, date
+                    HAVING COUNT(*) > 1
+                   ) d
+             WHERE a.id = d.keep_id AND a.departure_time IS NULL
+        """)
+        op.execute(f"""
+            DELETE FROM attendance a
+             USING attendance b
+             WHERE a.{col} IS NOT NULL
+               AND a.{col} = b.{col}
+               AND a.date = b.date
+               AND a.id > b.id
+        """)
+
+    op.drop_index('ix_attendance_student_date', table_name='attendance')
+    op.drop_index('ix_attendance_teacher_date', table_name='attendance')
+    op.create_index('uq_attendance_student_date', 'attendance', ['student_id', 'date'], unique=True,
+                    postgresql_where=sa.text('student_id IS NOT NULL'))
+    op.create_index('uq_attendance_teacher_date', 'attendance', ['teacher_id', 'date'], unique=True,
+                    postgresql_where=sa.text('teacher_id IS NOT NULL'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_attendance_teacher_date', table_name='attendance')
+    op.drop_index('uq_attendance_student_date', table_name='attendance')
+    op.create_index('ix_attendance_teacher_date', 'attendance', ['teacher_id', 'date'], unique=False)
+    op.create_index('ix_attendance_student_date', 'attendance', ['student_id', 'date'], unique=False)
@@ -0,0 +1,91 @@
+"""students/teachers name_key (normalised terminal name) + indexes
+
+Revision ID: c5d2e8f91a37
+Revises: b7e41d09c6a2
+Create Date: 2026-10-18 13:20:41.118204
+
+"""
+import re
+import unicodedata
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5d2e8f91a37'
+down_revision: Union[str, None] = 'b7e41d09c6a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_BATCH = 1000
+
+# --- app.services.face_names.name_key ning shu reviziyadagi muzlatilgan nusxasi ---
+# (ilova kodi keyin o'zgarsa ham tarixni qayta o'ynatish bir xil kalit bersin)
+_CYR = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo", "ж": "j",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "x", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "", "ы": "i", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya", "ў": "o", "қ": "q", "ғ": "g", "ҳ": "h",
+}
+_APOSTROPHES = re.compile(r"[‘’ʻʼ`´']")
+_FOLDS = (
+    ("kh", "h"), ("x", "h"), ("q", "k"), ("dj", "j"), ("iy", "i"), ("yev", "ev"),
+)
+_DOUBLE = re.compile(r"([a-z])\1+")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_NAME_KEY_MAXLEN = 120
+
+
+def _fold_token(tok: str) -> str:
+    for a, b in _FOLDS:
+        tok = tok.replace(a, b)
+    return _DOUBLE.sub(r"\1", tok)
+
+
+def _name_key(*parts: Optional[str]) -> Optional[str]:
+    text = " ".join(p for p in parts if p)
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(_CYR.get(ch, ch) for ch in text)
+    text = _APOSTROPHES.sub("", text)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    toks = [t for t in (_fold_token(t) for t in _NON_ALNUM.split(text)) if t]
+    if not toks:
+        return None
+    return " ".join(sorted(toks))[:_NAME_KEY_MAXLEN]
+
+
+def _backfill(table: str) -> None:
+    # transliteratsiya Python'da — SQL'da takrorlamaymiz; id bo'yicha bo'laklab (keyset)
+    conn = op.get_bind()
+    sel = sa.text(f"SELECT id, first_name, last_name FROM {table} WHERE id > :after ORDER BY id LIMIT {_BATCH}")
+    upd = sa.text(f"UPDATE {table} SET name_key = :k WHERE id = :id")
+    after = 0
+    while True:
+        rows = conn.execute(sel, {"after": after}).all()
+        if not rows:
+            break
+        conn.execute(upd, [{"id": r.id, "k": _name_key(r.first_name, r.last_name)} for r in rows])
+        after = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table in ('students', 'teachers'):
+        op.add_column(table, sa.Column('name_key', sa.String(length=120), nullable=True))
+        _backfill(table)
+        op.create_index(f'ix_{table}_school_name_key', table, ['school_id', 'name_key'], unique=False)
+        op.create_index(f'ix_{table}_name_key_trgm', table, ['name_key'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name_key': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ('teachers', 'students'):
+        op.drop_index(f'ix_{table}_name_key_trgm', table_name=table)
+        op.drop_index(f'ix_{table}_school_name_key', table_name=table)
+        op.drop_column(table, 'name_key')
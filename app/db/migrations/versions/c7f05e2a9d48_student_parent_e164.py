@@ -0,0 +1,74 @@
+"""students parent_father_e164 / parent_mother_e164 + backfill + indexes
+
+Revision ID: c7f05e2a9d48
+Revises: b2d8f4c61e93
+Create Date: 2026-10-18 21:14:36.502871
+
+"""
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7f05e2a9d48'
+down_revision: Union[str, None] = 'b2d8f4c61e93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_BATCH = 1000
+
+
+def _normalize_uz_phone(raw: Optional[str]) -> Optional[str]:
+    # app.services.sms.phone.normalize_uz_phone ning shu reviziyadagi muzlatilgan nusxasi
+    if not raw:
+        return None
+    digits = "".join(ch for ch in str(raw) if ch.isdigit())
+    if digits.startswith("00"):
+        digits = digits[2:]
+    if len(digits) == 10 and digits.startswith("0"):
+        digits = digits[1:]
+    if len(digits) == 9:
+        digits = "998" + digits
+    if len(digits) != 12 or not digits.startswith("998"):
+        return None
+    return "+" + digits
+
+
+def _backfill() -> None:
+    # normallashtirish Python'da — SQL'da takrorlamaymiz; id bo'yicha bo'laklab (keyset)
+    conn = op.get_bind()
+    sel = sa.text(
+        "SELECT id, parent_father_phone, parent_mother_phone FROM students "
+        "WHERE id > :after AND (parent_father_phone IS NOT NULL OR parent_mother_phone IS NOT NULL) "
+        f"ORDER BY id LIMIT {_BATCH}"
+    )
+    upd = sa.text("UPDATE students SET parent_father_e164 = :f, parent_mother_e164 = :m WHERE id = :id")
+    after = 0
+    while True:
+        rows = conn.execute(sel, {"after": after}).all()
+        if not rows:
+            break
+        conn.execute(upd, [
+            {"id": r.id, "f": _normalize_uz_phone(r.parent_father_phone), "m": _normalize_uz_phone(r.parent_mother_phone)}
+            for r in rows
+        ])
+        after = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('students', sa.Column('parent_father_e164', sa.String(length=16), nullable=True))
+    op.add_column('students', sa.Column('parent_mother_e164', sa.String(length=16), nullable=True))
+    _backfill()
+    op.create_index('ix_students_parent_father_e164', 'students', ['parent_father_e164'], unique=False)
+    op.create_index('ix_students_parent_mother_e164', 'students', ['parent_mother_e164'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_students_parent_mother_e164', table_name='students')
+    op.drop_index('ix_students_parent_father_e164', table_name='students')
+    op.drop_column('students', 'parent_mother_e164')
+    op.drop_column('students', 'parent_father_e164')
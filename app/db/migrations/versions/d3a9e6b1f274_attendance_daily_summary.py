@@ -0,0 +1,44 @@
+"""attendance_daily_summary table
+
+Revision ID: d3a9e6b1f274
+Revises: c7f05e2a9d48
+Create Date: 2026-10-18 23:02:51.730164
+
+Jadval bo'sh yaratiladi; mavjud tarixni to'ldirish:
+    python -m app.scripts.rebuild_attendance_summary
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a9e6b1f274'
+down_revision: Union[str, None] = 'c7f05e2a9d48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('attendance_daily_summary',
+    sa.Column('school_id', sa.Integer(), nullable=False),
+    sa.Column('class_id', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('user_type', sa.String(length=20), nullable=False),
+    sa.Column('present', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('late', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('left_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('late_minutes_sum', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('expected', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('school_id', 'class_id', 'date', 'user_type', name='attendance_daily_summary_pkey')
+    )
+    op.create_index('ix_attendance_daily_summary_school_date', 'attendance_daily_summary', ['school_id', 'date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_attendance_daily_summary_school_date', table_name='attendance_daily_summary')
+    op.drop_table('attendance_daily_summary')
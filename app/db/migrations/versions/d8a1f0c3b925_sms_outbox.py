@@ -0,0 +1,53 @@
+"""sms_outbox table
+
+Revision ID: d8a1f0c3b925
+Revises: c5d2e8f91a37
+Create Date: 2026-10-18 14:02:11.507314
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8a1f0c3b925'
+down_revision: Union[str, None] = 'c5d2e8f91a37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('sms_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('phone', sa.String(length=20), nullable=False),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('kind', sa.String(length=30), nullable=True),
+    sa.Column('student_id', sa.Integer(), nullable=True),
+    sa.Column('school_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=20), server_default='pending', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('provider_message_id', sa.String(length=64), nullable=True),
+    sa.Column('provider_response', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['school_id'], ['schools.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['student_id'], ['students.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sms_outbox_student_id'), 'sms_outbox', ['student_id'], unique=False)
+    op.create_index(op.f('ix_sms_outbox_provider_message_id'), 'sms_outbox', ['provider_message_id'], unique=False)
+    op.create_index('ix_sms_outbox_due', 'sms_outbox', ['next_attempt_at'], unique=False,
+                    postgresql_where=sa.text("status IN ('pending', 'sending')"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sms_outbox_due', table_name='sms_outbox')
+    op.drop_index(op.f('ix_sms_outbox_provider_message_id'), table_name='sms_outbox')
+    op.drop_index(op.f('ix_sms_outbox_student_id'), table_name='sms_outbox')
+    op.drop_table('sms_outbox')
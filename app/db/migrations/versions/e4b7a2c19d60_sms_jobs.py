@@ -0,0 +1,53 @@
+"""sms_jobs table, sms_outbox.job_id
+
+Revision ID: e4b7a2c19d60
+Revises: d8a1f0c3b925
+Create Date: 2026-10-18 16:40:27.118402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7a2c19d60'
+down_revision: Union[str, None] = 'd8a1f0c3b925'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('sms_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=30), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('only_active', sa.Boolean(), server_default='true', nullable=False),
+    sa.Column('status', sa.String(length=20), server_default='queued', nullable=False),
+    sa.Column('total', sa.Integer(), nullable=True),
+    sa.Column('cursor', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('processed', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('enqueued', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('skipped', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('lease_until', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sms_jobs_status'), 'sms_jobs', ['status'], unique=False)
+    op.add_column('sms_outbox', sa.Column('job_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('sms_outbox_job_id_fkey', 'sms_outbox', 'sms_jobs', ['job_id'], ['id'], ondelete='SET NULL')
+    op.create_index(op.f('ix_sms_outbox_job_id'), 'sms_outbox', ['job_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_sms_outbox_job_id'), table_name='sms_outbox')
+    op.drop_constraint('sms_outbox_job_id_fkey', 'sms_outbox', type_='foreignkey')
+    op.drop_column('sms_outbox', 'job_id')
+    op.drop_index(op.f('ix_sms_jobs_status'), table_name='sms_jobs')
+    op.drop_table('sms_jobs')
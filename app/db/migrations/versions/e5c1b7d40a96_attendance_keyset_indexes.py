@@ -0,0 +1,30 @@
+"""attendance keyset pagination indexes
+
+Revision ID: e5c1b7d40a96
+Revises: d3a9e6b1f274
+Create Date: 2026-10-18 23:41:09.284615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c1b7d40a96'
+down_revision: Union[str, None] = 'd3a9e6b1f274'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_attendance_school_date_id', 'attendance', ['school_id', 'date', 'id'], unique=False)
+    op.create_index('ix_attendance_date_id', 'attendance', ['date', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_attendance_date_id', table_name='attendance')
+    op.drop_index('ix_attendance_school_date_id', table_name='attendance')
@@ -0,0 +1,34 @@
+"""eskiz_tokens table
+
+Revision ID: f1c6d3a8e247
+Revises: e4b7a2c19d60
+Create Date: 2026-10-18 18:12:54.630915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c6d3a8e247'
+down_revision: Union[str, None] = 'e4b7a2c19d60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('eskiz_tokens',
+    sa.Column('key', sa.String(length=50), nullable=False),
+    sa.Column('token', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('eskiz_tokens')
@@ -1,9 +1,18 @@
 # app/main.py
 from fastapi import FastAPI
-from app.api.routes import admin_credentials, auth, students, classes, attendance, score, teacher, mobile_teacher, teacher_auth, schedule, subject, auth_student, device, schools, face_terminal, face_terminalV2, payments, paynet_rpc, mobile_api
+from app.api.routes import admin_credentials, auth, students, classes, attendance, score, teacher, mobile_teacher, teacher_auth, schedule, subject, auth_student, device, schools, face_terminal, face_terminalV2, payments, paynet_rpc, mobile_api, sms
 
 from fastapi.middleware.cors import CORSMiddleware
 from app.realtime import chat_ws_router
+from app.services.face_identity import warm_face_identity
+from app.api.routes.face_terminal import ingest_queue, sms_dispatcher, no_show_jobs
+from app.services.face_snapshots import snapshot_store
+from app.services.face_journal import face_journal
+from app.services.face_telemetry import face_telemetry
+from app.db.session import engine
+from app.services.sms.gateway import sms_gateway
+from app.services.sms.token import eskiz_tokens
+from app.services.sms.receipts import delivery_receipts
 
 
 # Admin Panel
@@ -15,6 +24,44 @@ app = FastAPI(
 )
 
 
+@app.on_event("startup")
+async def _startup():
+    # face terminal: qurilma bo'yicha DB vaqti (cursor event'lari)
+    face_telemetry.install(engine.sync_engine)
+    # face_terminal_id -> person keshini oldindan to'ldiramiz
+    await warm_face_identity()
+    # terminal hodisalari uchun fon writer
+    await ingest_queue.start()
+    # FACE_SNAPSHOT_MODE=store bo'lsa yuz suratlari writer'i
+    await snapshot_store.start()
+    # xom POST jurnali (/face-terminal/dump, FACE_JOURNAL_LOG_EVENTS)
+    await face_journal.start()
+    # Eskiz uchun yagona pool'langan HTTP klient
+    await sms_gateway.start()
+    # Eskiz tokenini muddatidan oldin yangilovchi (single-flight)
+    await eskiz_tokens.start()
+    # SMS outbox dispatcher (ota-onalarga xabarlar)
+    await sms_dispatcher.start()
+    # kelmaganlar bildirishi ishlari (yiqilgan ishlar cursor'dan davom etadi)
+    await no_show_jobs.start()
+    # Eskiz delivery report'lari buferi (batch UPDATE)
+    await delivery_receipts.start()
+
+
+@app.on_event("shutdown")
+async def _shutdown():
+    # navbatda qolgan hodisalarni yozib bo'lamiz
+    await ingest_queue.stop()
+    await snapshot_store.stop()
+    await face_journal.stop()
+    # yuborilmay qolganlar outbox'da qoladi (lease tugagach qayta olinadi)
+    await no_show_jobs.stop()
+    await sms_dispatcher.stop()
+    await eskiz_tokens.stop()
+    await delivery_receipts.stop()
+    await sms_gateway.close()
+
+
 # Middleware
 app.add_middleware(
     CORSMiddleware,
@@ -22,6 +69,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # /attendance sahifalash headerlari
+    expose_headers=["X-Next-Cursor", "X-Total-Estimate"],
 )
 
 # Admin routerlar
@@ -40,6 +89,7 @@ app.include_router(face_terminalV2.router)
 app.include_router(device.router)
 app.include_router(payments.router)
 app.include_router(paynet_rpc.router)
+app.include_router(sms.router)
 
 
 
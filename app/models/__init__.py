@@ -12,6 +12,11 @@ from .payment import Payment, PaymentState
 from .chat import ChatRoom, ChatMessage
 from .classroom import ClassName
 from .subject import Subject
+from .face_dedupe import FaceDedupe
+from .sms_outbox import SmsOutbox
+from .sms_job import SmsJob
+from .eskiz_token import EskizToken
+from .attendance_summary import AttendanceDailySummary
 
 __all__ = [
     "Student",
@@ -29,4 +34,9 @@ __all__ = [
     "ChatMessage",
     "ClassName",
     "Subject",
+    "FaceDedupe",
+    "SmsOutbox",
+    "SmsJob",
+    "EskizToken",
+    "AttendanceDailySummary",
 ]
@@ -3,7 +3,7 @@ from sqlalchemy import (
     ForeignKey, DateTime, Index
 )
 from sqlalchemy.orm import relationship, synonym
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from app.db.base import Base
 
 
@@ -46,7 +46,17 @@ class Attendance(Base):
     # Alias: left_time <-> departure_time (DBda alohida ustun Y O ' Q !)
     left_time = synonym("departure_time")
 
+    # Bir kishi uchun kuniga bitta satr (terminal upsert'i ON CONFLICT shu indekslarga tayanadi)
     __table_args__ = (
-        Index("ix_attendance_student_date", "student_id", "date"),
-        Index("ix_attendance_teacher_date", "teacher_id", "date"),
+        Index(
+            "uq_attendance_student_date", "student_id", "date",
+            unique=True, postgresql_where=text("student_id IS NOT NULL"),
+        ),
+        Index(
+            "uq_attendance_teacher_date", "teacher_id", "date",
+            unique=True, postgresql_where=text("teacher_id IS NOT NULL"),
+        ),
+        # keyset sahifalash: ORDER BY date DESC, id DESC / WHERE (date, id) < cursor
+        Index("ix_attendance_school_date_id", "school_id", "date", "id"),
+        Index("ix_attendance_date_id", "date", "id"),
     )
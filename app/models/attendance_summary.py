@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, PrimaryKeyConstraint, Index
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+
+class AttendanceDailySummary(Base):
+    """
+    Kunlik davomat yig'indisi: (maktab, sinf, sana, user_type) bo'yicha bitta satr.
+    Yozish yo'llari (terminal, manual, o'chirish) delta bilan yangilaydi
+    (app/services/attendance_summary.py); to'liq qayta hisoblash —
+    `python -m app.scripts.rebuild_attendance_summary`.
+    class_id = 0 — sinfsiz o'quvchilar va o'qituvchilar.
+    """
+    __tablename__ = "attendance_daily_summary"
+
+    school_id = Column(Integer, nullable=False)
+    class_id = Column(Integer, nullable=False, server_default="0")
+    date = Column(Date, nullable=False)
+    user_type = Column(String(20), nullable=False)         # student / teacher
+
+    present = Column(Integer, nullable=False, server_default="0")
+    late = Column(Integer, nullable=False, server_default="0")
+    left_count = Column(Integer, nullable=False, server_default="0")
+    late_minutes_sum = Column(Integer, nullable=False, server_default="0")
+    # shu sinfdagi faol o'quvchilar (o'qituvchilar uchun — maktabdagi o'qituvchilar)
+    expected = Column(Integer, nullable=False, server_default="0")
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("school_id", "class_id", "date", "user_type", name="attendance_daily_summary_pkey"),
+        # oylik ko'rinish: maktab + sana oralig'i
+        Index("ix_attendance_daily_summary_school_date", "school_id", "date"),
+    )
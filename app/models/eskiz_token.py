@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Text, DateTime
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+
+class EskizToken(Base):
+    """
+    Workerlararo umumiy Eskiz tokeni (ESKIZ_TOKEN_BACKEND=postgres).
+    Yangilash pg_advisory_xact_lock ostida — butun deployment bitta login qiladi.
+    """
+    __tablename__ = "eskiz_tokens"
+
+    key = Column(String(50), primary_key=True)              # akkaunt (email)
+    token = Column(Text, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
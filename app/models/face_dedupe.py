@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+
+class FaceDedupe(Base):
+    """
+    Terminal dedupe kalitlari (workerlararo). UNLOGGED: WAL yozilmaydi,
+    crash'da tozalanib ketishi muammo emas — oyna bir necha soniya xolos.
+    """
+    __tablename__ = "face_dedupe"
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    key = Column(String(200), primary_key=True)
+    seen_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
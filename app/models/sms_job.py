@@ -0,0 +1,33 @@
+from sqlalchemy import Column, Integer, String, Text, Date, Boolean, DateTime
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+
+class SmsJob(Base):
+    """
+    Fon SMS ishi (hozircha: kelmagan o'quvchilar bildirishi).
+    O'quvchilar id bo'yicha bo'laklab outbox'ga yoziladi; har bo'lakdan keyin
+    `cursor` (oxirgi student_id) bilan birga commit — yiqilsa shu joydan davom etadi.
+    status: queued -> running -> done | failed (SMS_JOB_MAX_ERRORS ta xatodan keyin)
+    """
+    __tablename__ = "sms_jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(30), nullable=False)               # no_show
+    day = Column(Date, nullable=False)
+    only_active = Column(Boolean, nullable=False, server_default="true")
+
+    status = Column(String(20), nullable=False, server_default="queued", index=True)
+    total = Column(Integer, nullable=True)                  # boshlanishdagi kelmaganlar soni
+    cursor = Column(Integer, nullable=False, server_default="0")
+    processed = Column(Integer, nullable=False, server_default="0")
+    enqueued = Column(Integer, nullable=False, server_default="0")
+    skipped = Column(Integer, nullable=False, server_default="0")
+    # running: shu vaqtgacha egallangan (worker o'lsa boshqasi davom ettiradi)
+    lease_until = Column(DateTime(timezone=True), nullable=True)
+    error = Column(Text, nullable=True)
+    errors = Column(Integer, nullable=False, server_default="0")     # muvaffaqiyatsiz urinishlar soni
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
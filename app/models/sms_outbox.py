@@ -0,0 +1,52 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func, text
+from app.db.base import Base
+
+
+class SmsOutbox(Base):
+    """
+    Chiquvchi SMS navbati. Attendance bilan bitta tranzaksiyada yoziladi,
+    app/services/sms/outbox.py dagi dispatcher `FOR UPDATE SKIP LOCKED` bilan oladi.
+    status: pending -> sending -> sent | failed
+    """
+    __tablename__ = "sms_outbox"
+
+    id = Column(Integer, primary_key=True)
+    phone = Column(String(20), nullable=False)              # 9989XXXXXXXX
+    message = Column(Text, nullable=False)
+    kind = Column(String(30), nullable=True)                # arrived / departed / late / no_show ...
+    student_id = Column(Integer, ForeignKey("students.id", ondelete="SET NULL"), nullable=True, index=True)
+    school_id = Column(Integer, ForeignKey("schools.id", ondelete="SET NULL"), nullable=True)
+    job_id = Column(Integer, ForeignKey("sms_jobs.id", ondelete="SET NULL"), nullable=True, index=True)
+    # SMS_NOTIFY_MODE=coalesce|digest: bir kalitli pending satrga hodisalar qo'shiladi,
+    # matn yuborish paytida `payload` dan yig'iladi (app/services/sms/coalesce.py)
+    coalesce_key = Column(String(80), nullable=True)
+    payload = Column(JSONB, nullable=True)
+
+    status = Column(String(20), nullable=False, server_default="pending")
+    attempts = Column(Integer, nullable=False, server_default="0")
+    # pending: qachon yuborish mumkin; sending: lease tugash vaqti (worker o'lsa qayta olinadi)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(Text, nullable=True)
+    provider_message_id = Column(String(64), nullable=True, index=True)
+    provider_response = Column(Text, nullable=True)
+
+    # Eskiz delivery report (app/services/sms/receipts.py): delivered / undelivered / rejected ...
+    delivery_status = Column(String(20), nullable=True)
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # dispatcher faqat navbatdagilarni ko'radi
+        Index("ix_sms_outbox_due", "next_attempt_at", postgresql_where=text("status IN ('pending', 'sending')")),
+        # kalit bo'yicha faqat bitta kutayotgan satr (INSERT … ON CONFLICT shu indeksga)
+        Index(
+            "ux_sms_outbox_coalesce_pending", "coalesce_key", unique=True,
+            postgresql_where=text("status = 'pending' AND coalesce_key IS NOT NULL"),
+        ),
+        # maktab bo'yicha yetkazish statistikasi
+        Index("ix_sms_outbox_school_created", "school_id", "created_at"),
+    )
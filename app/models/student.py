@@ -1,4 +1,5 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Date, Boolean
+from sqlalchemy import Column, ForeignKey, Integer, String, Date, DateTime, Boolean, Index
+from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 
@@ -8,6 +9,8 @@ class Student(Base):
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String(50), nullable=False)
     last_name = Column(String(50), nullable=False)
+    # terminal ism fallback'i uchun normallashtirilgan kalit (app/services/face_names.py: name_key)
+    name_key = Column(String(120), nullable=True)
     passport_number = Column(String(20), unique=True, nullable=True)
     student_code = Column(String(20), unique=True, nullable=False)  # tabel raqam
     image_url = Column(String(255), nullable=True)
@@ -21,6 +24,9 @@ class Student(Base):
     parent_father_phone = Column(String(20), nullable=True)
     parent_mother_name = Column(String(100), nullable=True)
     parent_mother_phone = Column(String(20), nullable=True)
+    # yuborishga tayyor E.164 (+998XXXXXXXXX); yozishda to'ldiriladi (app/services/sms/phone.py)
+    parent_father_e164 = Column(String(16), nullable=True)
+    parent_mother_e164 = Column(String(16), nullable=True)
 
     # FK — bitta marta
     class_id = Column(Integer, ForeignKey("classes.id"), nullable=True)
@@ -29,6 +35,8 @@ class Student(Base):
     clasname = relationship("ClassName", back_populates="students", lazy="joined")
 
     is_active = Column(Boolean, default=True)
+    # face_names indeksining qisman yangilanishi uchun (updated_at > watermark)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=True)
     login = Column(String(50), unique=True, nullable=False)
     hashed_password = Column(String(128), nullable=False)
 
@@ -39,3 +47,12 @@ class Student(Base):
 
     school_id = Column(Integer, ForeignKey("schools.id"), nullable=False)
     school = relationship("School", backref="students")
+
+    __table_args__ = (
+        Index("ix_students_school_name_key", "school_id", "name_key"),
+        Index("ix_students_name_key_trgm", "name_key", postgresql_using="gin", postgresql_ops={"name_key": "gin_trgm_ops"}),
+        Index("ix_students_updated_at", "updated_at"),
+        # ota-ona raqami bo'yicha qidiruv (bir raqamdagi aka-ukalar)
+        Index("ix_students_parent_father_e164", "parent_father_e164"),
+        Index("ix_students_parent_mother_e164", "parent_mother_e164"),
+    )
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Boolean, UniqueConstraint
+from sqlalchemy import Column, ForeignKey, Integer, String, Boolean, DateTime, UniqueConstraint, Index
+from sqlalchemy.sql import func
 from app.db.base import Base
 from sqlalchemy.orm import relationship
 
@@ -9,6 +10,8 @@ class Teacher(Base):
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
+    # terminal ism fallback'i uchun normallashtirilgan kalit (app/services/face_names.py: name_key)
+    name_key = Column(String(120), nullable=True)
     subject = Column(String, nullable=False)
     phone_number = Column(String, unique=True, nullable=False)
      # Face terminal bilan bog‘lash
@@ -16,6 +19,8 @@ class Teacher(Base):
     login = Column(String(50), unique=True, nullable=False)
     hashed_password = Column(String(128), nullable=False)
     is_active = Column(Boolean, default=True)
+    # face_names indeksining qisman yangilanishi uchun (updated_at > watermark)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=True)
     schedules = relationship("Schedule", back_populates="teacher")
     school_id = Column(Integer, ForeignKey("schools.id"), nullable=False)
     school = relationship("School", backref="teachers")
@@ -24,4 +29,7 @@ class Teacher(Base):
 
     __table_args__ = (
         UniqueConstraint("face_terminal_id", name="uq_teacher_face_terminal_id"),
+        Index("ix_teachers_school_name_key", "school_id", "name_key"),
+        Index("ix_teachers_name_key_trgm", "name_key", postgresql_using="gin", postgresql_ops={"name_key": "gin_trgm_ops"}),
+        Index("ix_teachers_updated_at", "updated_at"),
     )
\ No newline at end of file
@@ -0,0 +1,65 @@
+"""
+attendance_daily_summary ni attendance jadvalidan qayta hisoblash (backfill / tuzatish).
+
+    python -m app.scripts.rebuild_attendance_summary                       # butun tarix
+    python -m app.scripts.rebuild_attendance_summary --from 2025-09-01 --to 2025-09-30
+    python -m app.scripts.rebuild_attendance_summary --school 3 --days 30
+
+Oraliq --chunk-days kunlik bo'laklarga bo'linadi, har bo'lak alohida tranzaksiyada
+(DELETE + INSERT … SELECT) — uzun qulflar bo'lmaydi, yiqilsa qayta ishga tushirish xavfsiz.
+"""
+import asyncio
+import argparse
+import time as _time
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import func, select
+
+from app.db.session import async_session
+from app.models.attendance import Attendance
+from app.services import attendance_summary
+
+
+async def rebuild(date_from: Optional[date], date_to: Optional[date], school_id: Optional[int], chunk_days: int) -> None:
+    async with async_session() as db:
+        if date_from is None or date_to is None:
+            lo, hi = (await db.execute(select(func.min(Attendance.date), func.max(Attendance.date)))).one()
+            if lo is None:
+                print("attendance bo'sh — hisoblanadigan narsa yo'q")
+                return
+            date_from = date_from or lo
+            date_to = date_to or hi
+
+    started = _time.perf_counter()
+    total = 0
+    day = date_from
+    while day <= date_to:
+        end = min(day + timedelta(days=chunk_days - 1), date_to)
+        async with async_session() as db:
+            n = await attendance_summary.rebuild(db, day, end, school_id=school_id)
+            await db.commit()
+        total += n
+        print(f"  {day} .. {end}: {n} satr")
+        day = end + timedelta(days=1)
+    print(f"✅ {date_from} .. {date_to}: {total} satr, {_time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild attendance_daily_summary from attendance.")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None, help="YYYY-MM-DD (default: eng eski)")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None, help="YYYY-MM-DD (default: eng yangi)")
+    parser.add_argument("--days", type=int, default=0, help="oxirgi N kun (--from o'rniga)")
+    parser.add_argument("--school", type=int, default=None, help="faqat shu maktab")
+    parser.add_argument("--chunk-days", type=int, default=31, help="bitta tranzaksiyadagi kunlar")
+    args = parser.parse_args()
+
+    date_from, date_to = args.date_from, args.date_to
+    if args.days:
+        date_to = date_to or date.today()
+        date_from = date_to - timedelta(days=args.days - 1)
+    asyncio.run(rebuild(date_from, date_to, args.school, max(args.chunk_days, 1)))
+
+
+if __name__ == "__main__":
+    main()
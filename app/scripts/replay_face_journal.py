@@ -0,0 +1,117 @@
+"""
+Face terminal jurnal segmentini qayta o'ynatish (incident tahlili / offline ingest benchmark).
+
+    python -m app.scripts.replay_face_journal logs/face_raw/journal-20250917-070000-000000-123.ndjson.gz
+    python -m app.scripts.replay_face_journal seg1.ndjson.gz seg2.ndjson --limit 1000
+    python -m app.scripts.replay_face_journal seg.ndjson.gz --commit --batch 200
+
+Har bir yozuv receive_log bilan bir xil yo'ldan o'tadi:
+body -> _log_event_bytes -> _decode_event (prefilter + _normalize_event) -> dedupe -> _process_event.
+SMS hech qachon yuborilmaydi. Default: hammasi bitta tranzaksiyada, oxirida ROLLBACK
+(DB o'zgarmaydi). --commit bo'lsa har --batch hodisadan keyin COMMIT qilinadi.
+"""
+import asyncio
+import argparse
+import time as _time
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import HTTPException
+
+from app.db.session import async_session
+from app.services.face_journal import iter_segment, record_body
+from app.services.face_dedupe import MemoryDedupe
+from app.api.routes.face_terminal import _log_event_bytes, _decode_event, _process_event
+
+
+async def _one_chunk(body: bytes):
+    yield body
+
+
+def _record_ts(rec: dict) -> Optional[float]:
+    """Jurnal yozuvi qabul qilingan payt (dedupe oynasi asl vaqt bo'yicha ishlashi uchun)."""
+    try:
+        return datetime.strptime(rec["time"], "%Y-%m-%d %H:%M:%S.%fZ").timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+async def replay(paths: List[str], *, commit: bool, batch: int, limit: int, dedupe: bool) -> Counter:
+    counts: Counter = Counter()
+    window = MemoryDedupe() if dedupe else None
+    n = 0
+    pending = 0
+    started = _time.perf_counter()
+    db_sec = 0.0
+
+    async with async_session() as db:
+        for path in paths:
+            for rec in iter_segment(path):
+                if limit and n >= limit:
+                    break
+                n += 1
+                try:
+                    raw = await _log_event_bytes(_one_chunk(record_body(rec)), rec.get("content_type") or "application/json")
+                    ev, skip = _decode_event(raw)
+                except (HTTPException, ValueError):
+                    counts["invalid"] += 1
+                    continue
+                if skip is not None:
+                    counts[f"skip:{skip['reason']}"] += 1
+                    continue
+                if window is not None and window.seen(f"{ev['name']}|{ev['emp']}", _record_ts(rec)):
+                    counts["skip:dedupe_window"] += 1
+                    continue
+
+                t0 = _time.perf_counter()
+                try:
+                    result, _notes = await _process_event(db, ev, commit=False, notify=False)
+                except HTTPException:
+                    counts["not_found"] += 1
+                    continue
+                finally:
+                    db_sec += _time.perf_counter() - t0
+
+                if result.get("skip"):
+                    counts[f"skip:{result['reason']}"] += 1
+                else:
+                    counts[f"applied:{result.get('role')}"] += 1
+
+                pending += 1
+                if commit and pending >= batch:
+                    await db.commit()
+                    pending = 0
+
+        if commit:
+            await db.commit()
+        else:
+            await db.rollback()
+
+    elapsed = _time.perf_counter() - started
+    counts["_records"] = n
+    print(f"yozuvlar: {n}, vaqt: {elapsed:.2f}s, {n / elapsed if elapsed else 0:.0f} yozuv/s, DB: {db_sec:.2f}s")
+    for key, value in sorted(counts.items()):
+        if not key.startswith("_"):
+            print(f"  {key:40} {value}")
+    print("✅ COMMIT qilindi" if commit else "ℹ️ ROLLBACK (DB o'zgarmadi)")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay face terminal journal segments through the /log pipeline.")
+    parser.add_argument("paths", nargs="+", help="journal-*.ndjson yoki journal-*.ndjson.gz segmentlar")
+    parser.add_argument("--commit", action="store_true", help="natijani DB ga yozish (default: rollback)")
+    parser.add_argument("--batch", type=int, default=200, help="--commit rejimida nechta hodisada bir COMMIT")
+    parser.add_argument("--limit", type=int, default=0, help="ko'pi bilan shuncha yozuv (0 = hammasi)")
+    parser.add_argument("--no-dedupe", action="store_true", help="FACE_DEDUPE_SEC oynasini qo'llamaslik")
+    args = parser.parse_args()
+
+    if args.batch < 1:
+        raise SystemExit("❌ --batch musbat bo'lishi kerak")
+
+    asyncio.run(replay(args.paths, commit=args.commit, batch=args.batch, limit=args.limit, dedupe=not args.no_dedupe))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+# app/services/attendance_export.py
+"""
+Davomatni CSV / XLSX ga oqim (streaming) bilan eksport qilish.
+
+Satrlar asyncpg server-side cursor orqali (`AsyncSession.stream`, yield_per)
+ATTENDANCE_EXPORT_CHUNK talik bo'laklarda o'qiladi — ORM obyektlari va
+AttendanceOut yaratilmaydi, xotira eksport oralig'iga bog'liq emas.
+
+XLSX — minimal SpreadsheetML (inline string'lar, sharedStrings/styles'siz):
+zip arxiv seek qilinmaydigan oqimga yoziladi va har bo'lakdan keyin tayyor
+baytlar javobga uzatiladi. Tashqi kutubxona (openpyxl) kerak emas.
+
+Sessiya generator ichida ochiladi: StreamingResponse endpoint qaytgandan keyin
+o'qiladi, get_db sessiyasi esa o'sha paytda yopilgan bo'ladi.
+"""
+import io
+import os
+import csv
+import zipfile
+from datetime import date, time
+from typing import AsyncIterator, List
+from xml.sax.saxutils import escape
+
+from sqlalchemy import case, func, select
+
+from app.models.attendance import Attendance
+from app.models.student import Student
+from app.models.teacher import Teacher
+
+EXPORT_CHUNK = int(os.getenv("ATTENDANCE_EXPORT_CHUNK", "2000"))
+
+COLUMNS = (
+    "id", "date", "user_type", "student_id", "teacher_id", "full_name", "class_id", "school_id",
+    "arrival_time", "departure_time", "late_minutes", "is_present", "arrival_status", "status",
+)
+
+
+def _export_query(conditions: list):
+    full_name = case(
+        (Attendance.student_id.isnot(None), func.concat_ws(" ", Student.last_name, Student.first_name)),
+        else_=func.concat_ws(" ", Teacher.last_name, Teacher.first_name),
+    )
+    return (
+        select(
+            Attendance.id, Attendance.date, Attendance.user_type,
+            Attendance.student_id, Attendance.teacher_id, full_name.label("full_name"),
+            Student.class_id, Attendance.school_id,
+            Attendance.arrival_time, Attendance.departure_time, Attendance.late_minutes,
+            Attendance.is_present, Attendance.arrival_status, Attendance.status,
+        )
+        .select_from(Attendance)
+        .outerjoin(Student, Student.id == Attendance.student_id)
+        .outerjoin(Teacher, Teacher.id == Attendance.teacher_id)
+        .where(*conditions)
+        .order_by(Attendance.date, Attendance.id)
+    )
+
+
+async def _partitions(conditions: list) -> AsyncIterator[list]:
+    from app.db.session import async_session
+
+    async with async_session() as db:
+        result = await db.stream(_export_query(conditions).execution_options(yield_per=EXPORT_CHUNK))
+        async for part in result.partitions():
+            yield part
+
+
+def _cell_text(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, time):
+        return v.strftime("%H:%M")
+    if isinstance(v, date):
+        return v.isoformat()
+    return str(v)
+
+
+# =========================
+#   CSV
+# =========================
+async def csv_stream(conditions: list) -> AsyncIterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    # BOM: Excel UTF-8 (o'zbekcha harflar) ni to'g'ri ochishi uchun
+    yield ("﻿" + buf.getvalue()).encode("utf-8")
+    async for part in _partitions(conditions):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerows([_cell_text(v) for v in row] for row in part)
+        yield buf.getvalue().encode("utf-8")
+
+
+# =========================
+#   XLSX
+# =========================
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Attendance" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+class _Sink(io.RawIOBase):
+    """zipfile uchun seek qilinmaydigan oqim: yozilganlar `drain()` gacha xotirada."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        out, self._chunks = b"".join(self._chunks), []
+        return out
+
+
+def _xlsx_row(values) -> str:
+    cells = []
+    for v in values:
+        if v is None:
+            cells.append("<c/>")
+        elif isinstance(v, bool):
+            cells.append(f'<c t="b"><v>{int(v)}</v></c>')
+        elif isinstance(v, (int, float)):
+            cells.append(f"<c><v>{v}</v></c>")
+        else:
+            cells.append(f'<c t="inlineStr"><is><t>{escape(_cell_text(v))}</t></is></c>')
+    return "<row>" + "".join(cells) + "</row>"
+
+
+async def xlsx_stream(conditions: list) -> AsyncIterator[bytes]:
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK)
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write((_SHEET_HEAD + _xlsx_row(COLUMNS)).encode("utf-8"))
+            async for part in _partitions(conditions):
+                sheet.write("".join(_xlsx_row(row) for row in part).encode("utf-8"))
+                chunk = sink.drain()
+                if chunk:  # deflate hali bufferlayotgan bo'lishi mumkin
+                    yield chunk
+            sheet.write(_SHEET_TAIL.encode("utf-8"))
+    # markaziy katalog ZipFile yopilganda yoziladi
+    yield sink.drain()
@@ -5,12 +5,15 @@ from datetime import datetime, date as dt_date, time as dt_time
 from typing import Optional
 
 from fastapi import HTTPException
-from sqlalchemy import select, and_
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.attendance import Attendance
 from app.models.student import Student
 from app.models.teacher import Teacher
+# kunlik satr: bitta INSERT … ON CONFLICT (crud bilan umumiy)
+from app.crud.attendance import _upsert_daily_row
+from app.services import attendance_summary
 
 # --- Timezone (Heroku: heroku config:set TZ=Asia/Samarkand) ---
 try:
@@ -88,41 +91,6 @@ def _safe_get(data, *names, default=None):
     return default
 
 
-async def _upsert_daily_row(
-    db: AsyncSession,
-    *,
-    student_id: Optional[int],
-    teacher_id: Optional[int],
-    day: dt_date,
-    school_id: Optional[int],
-) -> Attendance:
-    """
-    Kun (date) + (student yoki teacher) bo'yicha bitta satrni topadi yoki yaratadi.
-    """
-    stmt = select(Attendance).where(
-        and_(
-            Attendance.date == day,
-            Attendance.student_id == (student_id if student_id is not None else None),
-            Attendance.teacher_id == (teacher_id if teacher_id is not None else None),
-        )
-    )
-    row = await db.scalar(stmt)
-    if row:
-        return row
-
-    row = Attendance(
-        date=day,
-        student_id=student_id,
-        teacher_id=teacher_id,
-        is_present=True,
-        school_id=school_id,
-        user_type="student" if student_id else "teacher",
-    )
-    db.add(row)
-    await db.flush()
-    return row
-
-
 async def create_attendance_manual(
     db: AsyncSession,
     data,  # AttendanceManualCreate yoki o'xshash
@@ -166,6 +134,7 @@ async def create_attendance_manual(
         day=day,
         school_id=school_id,
     )
+    summary_before = attendance_summary.contrib(row)
 
     # 5) Action bo'yicha
     if action == "IN":
@@ -203,6 +172,7 @@ async def create_attendance_manual(
     else:
         raise HTTPException(400, "Noto‘g‘ri action (IN/OUT/EXCUSED/ABSENT)")
 
+    await attendance_summary.apply_row_change(db, row, summary_before)
     await db.commit()
     await db.refresh(row)
     return row
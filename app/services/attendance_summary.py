@@ -0,0 +1,323 @@
+# app/services/attendance_summary.py
+"""
+attendance_daily_summary — (maktab, sinf, sana, user_type) bo'yicha kunlik yig'indi.
+
+Satr hissasi (`contrib`):
+  present          — is_present yolg'on emas va arrival_time bor;
+  late             — present va late_minutes > 0 (late_minutes_sum — shularning yig'indisi);
+  left_count       — departure_time bor.
+Yozish yo'llari satrning oldingi va yangi hissasi farqini (`apply_delta`) shu
+tranzaksiyada `INSERT … ON CONFLICT DO UPDATE SET x = x + delta` bilan qo'shadi:
+record_terminal_pass, mark_attendance_manual, create_attendance_manual, o'chirish.
+Offline replay (bulk_record_terminal_passes) va backfill — `rebuild()` (kun/maktab
+oralig'ini attendance'dan qayta hisoblaydi; sinfi to'liq kelmaganlar uchun ham
+expected bilan satr yaratadi). O'quvchi o'chirilganda (attendance cascade) —
+`forget_students()` uning satrlari hissasini oldindan ayiradi.
+
+expected ustuni — bucket yaratilgandagi ro'yxat (tarix uchun). `month_view` esa
+kutilganlar/kelmaganlarni joriy faol ro'yxatdan hisoblaydi: maktab ishlagan har
+kun (kamida bitta yig'indi satri bor) uchun hech kim kelmagan sinflar ham kiradi,
+rebuild'ni qo'lda ishga tushirish shart emas.
+"""
+from datetime import date as dt_date, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+_FIELDS = ("present", "late", "left_count", "late_minutes_sum")
+
+# SQL'da ham xuddi shu ta'rif (rebuild)
+_PRESENT_SQL = "a.is_present IS NOT FALSE AND a.arrival_time IS NOT NULL"
+
+_DELTA_SQL = text(
+    """
+    INSERT INTO attendance_daily_summary AS s
+           (school_id, class_id, date, user_type, present, late, left_count, late_minutes_sum, expected, updated_at)
+    SELECT k.school_id, k.class_id, CAST(:day AS date), k.user_type,
+           CAST(:present AS integer), CAST(:late AS integer),
+           CAST(:left_count AS integer), CAST(:late_minutes_sum AS integer),
+           CASE WHEN k.user_type = 'teacher'
+                THEN (SELECT count(*) FROM teachers t
+                       WHERE t.school_id = k.school_id AND t.is_active IS NOT FALSE)
+                ELSE (SELECT count(*) FROM students st
+                       WHERE st.school_id = k.school_id AND COALESCE(st.class_id, 0) = k.class_id
+                         AND st.is_active IS TRUE)
+           END,
+           now()
+      FROM (
+            SELECT COALESCE(CAST(:school_id AS integer), p.school_id) AS school_id,
+                   COALESCE(p.class_id, 0) AS class_id, 'student' AS user_type
+              FROM students p WHERE p.id = CAST(:student_id AS integer)
+            UNION ALL
+            SELECT COALESCE(CAST(:school_id AS integer), p.school_id), 0, 'teacher'
+              FROM teachers p WHERE p.id = CAST(:teacher_id AS integer)
+           ) k
+     WHERE k.school_id IS NOT NULL
+    ON CONFLICT (school_id, class_id, date, user_type) DO UPDATE
+       SET present = s.present + EXCLUDED.present,
+           late = s.late + EXCLUDED.late,
+           left_count = s.left_count + EXCLUDED.left_count,
+           late_minutes_sum = s.late_minutes_sum + EXCLUDED.late_minutes_sum,
+           updated_at = now()
+    """
+)
+
+_DELETE_RANGE_SQL = text(
+    """
+    DELETE FROM attendance_daily_summary
+     WHERE date BETWEEN :date_from AND :date_to
+       AND (CAST(:school_id AS integer) IS NULL OR school_id = CAST(:school_id AS integer))
+    """
+)
+
+_REBUILD_SQL = text(
+    f"""
+    WITH agg AS (
+        SELECT COALESCE(a.school_id, st.school_id, t.school_id) AS school_id,
+               CASE WHEN a.student_id IS NOT NULL THEN COALESCE(st.class_id, 0) ELSE 0 END AS class_id,
+               a.date,
+               CASE WHEN a.student_id IS NOT NULL THEN 'student' ELSE 'teacher' END AS user_type,
+               count(*) FILTER (WHERE {_PRESENT_SQL}) AS present,
+               count(*) FILTER (WHERE {_PRESENT_SQL} AND a.late_minutes > 0) AS late,
+               count(*) FILTER (WHERE a.departure_time IS NOT NULL) AS left_count,
+               COALESCE(sum(a.late_minutes) FILTER (WHERE {_PRESENT_SQL} AND a.late_minutes > 0), 0) AS late_minutes_sum
+          FROM attendance a
+          LEFT JOIN students st ON st.id = a.student_id
+          LEFT JOIN teachers t ON t.id = a.teacher_id
+         WHERE a.date BETWEEN :date_from AND :date_to
+           AND (a.student_id IS NOT NULL OR a.teacher_id IS NOT NULL)
+         GROUP BY 1, 2, 3, 4
+    ),
+    agg_f AS (
+        SELECT * FROM agg
+         WHERE school_id IS NOT NULL
+           AND (CAST(:school_id AS integer) IS NULL OR school_id = CAST(:school_id AS integer))
+    ),
+    -- maktab ishlagan kunlar: kamida bitta davomat satri bor
+    days AS (SELECT DISTINCT school_id, date FROM agg_f),
+    roster AS (
+        SELECT st.school_id, COALESCE(st.class_id, 0) AS class_id, 'student' AS user_type, count(*) AS expected
+          FROM students st WHERE st.is_active IS TRUE GROUP BY 1, 2
+        UNION ALL
+        SELECT t.school_id, 0, 'teacher', count(*)
+          FROM teachers t WHERE t.is_active IS NOT FALSE GROUP BY 1
+    ),
+    grid AS (
+        SELECT r.school_id, r.class_id, r.user_type, r.expected, d.date
+          FROM roster r JOIN days d ON d.school_id = r.school_id
+    )
+    INSERT INTO attendance_daily_summary
+           (school_id, class_id, date, user_type, present, late, left_count, late_minutes_sum, expected, updated_at)
+    SELECT COALESCE(x.school_id, g.school_id), COALESCE(x.class_id, g.class_id),
+           COALESCE(x.date, g.date), COALESCE(x.user_type, g.user_type),
+           COALESCE(x.present, 0), COALESCE(x.late, 0), COALESCE(x.left_count, 0),
+           COALESCE(x.late_minutes_sum, 0), COALESCE(g.expected, 0), now()
+      FROM grid g
+      FULL JOIN agg_f x
+        ON x.school_id = g.school_id AND x.class_id = g.class_id
+       AND x.date = g.date AND x.user_type = g.user_type
+    -- DELETE dan keyin jonli apply_delta bucket yaratgan bo'lishi mumkin
+    ON CONFLICT (school_id, class_id, date, user_type) DO UPDATE
+       SET present = EXCLUDED.present,
+           late = EXCLUDED.late,
+           left_count = EXCLUDED.left_count,
+           late_minutes_sum = EXCLUDED.late_minutes_sum,
+           expected = EXCLUDED.expected,
+           updated_at = EXCLUDED.updated_at
+    """
+)
+
+# rebuild qulfi: (maktab, kun) — eksklyuziv; butun kun (barcha maktablar) — "*" kaliti.
+# Maktab rebuild'i "*" ni shared oladi, shunda ikkalasi bir-birini kutadi.
+_LOCK_SQL = text("SELECT pg_advisory_xact_lock(hashtext(:k))")
+_LOCK_SHARED_SQL = text("SELECT pg_advisory_xact_lock_shared(hashtext(:k))")
+
+
+# o'chiriladigan o'quvchi(lar) satrlarining hissasi — _DELTA_SQL bilan bir xil kalit
+# (satrdagi school_id ustun, sinf — o'quvchining joriy sinfi)
+_FORGET_STUDENTS_SQL = text(
+    f"""
+    UPDATE attendance_daily_summary AS s
+       SET present = s.present - d.present,
+           late = s.late - d.late,
+           left_count = s.left_count - d.left_count,
+           late_minutes_sum = s.late_minutes_sum - d.late_minutes_sum,
+           updated_at = now()
+      FROM (
+            SELECT COALESCE(a.school_id, st.school_id) AS school_id,
+                   COALESCE(st.class_id, 0) AS class_id, a.date,
+                   count(*) FILTER (WHERE {_PRESENT_SQL}) AS present,
+                   count(*) FILTER (WHERE {_PRESENT_SQL} AND a.late_minutes > 0) AS late,
+                   count(*) FILTER (WHERE a.departure_time IS NOT NULL) AS left_count,
+                   COALESCE(sum(a.late_minutes) FILTER (WHERE {_PRESENT_SQL} AND a.late_minutes > 0), 0) AS late_minutes_sum
+              FROM attendance a
+              JOIN students st ON st.id = a.student_id
+             WHERE CAST(:student_id AS integer) IS NULL OR a.student_id = CAST(:student_id AS integer)
+             GROUP BY 1, 2, 3
+           ) d
+     WHERE s.school_id = d.school_id AND s.class_id = d.class_id
+       AND s.date = d.date AND s.user_type = 'student'
+    """
+)
+
+_MONTH_VIEW_SQL = """
+    WITH days AS (
+        SELECT DISTINCT date FROM attendance_daily_summary
+         WHERE school_id = :school_id AND date BETWEEN :date_from AND :date_to
+    ),
+    roster AS (
+        SELECT COALESCE(st.class_id, 0) AS class_id, count(*) AS expected
+          FROM students st
+         WHERE st.school_id = :school_id AND st.is_active IS TRUE AND CAST(:user_type AS text) = 'student'
+         GROUP BY 1
+        UNION ALL
+        SELECT 0, count(*)
+          FROM teachers t
+         WHERE t.school_id = :school_id AND t.is_active IS NOT FALSE AND CAST(:user_type AS text) = 'teacher'
+         GROUP BY 1
+    ),
+    grid AS (
+        SELECT d.date, r.class_id, r.expected
+          FROM days d CROSS JOIN roster r
+         WHERE CAST(:class_id AS integer) IS NULL OR r.class_id = CAST(:class_id AS integer)
+    ),
+    facts AS (
+        SELECT date, class_id, present, late, left_count, late_minutes_sum
+          FROM attendance_daily_summary
+         WHERE school_id = :school_id AND user_type = :user_type
+           AND date BETWEEN :date_from AND :date_to
+           AND (CAST(:class_id AS integer) IS NULL OR class_id = CAST(:class_id AS integer))
+    ),
+    x AS (
+        SELECT COALESCE(f.date, g.date) AS date, COALESCE(f.class_id, g.class_id) AS class_id,
+               COALESCE(f.present, 0) AS present, COALESCE(f.late, 0) AS late,
+               COALESCE(f.left_count, 0) AS left_count, COALESCE(f.late_minutes_sum, 0) AS late_minutes_sum,
+               COALESCE(g.expected, 0) AS expected
+          FROM grid g
+          FULL JOIN facts f ON f.date = g.date AND f.class_id = g.class_id
+    )
+    SELECT {key} AS key,
+           sum(present) AS present, sum(late) AS late, sum(left_count) AS left_count,
+           sum(late_minutes_sum) AS late_minutes_sum, sum(expected) AS expected,
+           count(DISTINCT date) AS days
+      FROM x
+     GROUP BY {key}
+     ORDER BY {key}
+"""
+
+
+def contrib(row) -> Dict[str, int]:
+    """Bitta attendance satrining yig'indiga hissasi (ORM obyekti yoki RETURNING satri)."""
+    present = row.is_present is not False and row.arrival_time is not None
+    late_min = int(row.late_minutes or 0)
+    late = present and late_min > 0
+    return {
+        "present": int(present),
+        "late": int(late),
+        "left_count": int(row.departure_time is not None),
+        "late_minutes_sum": late_min if late else 0,
+    }
+
+
+async def apply_delta(
+    db: AsyncSession,
+    *,
+    student_id: Optional[int],
+    teacher_id: Optional[int],
+    school_id: Optional[int],
+    day: dt_date,
+    delta: Dict[str, int],
+) -> None:
+    """Delta'ni yig'indiga qo'shadi (commit — chaqiruvchida); nol delta — hech narsa."""
+    if not any(delta.get(f) for f in _FIELDS):
+        return
+    await db.execute(_DELTA_SQL, {
+        "student_id": student_id, "teacher_id": teacher_id, "school_id": school_id, "day": day,
+        **{f: int(delta.get(f) or 0) for f in _FIELDS},
+    })
+
+
+async def apply_row_change(db: AsyncSession, row, before: Dict[str, int]) -> None:
+    """Satr o'zgargandan keyin: yangi hissa - `before`."""
+    after = contrib(row)
+    await apply_delta(
+        db, student_id=row.student_id, teacher_id=row.teacher_id, school_id=row.school_id, day=row.date,
+        delta={f: after[f] - before[f] for f in _FIELDS},
+    )
+
+
+async def forget_row(db: AsyncSession, row) -> None:
+    """Satr o'chirilishidan oldin: hissasini ayiradi."""
+    await apply_delta(
+        db, student_id=row.student_id, teacher_id=row.teacher_id, school_id=row.school_id, day=row.date,
+        delta={f: -v for f, v in contrib(row).items()},
+    )
+
+
+async def forget_students(db: AsyncSession, student_id: Optional[int] = None) -> None:
+    """O'quvchi (None — barcha o'quvchilar) o'chirilishidan oldin: satrlari hissasini ayiradi."""
+    await db.execute(_FORGET_STUDENTS_SQL, {"student_id": student_id})
+
+
+async def rebuild(
+    db: AsyncSession,
+    date_from: dt_date,
+    date_to: dt_date,
+    school_id: Optional[int] = None,
+) -> int:
+    """
+    Oraliqni attendance'dan qayta hisoblaydi (DELETE + INSERT … SELECT); commit — chaqiruvchida.
+    Bir xil (maktab, kun) ni parallel rebuild qilayotganlar (masalan, ikki terminal replay'i)
+    tranzaksiya oxirigacha navbat kutadi; qulflar kunlar o'sish tartibida olinadi.
+    """
+    day = date_from
+    while day <= date_to:
+        if school_id is None:
+            await db.execute(_LOCK_SQL, {"k": f"attendance_summary:*:{day}"})
+        else:
+            await db.execute(_LOCK_SHARED_SQL, {"k": f"attendance_summary:*:{day}"})
+            await db.execute(_LOCK_SQL, {"k": f"attendance_summary:{school_id}:{day}"})
+        day += timedelta(days=1)
+
+    params = {"date_from": date_from, "date_to": date_to, "school_id": school_id}
+    await db.execute(_DELETE_RANGE_SQL, params)
+    result = await db.execute(_REBUILD_SQL, params)
+    return result.rowcount or 0
+
+
+async def month_view(
+    db: AsyncSession,
+    *,
+    school_id: int,
+    date_from: dt_date,
+    date_to: dt_date,
+    user_type: str = "student",
+    class_id: Optional[int] = None,
+    group_by: str = "day",
+) -> List[dict]:
+    """
+    Yig'indidan hisobot: group_by = day (kunlar) | class (sinflar, oraliq bo'yicha).
+    expected — joriy faol ro'yxat × maktab ishlagan kunlar; bucket'i yo'q sinflar ham.
+    """
+    key = "date" if group_by == "day" else "class_id"
+    rows = (await db.execute(
+        text(_MONTH_VIEW_SQL.format(key=key)),
+        {"school_id": school_id, "user_type": user_type, "date_from": date_from,
+         "date_to": date_to, "class_id": class_id},
+    )).all()
+    out = []
+    for r in rows:
+        present, expected = int(r.present or 0), int(r.expected or 0)
+        out.append({
+            key: r.key.isoformat() if key == "date" else r.key,
+            "present": present,
+            "late": int(r.late or 0),
+            "left": int(r.left_count or 0),
+            "absent": max(expected - present, 0),
+            "expected": expected,
+            "avg_late_minutes": round(r.late_minutes_sum / r.late, 1) if r.late else 0,
+            "attendance_rate": round(present / expected * 100, 1) if expected else None,
+            "days": int(r.days),
+        })
+    return out
@@ -0,0 +1,211 @@
+# app/services/face_dedupe.py
+"""
+Terminal "double-tap" dedupe ombori (FACE_DEDUPE_SEC oynasi).
+
+Ikki backend:
+  - memory   : worker ichidagi time-wheel, xotira chegarasi qat'iy (FACE_DEDUPE_MAX_KEYS)
+  - postgres : UNLOGGED `face_dedupe` jadvali — 3 ta gunicorn worker ham bir xil ko'radi.
+               Oldida lokal time-wheel turadi, shuning uchun takroriy urishlar DB ga bormaydi.
+Tanlash: FACE_DEDUPE_BACKEND=memory|postgres (default: postgres)
+"""
+import os
+import time as _time
+import logging
+import math
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger("uvicorn.error")
+
+DEDUPE_WINDOW_SEC = float(os.getenv("FACE_DEDUPE_SEC", "4"))
+DEDUPE_MAX_KEYS = int(os.getenv("FACE_DEDUPE_MAX_KEYS", "50000"))
+DEDUPE_BACKEND = os.getenv("FACE_DEDUPE_BACKEND", "postgres").lower()
+# postgres: eskirgan kalitlarni har N ta chaqiruvda tozalaymiz
+_PG_SWEEP_EVERY = int(os.getenv("FACE_DEDUPE_SWEEP_EVERY", "500"))
+
+
+class MemoryDedupe:
+    """
+    Time-wheel: har slot `resolution` soniyani qoplaydi, oyna tugagan slotlar
+    butunlay tashlanadi. Kalitlar soni `max_keys` dan oshsa eng eski slot
+    muddatidan oldin bo'shatiladi (xotira chegarasi).
+    """
+
+    def __init__(self, window_sec: float = DEDUPE_WINDOW_SEC, max_keys: int = DEDUPE_MAX_KEYS, resolution: float = 1.0):
+        self.window = window_sec
+        self.max_keys = max_keys
+        self.resolution = resolution
+        self.nslots = max(2, math.ceil(window_sec / resolution) + 1)
+        self._slots: List[Set[str]] = [set() for _ in range(self.nslots)]
+        self._index: Dict[str, Tuple[float, int]] = {}   # key -> (last_ts, tick)
+        self._tick: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.forced_evictions = 0
+
+    def _drop_slot(self, idx: int, upto_tick: int) -> int:
+        """Slotni bo'shatadi; `upto_tick` dan yangi belgilangan kalitlar saqlanadi."""
+        slot = self._slots[idx]
+        dropped = 0
+        for k in slot:
+            item = self._index.get(k)
+            if item is not None and item[1] <= upto_tick:
+                del self._index[k]
+                dropped += 1
+        slot.clear()
+        return dropped
+
+    def _advance(self, now: float) -> None:
+        tick = int(now // self.resolution)
+        if self._tick is None:
+            self._tick = tick
+            return
+        if tick <= self._tick:
+            return
+        # qayta ishlatiladigan slotlar (ko'pi bilan nslots ta) bo'shatiladi
+        steps = min(tick - self._tick, self.nslots)
+        horizon = tick - self.nslots
+        for t in range(tick - steps + 1, tick + 1):
+            self.evictions += self._drop_slot(t % self.nslots, horizon)
+        self._tick = tick
+
+    def _enforce_ceiling(self) -> None:
+        if len(self._index) < self.max_keys:
+            return
+        # eng eski tickdan boshlab bo'shatamiz
+        for t in range(self._tick - self.nslots + 1, self._tick + 1):
+            n = self._drop_slot(t % self.nslots, t)
+            self.forced_evictions += n
+            self.evictions += n
+            if len(self._index) < self.max_keys:
+                return
+
+    def seen(self, key: str, now: Optional[float] = None) -> bool:
+        """True — oyna ichida takror (skip qilinadi); aks holda kalit belgilanadi."""
+        now = _time.time() if now is None else now
+        self._advance(now)
+        item = self._index.get(key)
+        if item is not None and now - item[0] < self.window:
+            self.hits += 1
+            return True
+        self.misses += 1
+        self._enforce_ceiling()
+        self._index[key] = (now, self._tick)
+        self._slots[self._tick % self.nslots].add(key)
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "window_sec": self.window,
+            "keys": len(self._index),
+            "max_keys": self.max_keys,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "forced_evictions": self.forced_evictions,
+        }
+
+
+class PostgresDedupe:
+    """
+    Workerlararo dedupe: bitta `INSERT … ON CONFLICT DO UPDATE … WHERE` so'rovi.
+    Satr qaytsa — yangi urish, qaytmasa — oyna ichida takror.
+    """
+
+    _MARK_SQL = text(
+        """
+        INSERT INTO face_dedupe (key, seen_at) VALUES (:key, clock_timestamp())
+        ON CONFLICT (key) DO UPDATE SET seen_at = EXCLUDED.seen_at
+        WHERE face_dedupe.seen_at < EXCLUDED.seen_at - make_interval(secs => :window)
+        RETURNING 1
+        """
+    )
+    _SWEEP_SQL = text(
+        "DELETE FROM face_dedupe WHERE seen_at < clock_timestamp() - make_interval(secs => :window)"
+    )
+
+    def __init__(self, window_sec: float = DEDUPE_WINDOW_SEC, max_keys: int = DEDUPE_MAX_KEYS):
+        self.window = window_sec
+        self.local = MemoryDedupe(window_sec, max_keys)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        self._calls = 0
+
+    async def _mark(self, db: AsyncSession, key: str) -> bool:
+        fresh = (await db.execute(self._MARK_SQL, {"key": key, "window": self.window})).first()
+        self._calls += 1
+        if self._calls % _PG_SWEEP_EVERY == 0:
+            res = await db.execute(self._SWEEP_SQL, {"window": self.window})
+            self.evictions += res.rowcount or 0
+        # belgi boshqa workerlarga darhol ko'rinishi kerak
+        await db.commit()
+        return fresh is None
+
+    async def _mark_shared(self, key: str, db: Optional[AsyncSession]) -> bool:
+        if db is not None:
+            return await self._mark(db, key)
+        from app.db.session import async_session
+        async with async_session() as own:
+            return await self._mark(own, key)
+
+    async def seen(self, key: str, db: Optional[AsyncSession] = None) -> bool:
+        """
+        db — chaqiruvchining sessiyasi (so'rov uchun ikkinchi ulanish ochilmaydi).
+        Unda commit qilinadi, shuning uchun undan oldin yozilmagan o'zgarish bo'lmasin.
+        """
+        # shu worker allaqachon ko'rgan bo'lsa — DB ga bormaymiz
+        if self.local.seen(key):
+            self.hits += 1
+            return True
+        try:
+            dup = await self._mark_shared(key, db)
+        except Exception as e:
+            # jadval yo'q / DB band — lokal natija bilan davom etamiz
+            self.errors += 1
+            logger.warning("face_dedupe postgres xato, lokal rejim: %s", e)
+            if db is not None:
+                await db.rollback()
+            dup = False
+        if dup:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return dup
+
+    def stats(self) -> dict:
+        return {
+            "backend": "postgres",
+            "window_sec": self.window,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "errors": self.errors,
+            "local": self.local.stats(),
+        }
+
+
+class DedupeStore:
+    """Backend ustidagi yagona async interfeys (model: app.models.face_dedupe.FaceDedupe)."""
+
+    def __init__(self, backend: str = DEDUPE_BACKEND):
+        if backend == "memory":
+            self._impl = MemoryDedupe()
+        else:
+            self._impl = PostgresDedupe()
+
+    async def seen(self, key: str, db: Optional[AsyncSession] = None) -> bool:
+        if isinstance(self._impl, MemoryDedupe):
+            return self._impl.seen(key)
+        return await self._impl.seen(key, db)
+
+    def stats(self) -> dict:
+        return self._impl.stats()
+
+
+face_dedupe = DedupeStore()
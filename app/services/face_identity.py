@@ -0,0 +1,203 @@
+# app/services/face_identity.py
+"""
+face_terminal_id -> (role, id, school_id, ota-ona telefonlari) kesh.
+
+Terminal har bir hodisada Student/Teacher jadvaliga SELECT qilmasligi uchun
+worker ichida LRU+TTL kesh saqlanadi. Kesh startup'da isitiladi va
+crud/student.py, crud/teacher.py dagi yozish yo'llari tomonidan bekor qilinadi.
+Boshqa gunicorn workerlaridagi nusxalar esa TTL tugagach yangilanadi.
+"""
+import os
+import time as _time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select, literal, null, cast, String, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.student import Student
+from app.models.teacher import Teacher
+
+logger = logging.getLogger("uvicorn.error")
+
+CACHE_SIZE = int(os.getenv("FACE_IDENTITY_CACHE_SIZE", "20000"))
+CACHE_TTL_SEC = float(os.getenv("FACE_IDENTITY_TTL_SEC", "600"))
+# topilmagan ID lar (begona yuz) qisqa muddat eslab qolinadi
+NEGATIVE_TTL_SEC = float(os.getenv("FACE_IDENTITY_NEGATIVE_TTL_SEC", "30"))
+
+
+@dataclass(frozen=True, slots=True)
+class FacePerson:
+    """Terminal oqimi uchun yetarli bo'lgan ixcham yozuv (ORM obyekt emas)."""
+    role: str                      # "student" | "teacher"
+    id: int
+    school_id: Optional[int]
+    first_name: str = ""
+    last_name: str = ""
+    # yuborishga tayyor E.164 (Student.parent_*_e164)
+    parent_father_e164: Optional[str] = None
+    parent_mother_e164: Optional[str] = None
+
+
+def _student_select():
+    return select(
+        literal("student").label("role"),
+        Student.id,
+        Student.face_terminal_id,
+        Student.school_id,
+        Student.first_name,
+        Student.last_name,
+        Student.parent_father_e164,
+        Student.parent_mother_e164,
+    )
+
+
+def _teacher_select():
+    return select(
+        literal("teacher").label("role"),
+        Teacher.id,
+        Teacher.face_terminal_id,
+        Teacher.school_id,
+        Teacher.first_name,
+        Teacher.last_name,
+        cast(null(), String).label("parent_father_e164"),
+        cast(null(), String).label("parent_mother_e164"),
+    )
+
+
+def _row_to_person(row) -> FacePerson:
+    m = row._mapping
+    return FacePerson(
+        role=m["role"],
+        id=m["id"],
+        school_id=m["school_id"],
+        first_name=m["first_name"] or "",
+        last_name=m["last_name"] or "",
+        parent_father_e164=m["parent_father_e164"],
+        parent_mother_e164=m["parent_mother_e164"],
+    )
+
+
+class FaceIdentityCache:
+    def __init__(self, maxsize: int = CACHE_SIZE, ttl: float = CACHE_TTL_SEC, negative_ttl: float = NEGATIVE_TTL_SEC):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # face_id -> (expires_at, FacePerson | None)
+        self._data: "OrderedDict[int, Tuple[float, Optional[FacePerson]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get(self, face_id: int) -> Tuple[bool, Optional[FacePerson]]:
+        item = self._data.get(face_id)
+        if item is None:
+            return False, None
+        expires_at, person = item
+        if expires_at < _time.monotonic():
+            del self._data[face_id]
+            return False, None
+        self._data.move_to_end(face_id)
+        return True, person
+
+    def _put(self, face_id: int, person: Optional[FacePerson]) -> None:
+        ttl = self.ttl if person is not None else self.negative_ttl
+        self._data[face_id] = (_time.monotonic() + ttl, person)
+        self._data.move_to_end(face_id)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def resolve(self, db: AsyncSession, face_id: int) -> Optional[FacePerson]:
+        found, person = self._get(face_id)
+        if found:
+            self.hits += 1
+            return person
+
+        self.misses += 1
+        # Bitta so'rov: avval student, keyin teacher (eski tartib saqlanadi)
+        stmt = union_all(
+            _student_select().where(Student.face_terminal_id == face_id),
+            _teacher_select().where(Teacher.face_terminal_id == face_id),
+        )
+        rows = (await db.execute(stmt)).all()
+        rows.sort(key=lambda r: 0 if r._mapping["role"] == "student" else 1)
+        person = _row_to_person(rows[0]) if rows else None
+        self._put(face_id, person)
+        return person
+
+    async def resolve_many(self, db: AsyncSession, face_ids) -> Dict[int, Optional[FacePerson]]:
+        """Ko'p ID: keshda yo'qlari bitta `IN (...)` so'rovi bilan olinadi."""
+        out: Dict[int, Optional[FacePerson]] = {}
+        missing = []
+        for fid in set(face_ids):
+            found, person = self._get(fid)
+            if found:
+                self.hits += 1
+                out[fid] = person
+            else:
+                missing.append(fid)
+        if not missing:
+            return out
+
+        self.misses += len(missing)
+        stmt = union_all(
+            _teacher_select().where(Teacher.face_terminal_id.in_(missing)),
+            _student_select().where(Student.face_terminal_id.in_(missing)),
+        )
+        loaded: Dict[int, FacePerson] = {}
+        for row in (await db.execute(stmt)).all():
+            fid = row._mapping["face_terminal_id"]
+            # student ustun turadi
+            if fid not in loaded or row._mapping["role"] == "student":
+                loaded[fid] = _row_to_person(row)
+        for fid in missing:
+            person = loaded.get(fid)
+            self._put(fid, person)
+            out[fid] = person
+        return out
+
+    async def warm(self, db: AsyncSession) -> int:
+        """Faol face_terminal_id larni oldindan yuklaydi (student ustun turadi)."""
+        loaded = 0
+        for stmt in (
+            _teacher_select().where(Teacher.face_terminal_id.is_not(None)),
+            _student_select().where(Student.face_terminal_id.is_not(None)),
+        ):
+            for row in (await db.execute(stmt.limit(self.maxsize))).all():
+                self._put(row._mapping["face_terminal_id"], _row_to_person(row))
+                loaded += 1
+        return loaded
+
+    def invalidate(self, *face_ids: Optional[int]) -> None:
+        for fid in face_ids:
+            if fid is not None:
+                self._data.pop(int(fid), None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+face_identity = FaceIdentityCache()
+
+
+async def warm_face_identity() -> None:
+    """App startup'da chaqiriladi; DB xatosi appni yiqitmaydi."""
+    from app.db.session import async_session
+    try:
+        async with async_session() as db:
+            n = await face_identity.warm(db)
+        logger.info("face_identity: %s ta yozuv yuklandi", n)
+    except Exception as e:
+        logger.warning("face_identity warm-up o'tkazib yuborildi: %s", e)
@@ -0,0 +1,132 @@
+# app/services/face_ingest.py
+"""
+Terminal hodisalari uchun chegaralangan in-process navbat.
+
+Route hodisani tekshirib navbatga qo'yadi va darhol 200 qaytaradi; fon
+writer-task navbatni har FACE_INGEST_FLUSH_MS da bo'shatib, hodisalarni
+bitta tranzaksiyada (batch) qo'llaydi. Navbat to'lsa `offer()` False
+qaytaradi — route 503 + Retry-After beradi (backpressure).
+"""
+import os
+import asyncio
+import logging
+import time as _time
+from typing import Any, Awaitable, Callable, List, Optional
+
+logger = logging.getLogger("uvicorn.error")
+
+INGEST_QUEUE_MAX = int(os.getenv("FACE_INGEST_QUEUE_MAX", "5000"))
+INGEST_BATCH_MAX = int(os.getenv("FACE_INGEST_BATCH_MAX", "200"))
+INGEST_FLUSH_MS = float(os.getenv("FACE_INGEST_FLUSH_MS", "20"))
+INGEST_RETRY_AFTER_SEC = int(os.getenv("FACE_INGEST_RETRY_AFTER_SEC", "2"))
+
+
+class IngestQueue:
+    def __init__(
+        self,
+        apply_batch: Callable[[List[Any]], Awaitable[None]],
+        *,
+        maxsize: int = INGEST_QUEUE_MAX,
+        batch_max: int = INGEST_BATCH_MAX,
+        flush_ms: float = INGEST_FLUSH_MS,
+        name: str = "face_ingest",
+    ):
+        self.apply_batch = apply_batch
+        self.maxsize = maxsize
+        self.batch_max = batch_max
+        self.flush_sec = flush_ms / 1000.0
+        self.name = name
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # metrikalar
+        self.enqueued = 0
+        self.rejected = 0
+        self.applied = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.last_batch_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def offer(self, item: Any) -> bool:
+        """Navbatga qo'yadi; to'la bo'lsa (yoki writer ishlamasa) False."""
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        self.enqueued += 1
+        return True
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Qolgan hodisalarni yozib bo'lgach writer'ni to'xtatadi."""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("%s: %s ta hodisa yozilmay qoldi", self.name, self._queue.qsize())
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _collect(self) -> List[Any]:
+        batch = [await self._queue.get()]
+        deadline = _time.monotonic() + self.flush_sec
+        while len(batch) < self.batch_max:
+            remaining = deadline - _time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            started = _time.perf_counter()
+            try:
+                await self.apply_batch(batch)
+                self.applied += len(batch)
+            except Exception as e:
+                self.failed_batches += 1
+                logger.exception("%s: batch (%s ta) yozilmadi: %s", self.name, len(batch), e)
+            finally:
+                self.batches += 1
+                self.last_batch_size = len(batch)
+                self.max_batch_size = max(self.max_batch_size, len(batch))
+                self.last_batch_ms = round((_time.perf_counter() - started) * 1000, 2)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "maxsize": self.maxsize,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "applied": self.applied,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "avg_batch_size": round(self.applied / self.batches, 2) if self.batches else 0,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_size,
+            "last_batch_ms": self.last_batch_ms,
+        }
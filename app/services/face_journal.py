@@ -0,0 +1,314 @@
+# app/services/face_journal.py
+"""
+Terminal xom POST'lari uchun append-only jurnal (eski /face-terminal/dump o'rniga).
+
+Route yozuvni navbatga qo'yadi va kutmaydi; fon writer-task navbatni
+batch qilib thread'da yozadi. Har bir yozuv — bitta NDJSON qator:
+    {"time", "ip", "content_type", "user_agent", "content_length", "body" | "body_b64"}
+
+Segmentlar: FACE_RAW_LOG_DIR/journal-YYYYMMDD-HHMMSS-ffffff-<pid>.ndjson
+  - FACE_JOURNAL_SEGMENT_MB yoki FACE_JOURNAL_SEGMENT_SEC oshsa yangi segment ochiladi;
+  - yopilgan segment gzip qilinadi (.ndjson.gz), asl fayl o'chiriladi;
+  - fsync har FACE_JOURNAL_FSYNC_MS da bir marta (har yozuvda emas).
+Qayta o'ynatish: python -m app.scripts.replay_face_journal <segment>
+"""
+import os
+import gzip
+import json
+import base64
+import shutil
+import asyncio
+import logging
+import time as _time
+from datetime import datetime
+from typing import IO, Iterator, List, Optional
+
+logger = logging.getLogger("uvicorn.error")
+
+JOURNAL_DIR = os.getenv("FACE_RAW_LOG_DIR", "logs/face_raw")
+JOURNAL_SEGMENT_MB = float(os.getenv("FACE_JOURNAL_SEGMENT_MB", "64"))
+JOURNAL_SEGMENT_SEC = float(os.getenv("FACE_JOURNAL_SEGMENT_SEC", "3600"))
+JOURNAL_FSYNC_MS = float(os.getenv("FACE_JOURNAL_FSYNC_MS", "1000"))
+JOURNAL_QUEUE_MAX = int(os.getenv("FACE_JOURNAL_QUEUE_MAX", "10000"))
+JOURNAL_BATCH_MAX = int(os.getenv("FACE_JOURNAL_BATCH_MAX", "500"))
+# /face-terminal/log ga kelgan hodisa JSON'ini ham jurnalga yozish (default o'chiq)
+JOURNAL_LOG_EVENTS = os.getenv("FACE_JOURNAL_LOG_EVENTS", "0").lower() in ("1", "true", "yes")
+
+
+def encode_record(body: bytes, *, content_type: str = "", ip: Optional[str] = None,
+                  user_agent: Optional[str] = None, ts: Optional[datetime] = None) -> bytes:
+    """Bitta NDJSON qator. UTF-8 bo'lmagan body (rasmli multipart) base64 da saqlanadi."""
+    ts = ts or datetime.utcnow()
+    rec = {
+        "time": ts.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3] + "Z",
+        "ip": ip,
+        "content_type": content_type,
+        "user_agent": user_agent,
+        "content_length": len(body),
+    }
+    try:
+        rec["body"] = body.decode("utf-8")
+    except UnicodeDecodeError:
+        rec["body_b64"] = base64.b64encode(body).decode("ascii")
+    return json.dumps(rec, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def record_body(rec: dict) -> bytes:
+    if "body_b64" in rec:
+        return base64.b64decode(rec["body_b64"])
+    return (rec.get("body") or "").encode("utf-8")
+
+
+def iter_segment(path: str) -> Iterator[dict]:
+    """Segmentni (.ndjson yoki .ndjson.gz) qatorma-qator o'qiydi; buzuq qatorlar tashlanadi."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # yozilayotgan paytda uzilgan oxirgi qator
+                continue
+
+
+def _gzip_file(path: str) -> str:
+    gz_path = path + ".gz"
+    with open(path, "rb") as src, gzip.open(gz_path, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.remove(path)
+    return gz_path
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class FaceJournal:
+    def __init__(
+        self,
+        base_dir: str = JOURNAL_DIR,
+        *,
+        segment_mb: float = JOURNAL_SEGMENT_MB,
+        segment_sec: float = JOURNAL_SEGMENT_SEC,
+        fsync_ms: float = JOURNAL_FSYNC_MS,
+        maxsize: int = JOURNAL_QUEUE_MAX,
+    ):
+        self.base_dir = base_dir
+        self.segment_bytes = int(segment_mb * 1024 * 1024)
+        self.segment_sec = segment_sec
+        self.fsync_sec = fsync_ms / 1000.0
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: Optional[asyncio.Future] = None   # thread'dagi _write_batch / _idle_tick
+        self._stopping = False
+        self._file: Optional[IO[bytes]] = None
+        self._path: Optional[str] = None
+        self._opened_at = 0.0
+        self._size = 0
+        self._dirty = False
+        self._last_fsync = 0.0
+        # metrikalar
+        self.written = 0
+        self.dropped = 0
+        self.segments = 0
+        self.fsyncs = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def current_path(self) -> Optional[str]:
+        return self._path
+
+    def append(self, body: bytes, *, content_type: str = "", ip: Optional[str] = None,
+               user_agent: Optional[str] = None) -> bool:
+        """Yozuvni navbatga qo'yadi; navbat to'la yoki writer ishlamasa False."""
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(encode_record(body, content_type=content_type, ip=ip, user_agent=user_agent))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        os.makedirs(self.base_dir, exist_ok=True)
+        # oldingi ishga tushirishdan qolgan ochiq segmentlar
+        await asyncio.to_thread(self._compress_leftovers)
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="face_journal")
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Writer navbatni yozib bo'lib o'zi chiqadi; segment faqat undan keyin yopiladi."""
+        if not self.running:
+            return
+        self._stopping = True
+        try:
+            # bo'sh navbatda kutib turgan writer'ni uyg'otish
+            self._queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("face_journal: %s ta yozuv yozilmay qoldi", self._queue.qsize())
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        # bekor qilingan writer'ning thread'dagi yozuvi tugamaguncha fayl yopilmaydi
+        if self._inflight is not None:
+            await asyncio.wait([self._inflight])
+            self._inflight = None
+        await asyncio.to_thread(self._close_segment)
+
+    # ---------- thread ichida bajariladigan fayl amallari ----------
+
+    def _compress_leftovers(self) -> None:
+        for name in os.listdir(self.base_dir):
+            if not (name.startswith("journal-") and name.endswith(".ndjson")):
+                continue
+            # boshqa tirik workerlarning ochiq segmentlariga tegmaymiz
+            pid = name[:-len(".ndjson")].rsplit("-", 1)[-1]
+            if pid.isdigit() and int(pid) != os.getpid() and _pid_alive(int(pid)):
+                continue
+            try:
+                _gzip_file(os.path.join(self.base_dir, name))
+            except OSError as e:
+                logger.warning("face_journal: %s siqilmadi: %s", name, e)
+
+    def _open_segment(self) -> None:
+        name = f"journal-{datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')}-{os.getpid()}.ndjson"
+        self._path = os.path.join(self.base_dir, name)
+        self._file = open(self._path, "ab")
+        self._size = self._file.tell()
+        self._opened_at = _time.monotonic()
+        self._last_fsync = self._opened_at
+        self.segments += 1
+
+    def _close_segment(self) -> None:
+        if self._file is None:
+            return
+        path = self._path
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+        self._path = None
+        self._dirty = False
+        if self._size:
+            _gzip_file(path)
+        else:
+            os.remove(path)
+
+    def _write_batch(self, lines: List[bytes]) -> None:
+        now = _time.monotonic()
+        if self._file is not None and (
+            self._size >= self.segment_bytes or now - self._opened_at >= self.segment_sec
+        ):
+            self._close_segment()
+        if self._file is None:
+            self._open_segment()
+        data = b"".join(lines)
+        self._file.write(data)
+        self._size += len(data)
+        self._dirty = True
+        self._maybe_fsync(now)
+
+    def _maybe_fsync(self, now: float) -> None:
+        if self._file is None or not self._dirty or now - self._last_fsync < self.fsync_sec:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._dirty = False
+        self._last_fsync = now
+        self.fsyncs += 1
+
+    # ---------- writer ----------
+
+    async def _run(self) -> None:
+        while True:
+            if self._stopping and self._queue.empty():
+                return
+            try:
+                first = await asyncio.wait_for(self._queue.get(), self.fsync_sec)
+            except asyncio.TimeoutError:
+                # jim paytda ham fsync / vaqt bo'yicha rotatsiya ishlasin
+                try:
+                    await self._offload(self._idle_tick)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning("face_journal: %s", e)
+                continue
+
+            lines = [first]
+            while len(lines) < JOURNAL_BATCH_MAX and not self._queue.empty():
+                lines.append(self._queue.get_nowait())
+            # None — stop() signali
+            batch = [line for line in lines if line is not None]
+            try:
+                if batch:
+                    await self._offload(self._write_batch, batch)
+                    self.written += len(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning("face_journal: %s ta yozuv yozilmadi: %s", len(batch), e)
+            finally:
+                for _ in lines:
+                    self._queue.task_done()
+
+    async def _offload(self, fn, *args) -> None:
+        """
+        Segmentga tegadigan thread ishi (yozuv, idle fsync/rotatsiya). shield: writer bekor
+        qilinsa ham thread'dagi ish `_inflight` da qoladi — stop() uni kutib, keyin yopadi.
+        """
+        fut = self._inflight = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+        try:
+            await asyncio.shield(fut)
+        finally:
+            if fut.done() and self._inflight is fut:
+                self._inflight = None
+
+    def _idle_tick(self) -> None:
+        now = _time.monotonic()
+        if self._file is not None and now - self._opened_at >= self.segment_sec:
+            self._close_segment()
+        else:
+            self._maybe_fsync(now)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "log_events": JOURNAL_LOG_EVENTS,
+            "segment": self._path,
+            "segment_mb": round(self._size / 1024 / 1024, 2) if self._file is not None else 0,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "segments": self.segments,
+            "fsyncs": self.fsyncs,
+            "errors": self.errors,
+        }
+
+
+face_journal = FaceJournal()
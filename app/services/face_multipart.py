@@ -0,0 +1,154 @@
+# app/services/face_multipart.py
+"""
+Face terminal multipart POST'lari uchun oqimli (streaming) o'quvchi.
+
+Starlette `request.form()` har bir so'rovda barcha qismlarni (JPEG ham)
+SpooledTemporaryFile'larga buferlaydi. Bu yerda body bo'laklab
+python-multipart parseriga beriladi va faqat JSON qismi (event_log /
+AccessControllerEvent / json / payload) xotirada yig'iladi. Rasm qismlari
+FACE_SNAPSHOT_MODE ga qarab tashlanadi yoki snapshot omboriga uzatiladi.
+"""
+import os
+import re
+from typing import AsyncIterator, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException, Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from app.services.face_snapshots import snapshot_store, SNAPSHOT_MAX_BYTES
+
+JSON_FIELDS = ("event_log", "AccessControllerEvent", "json", "payload")
+MAX_JSON_BYTES = int(os.getenv("FACE_MAX_JSON_BYTES", str(256 * 1024)))
+
+_EMP_RE = re.compile(rb'"employeeNo(?:String)?"\s*:\s*"?(\d{1,20})')
+
+
+class _PartCollector:
+    """python-multipart callback'lari: faqat kerakli qismlar xotiraga olinadi."""
+
+    def __init__(self, fields: Sequence[str], keep_images: bool):
+        self.fields = tuple(fields)
+        self.keep_images = keep_images
+        self.texts: Dict[str, bytes] = {}
+        self.images: List[bytes] = []
+        self.done = False          # eng ustuvor JSON qismi (fields[0]) to'liq o'qildi
+        self._hdr_field = b""
+        self._hdr_value = b""
+        self._headers: Dict[bytes, bytes] = {}
+        self._name: Optional[str] = None
+        self._is_file = False
+        self._buf: Optional[bytearray] = None
+        self._too_large = False
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+        self._name = None
+        self._is_file = False
+        self._buf = None
+        self._too_large = False
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._hdr_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._hdr_value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._hdr_field.lower()] = self._hdr_value
+        self._hdr_field = b""
+        self._hdr_value = b""
+
+    def on_headers_finished(self) -> None:
+        _, opts = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = opts.get(b"name")
+        self._name = name.decode("latin-1") if name else None
+        ctype = self._headers.get(b"content-type", b"").lower()
+
+        # JSON maydoni filename= bilan kelsa ham JSON (request.form() + read() kabi)
+        if self._name in self.fields:
+            self._buf = bytearray()
+            return
+        self._is_file = b"filename" in opts or ctype.startswith(b"image/")
+        if self._is_file:
+            # rasm: faqat store rejimida, chegaralangan hajmda
+            self._buf = bytearray() if self.keep_images else None
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._buf is None:
+            return
+        limit = SNAPSHOT_MAX_BYTES if self._is_file else MAX_JSON_BYTES
+        if len(self._buf) + (end - start) > limit:
+            self._too_large = True
+            self._buf = None
+            return
+        self._buf += data[start:end]
+
+    def on_part_end(self) -> None:
+        if self._too_large and not self._is_file:
+            raise HTTPException(status_code=413, detail=f"JSON qismi {MAX_JSON_BYTES} baytdan katta")
+        if self._buf is None:
+            return
+        if self._is_file:
+            self.images.append(bytes(self._buf))
+        else:
+            self.texts.setdefault(self._name, bytes(self._buf))
+            # undan keyingi qismlarda ustuvorroq maydon bo'lishi mumkin — faqat birinchisida to'xtaymiz
+            self.done = self.fields[0] in self.texts
+        self._buf = None
+
+    def event_bytes(self) -> Optional[bytes]:
+        """`fields` tartibidagi birinchi mavjud maydon (event_log > AccessControllerEvent > …)."""
+        for name in self.fields:
+            if name in self.texts:
+                return self.texts[name]
+        return None
+
+
+async def read_event_bytes(request: Request, fields: Sequence[str] = JSON_FIELDS) -> Optional[bytes]:
+    """
+    multipart/form-data body'dan JSON qismining xom baytlari (topilmasa None).
+    Rasm qismlari xotirada to'planmaydi (store rejimida — SNAPSHOT_MAX_BYTES gacha).
+    """
+    return await extract_event_bytes(request.stream(), request.headers.get("content-type") or "", fields)
+
+
+async def extract_event_bytes(chunks: AsyncIterator[bytes], ctype: str, fields: Sequence[str] = JSON_FIELDS) -> Optional[bytes]:
+    """read_event_bytes'ning yadrosi: ixtiyoriy bayt oqimi ustida (jurnal replay ham ishlatadi)."""
+    _, params = parse_options_header(ctype)
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="multipart boundary yo‘q")
+
+    collector = _PartCollector(fields, keep_images=snapshot_store.enabled)
+    parser = MultipartParser(boundary, collector.callbacks())
+    async for chunk in chunks:
+        if collector.done and not collector.keep_images:
+            # eng ustuvor JSON olindi, rasm kerak emas — qolganini parse qilmasdan o'qib tashlaymiz
+            continue
+        if chunk:
+            parser.write(chunk)
+    if not collector.done or collector.keep_images:
+        parser.finalize()
+
+    raw = collector.event_bytes()
+    if collector.images:
+        m = _EMP_RE.search(raw or b"")
+        hint = m.group(1).decode() if m else "unknown"
+        for img in collector.images:
+            snapshot_store.offer(img, hint)
+    return raw
@@ -0,0 +1,296 @@
+# app/services/face_names.py
+"""
+Terminal yuborgan ism bo'yicha odamni topish (logV2 dagi ID fallback'i).
+
+`name_key()` — ismning normallashtirilgan kaliti: kichik harf, kirill -> lotin
+transliteratsiya, apostroflar tashlanadi va ko'p uchraydigan imlo farqlari
+birlashtiriladi (x/h, q/k, iy/i, dj/j, qo'sh harflar). Tokenlar saralanadi,
+shuning uchun "Ali Valiyev" va "Валиев Али" bir xil kalit beradi.
+Kalit students.name_key / teachers.name_key ustunlarida saqlanadi (btree + trigram).
+
+`FaceNameIndex` — worker ichidagi maktab bo'yicha `kalit -> {(rol, id)}` xaritasi.
+crud/student.py va crud/teacher.py yozish yo'llari uni darhol yangilaydi. Boshqa
+workerlardagi o'zgarishlar fon vazifasida (asyncio.Lock ostida, so'rov yo'lidan
+tashqarida) olinadi:
+  - har FACE_NAME_INDEX_REFRESH_SEC — faqat updated_at > watermark satrlar;
+  - har FACE_NAME_INDEX_FULL_SEC — to'liq qayta yuklash (boshqa workerda o'chirilganlar).
+Faqat birinchi yuklash so'rov ichida bo'ladi (parallel so'rovlar bitta yuklashni kutadi).
+Xaritada topilmasa — trigram o'xshashlik so'rovi (imlo xatolari uchun).
+"""
+import os
+import re
+import asyncio
+import time as _time
+import logging
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import select, func, literal, literal_column, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.student import Student
+from app.models.teacher import Teacher
+
+logger = logging.getLogger("uvicorn.error")
+
+NAME_INDEX_REFRESH_SEC = float(os.getenv("FACE_NAME_INDEX_REFRESH_SEC", "60"))
+NAME_INDEX_FULL_SEC = float(os.getenv("FACE_NAME_INDEX_FULL_SEC", "3600"))
+# watermark'dan biroz orqaga: kech commit bo'lgan tranzaksiyalar tushib qolmasin
+_WATERMARK_OVERLAP = timedelta(seconds=30)
+# trigram fallback: pg_trgm similarity() chegarasi (0 = o'chiq)
+NAME_SIMILARITY = float(os.getenv("FACE_NAME_SIMILARITY", "0.6"))
+NAME_KEY_MAXLEN = 120
+
+_CYR = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo", "ж": "j",
+    "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m", "н": "n", "о": "o",
+    "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "x", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "", "ы": "i", "ь": "", "э": "e", "ю": "yu",
+    "я": "ya", "ў": "o", "қ": "q", "ғ": "g", "ҳ": "h",
+}
+# ‘ ’ ʻ ʼ ` ' va h.k. — o‘/g‘ dagi belgi
+_APOSTROPHES = re.compile(r"[‘’ʻʼ`´']")
+_FOLDS = (
+    ("kh", "h"), ("x", "h"), ("q", "k"), ("dj", "j"), ("iy", "i"), ("yev", "ev"),
+)
+_DOUBLE = re.compile(r"([a-z])\1+")
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def _fold_token(tok: str) -> str:
+    for a, b in _FOLDS:
+        tok = tok.replace(a, b)
+    return _DOUBLE.sub(r"\1", tok)
+
+
+def name_tokens(*parts: Optional[str]) -> Tuple[str, ...]:
+    text = " ".join(p for p in parts if p)
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(_CYR.get(ch, ch) for ch in text)
+    text = _APOSTROPHES.sub("", text)
+    # qolgan diakritikalar (ş, ç, ö ...)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return tuple(t for t in (_fold_token(t) for t in _NON_ALNUM.split(text)) if t)
+
+
+def name_key(*parts: Optional[str]) -> Optional[str]:
+    """Ism(lar) -> indekslanadigan kalit (tokenlar saralangan); bo'sh bo'lsa None."""
+    toks = name_tokens(*parts)
+    if not toks:
+        return None
+    return " ".join(sorted(toks))[:NAME_KEY_MAXLEN]
+
+
+Ref = Tuple[str, int]          # ("student" | "teacher", id)
+
+
+class FaceNameIndex:
+    def __init__(self, refresh_sec: float = NAME_INDEX_REFRESH_SEC, full_sec: float = NAME_INDEX_FULL_SEC):
+        self.refresh_sec = refresh_sec
+        self.full_sec = full_sec
+        # school_id -> kalit -> {(rol, id)}
+        self._by_school: Dict[Optional[int], Dict[str, Set[Ref]]] = {}
+        # maktabsiz qidiruv uchun umumiy xarita
+        self._all: Dict[str, Set[Ref]] = {}
+        # (rol, id) -> (school_id, kalitlar) — o'chirish/yangilash uchun
+        self._refs: Dict[Ref, Tuple[Optional[int], Tuple[str, ...]]] = {}
+        self._loaded_at: Optional[float] = None     # oxirgi (to'liq yoki qisman) yangilash
+        self._full_at: Optional[float] = None
+        self._watermark: Optional[datetime] = None   # DB vaqti: shundan keyingi o'zgarishlar olinmagan
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.ambiguous = 0
+        self.fuzzy_hits = 0
+        self.reloads = 0
+        self.syncs = 0
+        self.errors = 0
+
+    # ---------- xarita ----------
+
+    @staticmethod
+    def _keys(first_name: Optional[str], last_name: Optional[str]) -> Tuple[str, ...]:
+        # to'liq ism + alohida ism/familiya (eski ilike(first|last) xatti-harakati)
+        keys = [name_key(first_name, last_name), name_key(first_name), name_key(last_name)]
+        return tuple(dict.fromkeys(k for k in keys if k))
+
+    def put(self, role: str, pid: int, school_id: Optional[int], first_name: Optional[str], last_name: Optional[str]) -> None:
+        ref = (role, pid)
+        self.remove(role, pid)
+        keys = self._keys(first_name, last_name)
+        school = self._by_school.setdefault(school_id, {})
+        for k in keys:
+            school.setdefault(k, set()).add(ref)
+            self._all.setdefault(k, set()).add(ref)
+        self._refs[ref] = (school_id, keys)
+
+    def remove(self, role: str, pid: int) -> None:
+        old = self._refs.pop((role, pid), None)
+        if old is None:
+            return
+        school_id, keys = old
+        school = self._by_school.get(school_id, {})
+        for k in keys:
+            for m in (school, self._all):
+                refs = m.get(k)
+                if refs is not None:
+                    refs.discard((role, pid))
+                    if not refs:
+                        del m[k]
+
+    def clear(self) -> None:
+        self._by_school.clear()
+        self._all.clear()
+        self._refs.clear()
+        self._loaded_at = None
+        self._full_at = None
+        self._watermark = None
+
+    @staticmethod
+    def _rows_stmt(since: Optional[datetime] = None):
+        parts = []
+        for role, model in (("student", Student), ("teacher", Teacher)):
+            q = select(literal(role).label("role"), model.id, model.school_id, model.first_name, model.last_name)
+            if since is not None:
+                q = q.where(model.updated_at >= since)
+            parts.append(q)
+        return union_all(*parts)
+
+    async def reload(self, db: AsyncSession) -> int:
+        """To'liq qayta yuklash."""
+        now = (await db.execute(select(func.now()))).scalar()
+        rows = (await db.execute(self._rows_stmt())).all()
+        self._by_school.clear()
+        self._all.clear()
+        self._refs.clear()
+        for role, pid, school_id, first, last in rows:
+            self.put(role, pid, school_id, first, last)
+        self._watermark = now
+        self._loaded_at = self._full_at = _time.monotonic()
+        self.reloads += 1
+        return len(rows)
+
+    async def sync(self, db: AsyncSession) -> int:
+        """Watermark'dan keyin o'zgargan (yoki qo'shilgan) satrlar; watermark yo'q bo'lsa — to'liq."""
+        if self._watermark is None:
+            return await self.reload(db)
+        now = (await db.execute(select(func.now()))).scalar()
+        rows = (await db.execute(self._rows_stmt(self._watermark - _WATERMARK_OVERLAP))).all()
+        for role, pid, school_id, first, last in rows:
+            self.put(role, pid, school_id, first, last)
+        self._watermark = now
+        self._loaded_at = _time.monotonic()
+        self.syncs += 1
+        return len(rows)
+
+    async def _refresh(self) -> None:
+        from app.db.session import async_session
+
+        async with self._lock:
+            try:
+                async with async_session() as db:
+                    if self._full_at is None or _time.monotonic() - self._full_at > self.full_sec:
+                        await self.reload(db)
+                    else:
+                        await self.sync(db)
+            except Exception as e:
+                self.errors += 1
+                logger.warning("face_names: indeks yangilanmadi: %s", e)
+
+    def _schedule_refresh(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh(), name="face_names_refresh")
+
+    async def _ensure_loaded(self, db: AsyncSession) -> None:
+        if self._loaded_at is None:
+            # birinchi yuklash: bitta so'rov yuklaydi, qolganlari lock'da kutadi
+            async with self._lock:
+                if self._loaded_at is None:
+                    await self.reload(db)
+        elif _time.monotonic() - self._loaded_at > self.refresh_sec:
+            self._schedule_refresh()
+
+    # ---------- qidiruv ----------
+
+    @staticmethod
+    def _pick(refs: Iterable[Ref]) -> Tuple[Optional[Ref], bool]:
+        """Student ustun turadi; bir nechta nomzod bo'lsa — noaniq (None, True)."""
+        refs = set(refs)
+        students = [r for r in refs if r[0] == "student"]
+        pool = students or [r for r in refs if r[0] == "teacher"]
+        if len(pool) == 1:
+            return pool[0], False
+        return None, len(pool) > 1
+
+    async def lookup(self, db: AsyncSession, posted_name: str, school_id: Optional[int] = None) -> Tuple[Optional[Ref], bool]:
+        """
+        return: ((rol, id) | None, ambiguous)
+        Avval xotiradagi xarita (O(1)), topilmasa name_key ustunida trigram qidiruv.
+        """
+        key = name_key(posted_name)
+        if not key:
+            return None, False
+        await self._ensure_loaded(db)
+
+        m = self._by_school.get(school_id, {}) if school_id is not None else self._all
+        refs = m.get(key)
+        if refs:
+            ref, ambiguous = self._pick(refs)
+            if ref is not None:
+                self.hits += 1
+                return ref, False
+            self.ambiguous += 1
+            return None, ambiguous
+
+        self.misses += 1
+        ref = await self._fuzzy(db, key, school_id) if NAME_SIMILARITY > 0 else None
+        if ref is not None:
+            self.fuzzy_hits += 1
+        return ref, False
+
+    async def _fuzzy(self, db: AsyncSession, key: str, school_id: Optional[int]) -> Optional[Ref]:
+        """pg_trgm: `name_key % :key` (gin_trgm_ops indeksi), eng o'xshash 2 ta nomzod."""
+        parts = []
+        for role, model in (("student", Student), ("teacher", Teacher)):
+            sim = func.similarity(model.name_key, key)
+            q = (
+                select(literal(role).label("role"), model.id.label("id"), sim.label("sim"))
+                .where(model.name_key.op("%")(key), sim >= NAME_SIMILARITY)
+            )
+            if school_id is not None:
+                q = q.where(model.school_id == school_id)
+            parts.append(q)
+        stmt = union_all(*parts).order_by(literal_column("sim").desc()).limit(2)
+        try:
+            rows = (await db.execute(stmt)).all()
+        except Exception as e:
+            # pg_trgm o'rnatilmagan bo'lsa — fallback o'chadi
+            logger.warning("face_names trigram qidiruv ishlamadi: %s", e)
+            await db.rollback()
+            return None
+        if not rows:
+            return None
+        # ikkinchi nomzod ham xuddi shunday o'xshash bo'lsa — tanlamaymiz
+        if len(rows) > 1 and rows[1].sim >= rows[0].sim:
+            return None
+        return (rows[0].role, rows[0].id)
+
+    def stats(self) -> dict:
+        return {
+            "schools": len(self._by_school),
+            "people": len(self._refs),
+            "keys": len(self._all),
+            "hits": self.hits,
+            "misses": self.misses,
+            "ambiguous": self.ambiguous,
+            "fuzzy_hits": self.fuzzy_hits,
+            "reloads": self.reloads,
+            "syncs": self.syncs,
+            "errors": self.errors,
+        }
+
+
+face_names = FaceNameIndex()
@@ -0,0 +1,62 @@
+# app/services/face_prefilter.py
+"""
+Terminal POST'larini to'liq parse qilishdan oldin arzon filtr.
+
+Heartbeat va subEventType != 75 hodisalar trafikning katta qismi. Ular uchun
+`request.form()` / `json.loads` qilmasdan, xom body'ning boshidagi
+`"eventType"` va `"subEventType"` markerlarini qidiramiz. Faqat aniq
+bo'lgan holatda skip qilinadi; shubha bo'lsa — to'liq parse yo'liga tushadi.
+"""
+import os
+import re
+from collections import Counter
+from typing import Iterable, Optional
+
+# multipart'da JSON qismi odatda rasmdan oldin keladi — faqat boshini ko'ramiz
+SCAN_BYTES = int(os.getenv("FACE_PREFILTER_SCAN_BYTES", "16384"))
+ACCEPT_SUB_EVENT = 75
+
+_EVENT_TYPE_RE = re.compile(rb'"eventType"\s*:\s*"([^"]{0,64})"')
+_SUB_EVENT_RE = re.compile(rb'"subEventType"\s*:\s*(-?\d+)')
+
+# reason -> soni; stage: "prefilter" (parse'siz) yoki "parsed" (to'liq parse'dan keyin)
+skip_counts: Counter = Counter()
+
+
+def prefilter(body: bytes, event_types: Optional[Iterable[str]] = ("AccessControllerEvent",)) -> Optional[str]:
+    """Skip sababi (masalan "subEventType=21") yoki None — to'liq parse kerak."""
+    head = body[:SCAN_BYTES]
+
+    if event_types is not None and b'"eventType"' in head:
+        m = _EVENT_TYPE_RE.search(head)
+        if m:
+            evt_type = m.group(1).decode("latin-1")
+            if evt_type not in event_types:
+                return _skip(f"eventType={evt_type}")
+
+    if b'"subEventType"' not in head:
+        return None
+    m = _SUB_EVENT_RE.search(head)
+    if m is None:
+        return None
+    sub = int(m.group(1))
+    if sub != ACCEPT_SUB_EVENT:
+        return _skip(f"subEventType={sub}")
+    return None
+
+
+def _skip(reason: str) -> str:
+    skip_counts[("prefilter", reason)] += 1
+    return reason
+
+
+def record_parsed_skip(reason: str) -> None:
+    """Prefilter'dan o'tib, to'liq parse'dan keyin skip bo'lganlar (filtr samaradorligi uchun)."""
+    skip_counts[("parsed", reason)] += 1
+
+
+def stats() -> dict:
+    out: dict = {"prefilter": {}, "parsed": {}}
+    for (stage, reason), n in skip_counts.most_common():
+        out[stage][reason] = n
+    return out
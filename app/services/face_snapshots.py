@@ -0,0 +1,127 @@
+# app/services/face_snapshots.py
+"""
+Terminal yuz suratlari (JPEG) uchun lokal ombor.
+
+FACE_SNAPSHOT_MODE=drop (default) — rasmlar umuman saqlanmaydi.
+FACE_SNAPSHOT_MODE=store — rasmlar fon writer orqali
+    FACE_SNAPSHOT_DIR/YYYY-MM-DD/HHMMSS_ffffff_<employeeNo>.jpg
+ga yoziladi. Umumiy hajm FACE_SNAPSHOT_QUOTA_MB dan oshsa yangi rasmlar tashlab yuboriladi.
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+logger = logging.getLogger("uvicorn.error")
+
+SNAPSHOT_MODE = os.getenv("FACE_SNAPSHOT_MODE", "drop").lower()
+SNAPSHOT_DIR = os.getenv("FACE_SNAPSHOT_DIR", "logs/face_snapshots")
+SNAPSHOT_QUOTA_MB = int(os.getenv("FACE_SNAPSHOT_QUOTA_MB", "2048"))
+# bitta rasm uchun so'rov xotirasi chegarasi
+SNAPSHOT_MAX_BYTES = int(os.getenv("FACE_SNAPSHOT_MAX_BYTES", str(512 * 1024)))
+SNAPSHOT_QUEUE_MAX = int(os.getenv("FACE_SNAPSHOT_QUEUE_MAX", "200"))
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class SnapshotStore:
+    def __init__(self, mode: str = SNAPSHOT_MODE, base_dir: str = SNAPSHOT_DIR, quota_mb: int = SNAPSHOT_QUOTA_MB):
+        self.mode = mode
+        self.base_dir = base_dir
+        self.quota_bytes = quota_mb * 1024 * 1024
+        self.used_bytes = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.saved = 0
+        self.dropped_quota = 0
+        self.dropped_queue = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode == "store"
+
+    def offer(self, data: bytes, hint: str = "unknown") -> bool:
+        """Rasmni yozish navbatiga qo'yadi; navbat to'la yoki kvota tugagan bo'lsa False."""
+        if not self.enabled or self._queue is None:
+            return False
+        if self.used_bytes + len(data) > self.quota_bytes:
+            self.dropped_quota += 1
+            return False
+        try:
+            self._queue.put_nowait((datetime.now(), hint, data))
+        except asyncio.QueueFull:
+            self.dropped_queue += 1
+            return False
+        return True
+
+    async def start(self) -> None:
+        if not self.enabled or self._task is not None:
+            return
+        os.makedirs(self.base_dir, exist_ok=True)
+        self.used_bytes = await asyncio.to_thread(_dir_size, self.base_dir)
+        self._queue = asyncio.Queue(maxsize=SNAPSHOT_QUEUE_MAX)
+        self._task = asyncio.create_task(self._run(), name="face_snapshots")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), 5)
+        except asyncio.TimeoutError:
+            pass
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _write(self, ts: datetime, hint: str, data: bytes) -> None:
+        day_dir = os.path.join(self.base_dir, ts.strftime("%Y-%m-%d"))
+        os.makedirs(day_dir, exist_ok=True)
+        safe_hint = "".join(ch for ch in hint if ch.isalnum())[:32] or "unknown"
+        path = os.path.join(day_dir, f"{ts.strftime('%H%M%S_%f')}_{safe_hint}.jpg")
+        with open(path, "wb") as f:
+            f.write(data)
+
+    async def _run(self) -> None:
+        while True:
+            ts, hint, data = await self._queue.get()
+            try:
+                if self.used_bytes + len(data) > self.quota_bytes:
+                    self.dropped_quota += 1
+                else:
+                    await asyncio.to_thread(self._write, ts, hint, data)
+                    self.used_bytes += len(data)
+                    self.saved += 1
+            except Exception as e:
+                self.errors += 1
+                logger.warning("face snapshot yozilmadi: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "saved": self.saved,
+            "used_mb": round(self.used_bytes / 1024 / 1024, 2),
+            "quota_mb": self.quota_bytes // (1024 * 1024),
+            "dropped_quota": self.dropped_quota,
+            "dropped_queue": self.dropped_queue,
+            "errors": self.errors,
+            "depth": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+snapshot_store = SnapshotStore()
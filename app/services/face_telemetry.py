@@ -0,0 +1,317 @@
+# app/services/face_telemetry.py
+"""
+Face terminal qurilmalari bo'yicha telemetriya (shu worker bo'yicha).
+
+Qurilma kaliti: `?device=<serial>` yoki `X-Device-Serial` header (terminal URL'ida
+berib qo'yiladi), bo'lmasa mijoz IP'si (`ip:10.0.0.5`). Serial `Device` jadvali
+orqali nom va maktabga bog'lanadi (metrikalar so'ralganda, hot-path'da emas).
+
+Har bir qurilma uchun:
+  - so'rov latency gistogrammasi va DB vaqti gistogrammasi (ms);
+  - so'rov natijalari hisobi (har so'rov — bitta): dedupe_window, block_minutes,
+    subEventType=…, unknown_user, inserted, departed, queued, ...;
+  - navbat rejimida writer natijalari alohida hisobda (`events`,
+    face_terminal_events_total) — so'rovlar soni ikki marta sanalmaydi;
+  - oxirgi 60 soniyadagi hodisa tezligi (jonli ko'rinish).
+DB vaqti SQLAlchemy cursor event'lari orqali contextvar'ga yig'iladi.
+"""
+import os
+import time as _time
+import logging
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, Request
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.device import Device
+
+logger = logging.getLogger("uvicorn.error")
+
+TELEMETRY_MAX_DEVICES = int(os.getenv("FACE_TELEMETRY_MAX_DEVICES", "500"))
+DEVICE_DIRECTORY_TTL_SEC = float(os.getenv("FACE_DEVICE_DIRECTORY_TTL_SEC", "300"))
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+RATE_WINDOW_SEC = 60
+
+# record_terminal_pass natijasi -> telemetriya nomi
+APPLIED_OUTCOMES = {
+    "arrived": "inserted",
+    "arrival_fixed": "arrival_fixed",
+    "departed": "departed",
+    "block_minutes": "block_minutes",
+    "already_set": "already_set",
+}
+
+# joriy so'rov/task: [DB soniyalari], natija
+_db_seconds: ContextVar[Optional[list]] = ContextVar("face_db_seconds", default=None)
+_outcome: ContextVar[Optional[str]] = ContextVar("face_outcome", default=None)
+_observing: ContextVar[bool] = ContextVar("face_observing", default=False)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)   # oxirgisi: +Inf
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, value: float) -> None:
+        for i, b in enumerate(self.buckets):
+            if value <= b:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.total += value
+        self.n += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Bucket chegarasi bo'yicha taxminiy kvantil."""
+        if not self.n:
+            return None
+        rank = q * self.n
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= rank:
+                return float(self.buckets[i]) if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.n,
+            "avg": round(self.total / self.n, 2) if self.n else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.counts)),
+        }
+
+
+class _Rate:
+    """1 soniyalik slotlar halqasi — oxirgi RATE_WINDOW_SEC soniya."""
+
+    def __init__(self, window: int = RATE_WINDOW_SEC):
+        self.window = window
+        self.slots = [0] * window
+        self.tick = 0
+
+    def _advance(self, now: int) -> None:
+        if now - self.tick >= self.window:
+            self.slots = [0] * self.window
+        else:
+            for t in range(self.tick + 1, now + 1):
+                self.slots[t % self.window] = 0
+        self.tick = max(self.tick, now)
+
+    def hit(self) -> None:
+        now = int(_time.time())
+        if now != self.tick:
+            self._advance(now)
+        self.slots[now % self.window] += 1
+
+    def per_sec(self, last: int) -> float:
+        now = int(_time.time())
+        self._advance(now)
+        last = min(last, self.window)
+        return round(sum(self.slots[(now - i) % self.window] for i in range(last)) / last, 2)
+
+
+class DeviceTelemetry:
+    def __init__(self, key: str):
+        self.key = key
+        self.latency = Histogram()
+        self.db = Histogram()
+        self.outcomes: Counter = Counter()     # so'rov natijalari
+        self.events: Counter = Counter()       # navbat writer'i natijalari
+        self.rate = _Rate()
+        self.last_seen: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "last_seen": self.last_seen,
+            "requests": self.latency.n,
+            "rate_10s": self.rate.per_sec(10),
+            "rate_60s": self.rate.per_sec(60),
+            "latency_ms": self.latency.to_dict(),
+            "db_ms": self.db.to_dict(),
+            "outcomes": dict(self.outcomes),
+            "events": dict(self.events),
+        }
+
+
+class FaceTelemetry:
+    def __init__(self, max_devices: int = TELEMETRY_MAX_DEVICES):
+        self.max_devices = max_devices
+        self.devices: Dict[str, DeviceTelemetry] = {}
+        # serial_number -> {"device_id", "name", "school_id"}
+        self._directory: Dict[str, dict] = {}
+        self._directory_at: Optional[float] = None
+        self._installed = False
+
+    # ---------- DB vaqti ----------
+
+    def install(self, sync_engine) -> None:
+        """Engine'ga cursor event'larini ulaydi (bir marta)."""
+        if self._installed:
+            return
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("face_t0", []).append(_time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            stack = conn.info.get("face_t0")
+            if not stack:
+                return
+            elapsed = _time.perf_counter() - stack.pop()
+            acc = _db_seconds.get()
+            if acc is not None:
+                acc[0] += elapsed
+
+        self._installed = True
+
+    @staticmethod
+    def db_seconds() -> float:
+        """Joriy task'da shu paytgacha DB da o'tgan vaqt (soniya)."""
+        acc = _db_seconds.get()
+        if acc is None:
+            acc = [0.0]
+            _db_seconds.set(acc)
+        return acc[0]
+
+    # ---------- qurilma kaliti ----------
+
+    @staticmethod
+    def device_key(request: Request) -> str:
+        serial = request.query_params.get("device") or request.headers.get("x-device-serial")
+        if serial:
+            return serial.strip()[:100]
+        ip = request.client.host if request.client else "unknown"
+        return f"ip:{ip}"
+
+    def _device(self, key: str) -> DeviceTelemetry:
+        dev = self.devices.get(key)
+        if dev is None:
+            if len(self.devices) >= self.max_devices:
+                key = "other"
+                dev = self.devices.get(key)
+            if dev is None:
+                dev = self.devices[key] = DeviceTelemetry(key)
+        return dev
+
+    # ---------- yozish ----------
+
+    async def observe(self, key: str, call):
+        """Route tanasini o'lchaydi: latency, DB vaqti va natija."""
+        _outcome.set(None)
+        _observing.set(True)
+        db0 = self.db_seconds()
+        started = _time.perf_counter()
+        outcome = "error"
+        try:
+            result = await call
+            outcome = _outcome.get() or _result_outcome(result)
+            return result
+        except HTTPException as e:
+            outcome = "unknown_user" if e.status_code == 404 else f"http_{e.status_code}"
+            raise
+        finally:
+            dev = self._device(key)
+            dev.latency.observe((_time.perf_counter() - started) * 1000)
+            db_ms = (self.db_seconds() - db0) * 1000
+            if db_ms > 0:
+                dev.db.observe(db_ms)
+            dev.outcomes[outcome] += 1
+            dev.rate.hit()
+            dev.last_seen = _time.time()
+
+    def applied(self, key: Optional[str], outcome: str) -> None:
+        """
+        record_terminal_pass natijasi. So'rov ichida — so'rov natijasi sifatida
+        (observe yozadi); navbat writer'ida — `events` hisobiga (so'rov "queued"
+        sifatida allaqachon sanalgan).
+        """
+        name = APPLIED_OUTCOMES.get(outcome, outcome)
+        if _observing.get():
+            _outcome.set(name)
+        elif key:
+            self._device(key).events[name] += 1
+
+    # ---------- o'qish ----------
+
+    async def _refresh_directory(self, db: AsyncSession) -> None:
+        if self._directory_at is not None and _time.monotonic() - self._directory_at < DEVICE_DIRECTORY_TTL_SEC:
+            return
+        rows = (await db.execute(select(Device.id, Device.serial_number, Device.name, Device.school_id))).all()
+        self._directory = {r.serial_number: {"device_id": r.id, "name": r.name, "school_id": r.school_id} for r in rows}
+        self._directory_at = _time.monotonic()
+
+    async def snapshot(self, db: Optional[AsyncSession] = None) -> List[dict]:
+        if db is not None:
+            try:
+                await self._refresh_directory(db)
+            except Exception as e:
+                logger.warning("face_telemetry: devices o'qilmadi: %s", e)
+        out = []
+        for dev in self.devices.values():
+            item = dev.to_dict()
+            item["device"] = self._directory.get(dev.key)
+            out.append(item)
+        return out
+
+    def live(self) -> List[dict]:
+        """Tezlik bo'yicha saralangan qisqa ko'rinish (07:55 dagi shovqinli terminalni topish uchun)."""
+        rows = []
+        for dev in self.devices.values():
+            rows.append({
+                "key": dev.key,
+                "device": self._directory.get(dev.key),
+                "rate_10s": dev.rate.per_sec(10),
+                "rate_60s": dev.rate.per_sec(60),
+                "p95_ms": dev.latency.quantile(0.95),
+                "top_outcomes": dev.outcomes.most_common(3),
+                "last_seen_sec_ago": round(_time.time() - dev.last_seen, 1) if dev.last_seen else None,
+            })
+        rows.sort(key=lambda r: r["rate_10s"], reverse=True)
+        return rows
+
+    def prometheus(self) -> str:
+        lines = [
+            "# TYPE face_terminal_requests_total counter",
+            "# TYPE face_terminal_events_total counter",
+            "# TYPE face_terminal_request_ms histogram",
+            "# TYPE face_terminal_db_ms histogram",
+        ]
+        for dev in self.devices.values():
+            label = dev.key.replace("\\", "\\\\").replace('"', '\\"')
+            for outcome, n in dev.outcomes.items():
+                o = outcome.replace('"', '\\"')
+                lines.append(f'face_terminal_requests_total{{device="{label}",outcome="{o}"}} {n}')
+            for outcome, n in dev.events.items():
+                o = outcome.replace('"', '\\"')
+                lines.append(f'face_terminal_events_total{{device="{label}",outcome="{o}"}} {n}')
+            for metric, h in (("face_terminal_request_ms", dev.latency), ("face_terminal_db_ms", dev.db)):
+                acc = 0
+                for le, c in zip([*map(str, h.buckets), "+Inf"], h.counts):
+                    acc += c
+                    lines.append(f'{metric}_bucket{{device="{label}",le="{le}"}} {acc}')
+                lines.append(f'{metric}_sum{{device="{label}"}} {round(h.total, 3)}')
+                lines.append(f'{metric}_count{{device="{label}"}} {h.n}')
+        return "\n".join(lines) + "\n"
+
+
+def _result_outcome(result) -> str:
+    if isinstance(result, dict):
+        if result.get("skip"):
+            return str(result.get("reason") or "skip")
+        if result.get("queued"):
+            return "queued"
+    return "ok"
+
+
+face_telemetry = FaceTelemetry()
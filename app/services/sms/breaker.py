@@ -0,0 +1,265 @@
+# app/services/sms/breaker.py
+"""
+Eskiz oldidagi circuit breaker va moslashuvchan timeout.
+
+`BreakerTransport` — sms_gateway klientining transporti: barcha Eskiz so'rovlari
+(login, send, send-batch, face_terminal fallback zanjiri) shu yerdan o'tadi.
+
+  closed    — so'rovlar o'tadi; oxirgi SMS_BREAKER_WINDOW_CALLS ta (SMS_BREAKER_WINDOW_SEC
+              dan eski bo'lmagan, kamida SMS_BREAKER_MIN_CALLS ta) so'rovdan xatolar (transport xatosi, 5xx,
+              429) ulushi SMS_BREAKER_ERROR_RATE dan yoki sekin so'rovlar
+              (> SMS_BREAKER_SLOW_SEC) ulushi SMS_BREAKER_SLOW_RATE dan oshsa -> open;
+  open      — so'rov tarmoqqa chiqmaydi, darhol CircuitOpenError; SMS_BREAKER_OPEN_SEC
+              dan keyin -> half_open (har qayta ochilishda muddat 2x, SMS_BREAKER_OPEN_MAX_SEC gacha);
+  half_open — faqat SMS_BREAKER_PROBES ta sinov so'rovi; hammasi muvaffaqiyatli
+              bo'lsa -> closed, bittasi yiqilsa -> yana open.
+
+Timeout: read/write = p95(muvaffaqiyatli so'rovlar kechikishi) * SMS_TIMEOUT_P95_FACTOR,
+[SMS_TIMEOUT_MIN_SEC, SMS_HTTP_READ_TIMEOUT_SEC] oralig'ida; namunalar yetarli
+bo'lmaguncha — statik SMS_HTTP_READ_TIMEOUT_SEC.
+
+Breaker ochiq paytda outbox dispatcher satrlarni olmaydi — xabarlar sms_outbox'da
+(lokal navbat) kutib turadi; allaqachon olinganlari urinish hisoblanmasdan qaytariladi.
+"""
+import os
+import time
+import logging
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger("uvicorn.error")
+
+BREAKER_WINDOW_SEC = float(os.getenv("SMS_BREAKER_WINDOW_SEC", "60"))
+BREAKER_WINDOW_CALLS = int(os.getenv("SMS_BREAKER_WINDOW_CALLS", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("SMS_BREAKER_MIN_CALLS", "10"))
+BREAKER_ERROR_RATE = float(os.getenv("SMS_BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_SEC = float(os.getenv("SMS_BREAKER_SLOW_SEC", "5"))
+BREAKER_SLOW_RATE = float(os.getenv("SMS_BREAKER_SLOW_RATE", "0.5"))
+BREAKER_OPEN_SEC = float(os.getenv("SMS_BREAKER_OPEN_SEC", "30"))
+BREAKER_OPEN_MAX_SEC = float(os.getenv("SMS_BREAKER_OPEN_MAX_SEC", "300"))
+BREAKER_PROBES = int(os.getenv("SMS_BREAKER_PROBES", "2"))
+
+TIMEOUT_P95_FACTOR = float(os.getenv("SMS_TIMEOUT_P95_FACTOR", "3"))
+TIMEOUT_MIN_SEC = float(os.getenv("SMS_TIMEOUT_MIN_SEC", "2"))
+# shuncha namunadan keyin moslashuvchan timeout ishlaydi
+TIMEOUT_MIN_SAMPLES = int(os.getenv("SMS_TIMEOUT_MIN_SAMPLES", "20"))
+_LATENCY_SAMPLES = 500
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Breaker ochiq: so'rov Eskiz'ga yuborilmadi."""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"Eskiz circuit open, retry in {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class LatencyTracker:
+    """Oxirgi muvaffaqiyatli so'rovlar kechikishi va ulardan olingan timeout."""
+
+    def __init__(self, *, max_sec: float, min_sec: float = TIMEOUT_MIN_SEC,
+                 factor: float = TIMEOUT_P95_FACTOR, min_samples: int = TIMEOUT_MIN_SAMPLES):
+        self.max_sec = max_sec
+        self.min_sec = min(min_sec, max_sec)
+        self.factor = factor
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=_LATENCY_SAMPLES)
+
+    def add(self, latency: float) -> None:
+        self._samples.append(latency)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        s = sorted(self._samples)
+        return s[min(len(s) - 1, int(q * len(s)))]
+
+    def timeout(self) -> float:
+        if len(self._samples) < self.min_samples:
+            return self.max_sec
+        return max(self.min_sec, min(self.max_sec, self.percentile(0.95) * self.factor))
+
+    def stats(self) -> dict:
+        p50, p95, p99 = (self.percentile(q) for q in (0.5, 0.95, 0.99))
+        return {
+            "samples": len(self._samples),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+            "timeout_sec": round(self.timeout(), 2),
+        }
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        *,
+        window_sec: float = BREAKER_WINDOW_SEC,
+        window_calls: int = BREAKER_WINDOW_CALLS,
+        min_calls: int = BREAKER_MIN_CALLS,
+        error_rate: float = BREAKER_ERROR_RATE,
+        slow_sec: float = BREAKER_SLOW_SEC,
+        slow_rate: float = BREAKER_SLOW_RATE,
+        open_sec: float = BREAKER_OPEN_SEC,
+        open_max_sec: float = BREAKER_OPEN_MAX_SEC,
+        probes: int = BREAKER_PROBES,
+        name: str = "eskiz",
+    ):
+        self.window_sec = window_sec
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_sec = slow_sec
+        self.slow_rate = slow_rate
+        self.open_sec = open_sec
+        self.open_max_sec = open_max_sec
+        self.probes = max(1, probes)
+        self.name = name
+        self.state = CLOSED
+        # (vaqt, xato, sekin)
+        self._calls: Deque[Tuple[float, bool, bool]] = deque(maxlen=max(window_calls, min_calls))
+        self._opened_at = 0.0
+        self._open_for = open_sec
+        self._probes_inflight = 0
+        self._probes_ok = 0
+        # metrikalar
+        self.opened = 0
+        self.rejected = 0
+
+    # ---------- holat ----------
+    def _prune(self, now: float) -> None:
+        while self._calls and self._calls[0][0] < now - self.window_sec:
+            self._calls.popleft()
+
+    def _open(self, now: float, reason: str) -> None:
+        if self.state == HALF_OPEN:
+            # tiklanmadi: keyingi ochiq muddat uzunroq
+            self._open_for = min(self._open_for * 2, self.open_max_sec)
+        else:
+            self._open_for = self.open_sec
+        self.state = OPEN
+        self._opened_at = now
+        self._calls.clear()
+        self.opened += 1
+        logger.warning("%s breaker: open (%s), %ss", self.name, reason, round(self._open_for))
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self._calls.clear()
+        self._open_for = self.open_sec
+        logger.info("%s breaker: closed", self.name)
+
+    def retry_in(self) -> float:
+        """Ochiq bo'lsa half_open gacha qolgan soniya, aks holda 0."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self._open_for - time.monotonic())
+
+    def ready(self) -> bool:
+        """So'rov yuborish mumkinmi (slot band qilmaydi) — dispatcher uchun."""
+        if self.state == OPEN:
+            return self.retry_in() <= 0
+        if self.state == HALF_OPEN:
+            return self._probes_inflight + self._probes_ok < self.probes
+        return True
+
+    def allow(self) -> bool:
+        """So'rov oldidan: True bo'lsa natija `record()`/`release()` bilan qaytarilishi shart."""
+        if self.state == OPEN:
+            if self.retry_in() > 0:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probes_inflight = 0
+            self._probes_ok = 0
+        if self.state == HALF_OPEN:
+            if self._probes_inflight + self._probes_ok >= self.probes:
+                self.rejected += 1
+                return False
+            self._probes_inflight += 1
+        return True
+
+    def release(self) -> None:
+        """So'rov natijasiz tugadi (bekor qilindi) — sinov slotini bo'shatish."""
+        if self.state == HALF_OPEN and self._probes_inflight > 0:
+            self._probes_inflight -= 1
+
+    def record(self, failed: bool, latency: float) -> None:
+        now = time.monotonic()
+        slow = latency > self.slow_sec
+        if self.state == HALF_OPEN:
+            self._probes_inflight = max(0, self._probes_inflight - 1)
+            if failed or slow:
+                self._open(now, "probe failed" if failed else "probe slow")
+                return
+            self._probes_ok += 1
+            if self._probes_ok >= self.probes:
+                self._close()
+            return
+        if self.state == OPEN:
+            # ochilishdan oldin yuborilgan so'rov kech qaytdi
+            return
+        self._calls.append((now, failed, slow))
+        self._prune(now)
+        n = len(self._calls)
+        if n < self.min_calls:
+            return
+        errors = sum(1 for _, f, _ in self._calls if f)
+        slows = sum(1 for _, _, s in self._calls if s)
+        if errors / n >= self.error_rate:
+            self._open(now, f"errors {errors}/{n}")
+        elif slows / n >= self.slow_rate:
+            self._open(now, f"slow {slows}/{n}")
+
+    def stats(self) -> dict:
+        self._prune(time.monotonic())
+        n = len(self._calls)
+        return {
+            "state": self.state,
+            "retry_in_sec": round(self.retry_in(), 1),
+            "window_calls": n,
+            "window_errors": sum(1 for _, f, _ in self._calls if f),
+            "window_slow": sum(1 for _, _, s in self._calls if s),
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class BreakerTransport(httpx.AsyncBaseTransport):
+    """httpx transport o'rami: breaker tekshiruvi, moslashuvchan timeout, kechikish o'lchovi."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, breaker: CircuitBreaker, latency: LatencyTracker):
+        self.inner = inner
+        self.breaker = breaker
+        self.latency = latency
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not self.breaker.allow():
+            raise CircuitOpenError(self.breaker.retry_in())
+        timeout = dict(request.extensions.get("timeout") or {})
+        t = self.latency.timeout()
+        timeout["read"] = min(timeout.get("read") or t, t)
+        timeout["write"] = min(timeout.get("write") or t, t)
+        request.extensions["timeout"] = timeout
+
+        t0 = time.monotonic()
+        try:
+            resp = await self.inner.handle_async_request(request)
+        except httpx.TransportError:
+            self.breaker.record(True, time.monotonic() - t0)
+            raise
+        except BaseException:
+            self.breaker.release()
+            raise
+        elapsed = time.monotonic() - t0
+        failed = resp.status_code >= 500 or resp.status_code == 429
+        self.breaker.record(failed, elapsed)
+        if not failed:
+            self.latency.add(elapsed)
+        return resp
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
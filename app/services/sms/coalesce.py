@@ -0,0 +1,85 @@
+# app/services/sms/coalesce.py
+"""
+Ota-onaga attendance SMS'larini birlashtirish (SMS_NOTIFY_MODE).
+
+  instant  — har hodisa alohida SMS (eski xatti-harakat);
+  coalesce — (telefon, o'quvchi) bo'yicha birinchi hodisadan SMS_COALESCE_SEC
+             kutiladi, shu oraliqdagi keldi/ketdi/qaytib keldi bitta SMS bo'ladi;
+  digest   — (telefon, kun) bo'yicha kechki bitta SMS (SMS_DIGEST_AT, Toshkent
+             vaqti); bir ota-onaning bir nechta farzandi bitta xabarga jamlanadi.
+
+Outbox'ga `INSERT … ON CONFLICT (coalesce_key) WHERE status='pending'` bilan
+yoziladi: hodisa kutayotgan satrning `payload` (JSONB massiv) iga qo'shiladi.
+Matnni dispatcher yuborish paytida `render()` bilan yig'adi. Dispatcher satrni
+olgach (status='sending') keyingi hodisa yangi satr ochadi.
+"""
+import os
+import json
+from datetime import datetime, time, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.services.sms import outbox as sms_outbox
+from app.services.sms.sms_templates import sms_jamlanma
+
+NOTIFY_MODE = os.getenv("SMS_NOTIFY_MODE", "instant").lower()
+COALESCE_SEC = int(os.getenv("SMS_COALESCE_SEC", "300"))
+_DIGEST_AT = os.getenv("SMS_DIGEST_AT", "19:00")
+try:
+    _hh, _mm = map(int, _DIGEST_AT.split(":"))
+    DIGEST_AT = time(_hh, _mm)
+except Exception:
+    DIGEST_AT = time(19, 0)
+_LOCAL_TZ = timezone(timedelta(hours=5))
+
+_UPSERT_SQL = text(
+    """
+    INSERT INTO sms_outbox (phone, message, kind, student_id, school_id, coalesce_key, payload, next_attempt_at)
+    VALUES (:phone, :message, :kind, :student_id, :school_id, :key, CAST(:payload AS jsonb), :due)
+    ON CONFLICT (coalesce_key) WHERE status = 'pending' AND coalesce_key IS NOT NULL
+    DO UPDATE SET payload = sms_outbox.payload || EXCLUDED.payload
+    """
+)
+
+
+def _schedule(phone: str, student_id: int, now: datetime) -> tuple:
+    """(coalesce_key, yuborish vaqti) — joriy rejim bo'yicha."""
+    if NOTIFY_MODE == "digest":
+        local = now.astimezone(_LOCAL_TZ)
+        due = datetime.combine(local.date(), DIGEST_AT, _LOCAL_TZ)
+        # kechki xabardan keyingi hodisalar oddiy oyna bilan
+        due = max(due, now + timedelta(seconds=COALESCE_SEC))
+        return f"d:{phone}:{local.date().isoformat()}", due
+    return f"c:{phone}:{student_id}", now + timedelta(seconds=COALESCE_SEC)
+
+
+async def notify(
+    db: AsyncSession,
+    *,
+    phone: str,
+    message: str,
+    event: dict,
+    kind: Optional[str] = None,
+    student_id: Optional[int] = None,
+    school_id: Optional[int] = None,
+) -> None:
+    """Hodisani rejimga ko'ra outbox'ga qo'yadi (commit — chaqiruvchida)."""
+    if NOTIFY_MODE not in ("coalesce", "digest"):
+        sms_outbox.enqueue(db, phone=phone, message=message, kind=kind, student_id=student_id, school_id=school_id)
+        return
+    key, due = _schedule(phone, student_id, datetime.now(timezone.utc))
+    await db.execute(_UPSERT_SQL, {
+        "phone": phone, "message": message, "kind": kind,
+        "student_id": student_id, "school_id": school_id,
+        "key": key, "payload": json.dumps([{**event, "text": message}], ensure_ascii=False), "due": due,
+    })
+
+
+def render(row) -> str:
+    """Dispatcher uchun: bitta hodisa — asl matn, bir nechta — jamlangan SMS."""
+    events = row.payload or []
+    if len(events) > 1:
+        return sms_jamlanma(events)
+    return row.message
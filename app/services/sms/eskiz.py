@@ -1,72 +1,41 @@
 # app/services/sms/eskiz.py
 import os
-import re
-import asyncio
 import httpx
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
 
 from app.core.config import settings
+from app.services.sms.gateway import sms_gateway
+from app.services.sms.token import eskiz_tokens
+from app.services.sms.receipts import callback_url
+from app.services.sms.phone import eskiz_phone
 
 ESKIZ_BASE_URL = settings.ESKIZ_BASE_URL
 ESKIZ_EMAIL = settings.ESKIZ_EMAIL
 ESKIZ_PASSWORD = settings.ESKIZ_PASSWORD
 ESKIZ_FROM = settings.ESKIZ_FROM
+# bitta send-batch so'rovidagi xabarlar soni (1 — batch o'chirilgan)
+SMS_BATCH_SIZE = int(os.getenv("SMS_BATCH_SIZE", "100"))
 
-_token_lock = asyncio.Lock()
-_token_cache: Dict[str, str] = {}  # {"access_token": "..."}
+# yagona qoidalar: app/services/sms/phone.py (998XXXXXXXXX yoki None)
+_clean_uz_phone = eskiz_phone
 
-def _clean_uz_phone(phone: str) -> Optional[str]:
-    """999XXXXXXX yoki 9989XXXXXXXX formatga tozalaydi (plus va bo‘shliqlarsiz)."""
-    if not phone:
-        return None
-    digits = re.sub(r"\D", "", phone)
-    if digits.startswith("998") and len(digits) == 12:
-        return digits  # 9989XXXXXXXX
-    if len(digits) == 9 and digits.startswith("9"):  # 9XXXXXXXX
-        return "998" + digits
-    if len(digits) == 12 and digits.startswith("998"):
-        return digits
-    return None
-
-async def _login(client: httpx.AsyncClient) -> str:
-    global _token_cache
-    async with _token_lock:
-        # boshqa coroutine lockdan o‘tguncha token olgan bo‘lsa qaytamiz
-        if _token_cache.get("access_token"):
-            return _token_cache["access_token"]
-        resp = await client.post(
-            f"{ESKIZ_BASE_URL}/api/auth/login",
-            data={"email": ESKIZ_EMAIL, "password": ESKIZ_PASSWORD},
-            timeout=20,
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        token = data.get("data", {}).get("token") or data.get("data", {}).get("access_token")
-        if not token:
-            raise RuntimeError("Eskiz token olinmadi")
-        _token_cache["access_token"] = token
-        return token
-
-async def _get_token(client: httpx.AsyncClient) -> str:
-    token = _token_cache.get("access_token")
-    if token:
-        return token
-    return await _login(client)
-
-async def _send_raw_sms(client: httpx.AsyncClient, phone: str, message: str) -> httpx.Response:
-    token = await _get_token(client)
+
+async def _send_raw_sms(client: httpx.AsyncClient, phone: str, message: str, token: Optional[str] = None) -> httpx.Response:
+    token = token or await eskiz_tokens.get()
     headers = {"Authorization": f"Bearer {token}"}
     payload = {
         "mobile_phone": phone,       # 9989XXXXXXXX
         "message": message,          # matn
         "from": ESKIZ_FROM,          # 4546 yoki tasdiqlangan Sender ID
-        "callback_url": "https://example.com/sms/callback"  # ixtiyoriy
     }
+    # delivery report: POST /sms/eskiz/callback (ESKIZ_CALLBACK_URL)
+    cb = callback_url()
+    if cb:
+        payload["callback_url"] = cb
     resp = await client.post(
-        f"{ESKIZ_BASE_URL}/api/message/sms/send",
+        "/api/message/sms/send",
         data=payload,
         headers=headers,
-        timeout=20,
     )
     return resp
 
@@ -88,35 +57,117 @@ async def send_sms(phone_raw: str, message: str) -> Dict:
     if not phone:
         return {"ok": False, "reason": "Telefon raqam noto‘g‘ri", "phone_raw": phone_raw}
 
-    async with httpx.AsyncClient() as client:
-        resp = await _send_raw_sms(client, phone, message)
-        if resp.status_code == 401:
-            # token eskirgan: qayta login qilib urinamiz
-            await _login(client)
-            resp = await _send_raw_sms(client, phone, message)
-
-        if resp.is_success:
-            return {"ok": True, "status_code": resp.status_code, "data": resp.json()}
-
-        # Test statusiga tushib qolsa — fallback
-        if _is_test_only_error(resp):
-            test_msg = "Bu Eskiz dan test"
-            resp2 = await _send_raw_sms(client, phone, test_msg)
-            if resp2.status_code == 401:
-                await _login(client)
-                resp2 = await _send_raw_sms(client, phone, test_msg)
-            if resp2.is_success:
-                return {
-                    "ok": True,
-                    "fallback_test": True,
-                    "status_code": resp2.status_code,
-                    "data": resp2.json(),
-                }
-
-        # boshqa xatolar
-        out = {"ok": False, "status_code": resp.status_code}
-        try:
-            out["data"] = resp.json()
-        except Exception:
-            out["text"] = resp.text
+    # yagona pool'langan klient (app/services/sms/gateway.py)
+    client = sms_gateway.client
+    token = await eskiz_tokens.get()
+    resp = await _send_raw_sms(client, phone, message, token)
+    if resp.status_code == 401:
+        # token eskirgan: yagona menejer orqali (bitta login) qayta urinamiz
+        token = await eskiz_tokens.invalidate(token)
+        resp = await _send_raw_sms(client, phone, message, token)
+
+    if resp.is_success:
+        return {"ok": True, "status_code": resp.status_code, "data": resp.json()}
+
+    # Test statusiga tushib qolsa — fallback
+    if _is_test_only_error(resp):
+        test_msg = "Bu Eskiz dan test"
+        resp2 = await _send_raw_sms(client, phone, test_msg, token)
+        if resp2.status_code == 401:
+            token = await eskiz_tokens.invalidate(token)
+            resp2 = await _send_raw_sms(client, phone, test_msg, token)
+        if resp2.is_success:
+            return {
+                "ok": True,
+                "fallback_test": True,
+                "status_code": resp2.status_code,
+                "data": resp2.json(),
+            }
+
+    # boshqa xatolar
+    out = {"ok": False, "status_code": resp.status_code}
+    try:
+        out["data"] = resp.json()
+    except Exception:
+        out["text"] = resp.text
+    return out
+
+
+# =========================
+#   Batch yuborish
+# =========================
+_BATCH_FAILED = {"error", "failed", "rejected", "undelivered", "expired"}
+
+
+def _batch_item_results(data: dict, ids: List[str]) -> Dict[str, Dict]:
+    """
+    send-batch javobini xabarlarga ajratadi: {user_sms_id: {"ok", "id", "error"}}.
+    Eskiz javobi: {"id": <batch id>, "status": [...]} (status — xabarlar tartibida)
+    yoki xabar bo'yicha ro'yxat (user_sms_id bilan). Ajratib bo'lmasa — natija noma'lum:
+    bo'sh dict, chaqiruvchi xabarlarni alohida yuboradi (yuborilgan deb yozilmaydi).
+    """
+    batch_id = data.get("id")
+    if batch_id is None and isinstance(data.get("data"), dict):
+        batch_id = data["data"].get("id")
+    items = data.get("messages") or (data.get("data") if isinstance(data.get("data"), list) else None)
+    out: Dict[str, Dict] = {}
+    if isinstance(items, list):
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            uid = str(item.get("user_sms_id") or "")
+            if uid not in ids:
+                continue
+            status = str(item.get("status") or "").lower()
+            ok = status not in _BATCH_FAILED
+            out[uid] = {
+                "ok": ok,
+                "id": str(item.get("message_id") or item.get("id") or batch_id or "") or None,
+                "error": None if ok else f"batch status={status}",
+            }
         return out
+
+    statuses = data.get("status")
+    if not isinstance(statuses, list) or len(statuses) != len(ids):
+        return {}
+    for i, uid in enumerate(ids):
+        status = str(statuses[i]).lower()
+        ok = status not in _BATCH_FAILED
+        out[uid] = {
+            "ok": ok,
+            "id": str(batch_id) if batch_id else None,
+            "error": None if ok else f"batch status={status}",
+        }
+    return out
+
+
+async def send_sms_batch(messages: List[Tuple[str, str, str]]) -> Dict[str, Dict]:
+    """
+    Bir nechta xabarni bitta POST /api/message/sms/send-batch bilan yuboradi.
+    messages: [(user_sms_id, 9989XXXXXXXX, matn), ...] — user_sms_id Eskiz callback'ida qaytadi.
+    return: {user_sms_id: {"ok", "id", "error"}}; javobda yo'q yoki rad etilganlarni
+    chaqiruvchi alohida yuboradi. So'rov butunlay muvaffaqiyatsiz bo'lsa RuntimeError.
+    """
+    if not messages:
+        return {}
+    client = sms_gateway.client
+    ids = [uid for uid, _, _ in messages]
+    payload = {"messages": [{"user_sms_id": uid, "to": int(phone), "text": text} for uid, phone, text in messages]}
+    if ESKIZ_FROM:
+        payload["from"] = ESKIZ_FROM
+    cb = callback_url()
+    if cb:
+        payload["callback_url"] = cb
+
+    token = await eskiz_tokens.get()
+    resp = await client.post("/api/message/sms/send-batch", json=payload, headers={"Authorization": f"Bearer {token}"})
+    if resp.status_code == 401:
+        token = await eskiz_tokens.invalidate(token)
+        resp = await client.post("/api/message/sms/send-batch", json=payload, headers={"Authorization": f"Bearer {token}"})
+    if resp.is_error:
+        raise RuntimeError(f"Eskiz send-batch failed {resp.status_code}: {resp.text[:500]}")
+    try:
+        data = resp.json()
+    except ValueError:
+        data = {}
+    return _batch_item_results(data if isinstance(data, dict) else {}, ids)
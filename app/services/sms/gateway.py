@@ -0,0 +1,103 @@
+# app/services/sms/gateway.py
+"""
+Eskiz uchun yagona, uzoq yashovchi HTTP klient (connection pool + keep-alive).
+
+App startup'da ochiladi va shutdown'da yopiladi (app/main.py). Barcha SMS
+yo'llari (face_terminal, services/sms/eskiz.py) faqat shu transportdan
+foydalanadi — har xabar uchun DNS/TCP/TLS qayta qurilmaydi.
+Startup bo'lmagan joyda (skriptlar) birinchi murojaatda yaratiladi.
+Transport circuit breaker va moslashuvchan timeout bilan o'ralgan
+(app/services/sms/breaker.py).
+"""
+import os
+import ssl
+import logging
+from typing import Optional, Union
+
+import httpx
+
+from app.core.config import settings
+from app.services.sms.breaker import BreakerTransport, CircuitBreaker, LatencyTracker
+
+logger = logging.getLogger("uvicorn.error")
+
+SMS_MAX_CONNECTIONS = int(os.getenv("SMS_HTTP_MAX_CONNECTIONS", "20"))
+SMS_MAX_KEEPALIVE = int(os.getenv("SMS_HTTP_MAX_KEEPALIVE", "10"))
+SMS_KEEPALIVE_EXPIRY_SEC = float(os.getenv("SMS_HTTP_KEEPALIVE_EXPIRY_SEC", "60"))
+SMS_CONNECT_TIMEOUT_SEC = float(os.getenv("SMS_HTTP_CONNECT_TIMEOUT_SEC", "5"))
+SMS_READ_TIMEOUT_SEC = float(os.getenv("SMS_HTTP_READ_TIMEOUT_SEC", "20"))
+# pool to'la bo'lsa ulanishni kutish chegarasi
+SMS_POOL_TIMEOUT_SEC = float(os.getenv("SMS_HTTP_POOL_TIMEOUT_SEC", "10"))
+
+
+class SmsGateway:
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        *,
+        max_connections: int = SMS_MAX_CONNECTIONS,
+        max_keepalive: int = SMS_MAX_KEEPALIVE,
+        keepalive_expiry: float = SMS_KEEPALIVE_EXPIRY_SEC,
+        connect_timeout: float = SMS_CONNECT_TIMEOUT_SEC,
+        read_timeout: float = SMS_READ_TIMEOUT_SEC,
+        pool_timeout: float = SMS_POOL_TIMEOUT_SEC,
+        verify: Union[bool, str, ssl.SSLContext] = True,
+    ):
+        self.verify = verify
+        self.base_url = (base_url or settings.ESKIZ_BASE_URL or "").rstrip("/")
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(
+            connect=connect_timeout, read=read_timeout, write=read_timeout, pool=pool_timeout,
+        )
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker(max_sec=read_timeout)
+        self._client: Optional[httpx.AsyncClient] = None
+        self.requests = 0
+
+    def _build(self) -> httpx.AsyncClient:
+        # transport berilganda limits/verify klientda emas, transportda bo'ladi
+        transport = BreakerTransport(
+            httpx.AsyncHTTPTransport(limits=self.limits, verify=self.verify),
+            self.breaker, self.latency,
+        )
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self.timeout,
+            transport=transport,
+            event_hooks={"request": [self._on_request]},
+        )
+
+    async def _on_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._build()
+        return self._client
+
+    async def start(self) -> None:
+        _ = self.client
+
+    async def close(self) -> None:
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "open": self._client is not None and not self._client.is_closed,
+            "requests": self.requests,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive": self.limits.max_keepalive_connections,
+            "breaker": self.breaker.stats(),
+            "latency": self.latency.stats(),
+        }
+
+
+sms_gateway = SmsGateway()
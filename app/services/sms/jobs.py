@@ -0,0 +1,307 @@
+# app/services/sms/jobs.py
+"""
+Fon SMS ishlari: kelmagan (no-show) o'quvchilar ota-onalariga bildirish.
+
+POST /face-terminal/notify-no-show endi faqat `sms_jobs` satrini yaratadi va
+job id qaytaradi (HTTP so'rov gunicorn timeout'igacha ushlanib turmaydi).
+`NoShowJobs` (har workerda bitta fon task):
+  - ishni lease bilan egallaydi (`FOR UPDATE SKIP LOCKED`), worker o'lsa lease
+    tugagach boshqa worker davom ettiradi;
+  - kelmaganlarni id bo'yicha NO_SHOW_CHUNK dan oladi, ota va ona raqamlarini
+    outbox'ga yozadi va `cursor` ni shu tranzaksiyada siljitadi (checkpoint);
+    checkpoint faqat lease hali shu workerniki bo'lsa o'tadi (lease_until — egalik
+    tokeni), aks holda bo'lak rollback qilinadi;
+  - xato bo'lsa ish lease tugagach qayta urinadi; SMS_JOB_MAX_ERRORS ta xatodan keyin 'failed'.
+  - yuborishni outbox dispatcher bajaradi (parallellik + token bucket).
+Holat: `job_status()` — ish maydonlari + outbox bo'yicha sent/failed/pending.
+"""
+import os
+import asyncio
+import logging
+from datetime import date as _date, datetime, timedelta
+from typing import Any, Callable, Optional
+
+from sqlalchemy import select, func, text, update, case
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.sms_job import SmsJob
+from app.models.sms_outbox import SmsOutbox
+from app.models.student import Student
+from app.models.attendance import Attendance
+from app.services.sms import outbox as sms_outbox
+from app.services.sms.phone import msisdn
+
+logger = logging.getLogger("uvicorn.error")
+
+NO_SHOW_CHUNK = int(os.getenv("SMS_NO_SHOW_CHUNK", "500"))
+JOB_LEASE_SEC = int(os.getenv("SMS_JOB_LEASE_SEC", "60"))
+JOB_POLL_SEC = float(os.getenv("SMS_JOB_POLL_SEC", "5"))
+JOB_MAX_ERRORS = int(os.getenv("SMS_JOB_MAX_ERRORS", "5"))
+
+_CLAIM_JOB_SQL = text(
+    """
+    UPDATE sms_jobs j
+       SET status = 'running',
+           started_at = coalesce(j.started_at, now()),
+           lease_until = now() + make_interval(secs => :lease)
+     WHERE j.id = (
+            SELECT id FROM sms_jobs
+             WHERE status IN ('queued', 'running')
+               AND (lease_until IS NULL OR lease_until < now())
+             ORDER BY id
+             LIMIT 1
+             FOR UPDATE SKIP LOCKED
+           )
+    RETURNING j.id, j.lease_until
+    """
+)
+
+
+class LeaseLost(Exception):
+    """Ish lease'i boshqa workerga o'tgan: bo'lak yozilmadi."""
+
+
+def _absent_query(day: _date, only_active: bool):
+    # faqat SMS uchun kerakli ustunlar (to'liq Student ORM obyektlari emas)
+    q = select(
+        Student.id, Student.first_name, Student.last_name, Student.school_id,
+        Student.parent_father_e164, Student.parent_mother_e164,
+    ).where(~Student.id.in_(select(Attendance.student_id).where(Attendance.date == day)))
+    if only_active:
+        q = q.where(Student.is_active.is_(True))
+    return q
+
+
+async def create_no_show_job(db: AsyncSession, day: _date, only_active: bool = True) -> tuple:
+    """(job, yangi_mi) — shu kun uchun tugallanmagan ish bo'lsa o'shani qaytaradi."""
+    existing = (await db.execute(
+        select(SmsJob).where(
+            SmsJob.kind == "no_show",
+            SmsJob.day == day,
+            SmsJob.only_active.is_(only_active),
+            SmsJob.status.in_(("queued", "running")),
+        ).order_by(SmsJob.id).limit(1)
+    )).scalar_one_or_none()
+    if existing is not None:
+        return existing, False
+    job = SmsJob(kind="no_show", day=day, only_active=only_active, status="queued")
+    db.add(job)
+    await db.commit()
+    return job, True
+
+
+async def job_status(db: AsyncSession, job_id: int) -> Optional[dict]:
+    job = await db.get(SmsJob, job_id)
+    if job is None:
+        return None
+    rows = (await db.execute(
+        select(SmsOutbox.status, func.count()).where(SmsOutbox.job_id == job_id).group_by(SmsOutbox.status)
+    )).all()
+    by_status = {status: n for status, n in rows}
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "date": str(job.day),
+        "only_active": job.only_active,
+        "status": job.status,
+        "total_students": job.total,
+        "processed_students": job.processed,
+        "skipped_students": job.skipped,
+        "messages": job.enqueued,
+        "errors": job.errors,
+        "sent": by_status.get("sent", 0),
+        "failed": by_status.get("failed", 0),
+        "pending": by_status.get("pending", 0) + by_status.get("sending", 0),
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class NoShowJobs:
+    def __init__(
+        self,
+        message: Callable[[Any], str],
+        *,
+        on_enqueued: Optional[Callable[[], None]] = None,
+        session_factory=None,
+        chunk: int = NO_SHOW_CHUNK,
+        poll_sec: float = JOB_POLL_SEC,
+        name: str = "sms_jobs",
+    ):
+        self.message = message
+        self.on_enqueued = on_enqueued
+        self._session_factory = session_factory
+        self.chunk = chunk
+        self.poll_sec = poll_sec
+        self.name = name
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self.chunks = 0
+        self.jobs_done = 0
+        self.loop_errors = 0
+        self.leases_lost = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _session(self):
+        if self._session_factory is None:
+            from app.db.session import async_session
+            self._session_factory = async_session
+        return self._session_factory()
+
+    def wake(self) -> None:
+        if self._wake is not None:
+            self._wake.set()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _claim(self) -> Optional[tuple]:
+        """(job_id, lease_until) yoki None."""
+        async with self._session() as db:
+            row = (await db.execute(_CLAIM_JOB_SQL, {"lease": JOB_LEASE_SEC})).first()
+            await db.commit()
+        return tuple(row) if row is not None else None
+
+    async def _chunk(self, job_id: int, lease: datetime) -> tuple:
+        """
+        Bitta bo'lak: outbox'ga yozish + checkpoint bitta commit'da.
+        return: (ish tugadimi, yangi lease_until). Lease boshqa workerga o'tgan bo'lsa LeaseLost.
+        """
+        async with self._session() as db:
+            job = await db.get(SmsJob, job_id)
+            q = _absent_query(job.day, job.only_active)
+            total = job.total
+            if total is None:
+                total = (await db.execute(select(func.count()).select_from(q.subquery()))).scalar_one()
+            students = (await db.execute(
+                q.where(Student.id > job.cursor).order_by(Student.id).limit(self.chunk)
+            )).all()
+
+            enqueued = skipped = 0
+            for s in students:
+                phones = []
+                for e164 in (s.parent_father_e164, s.parent_mother_e164):
+                    p = msisdn(e164)
+                    if p and p not in phones:
+                        phones.append(p)
+                if not phones:
+                    skipped += 1
+                    continue
+                msg = self.message(s)
+                for p in phones:
+                    sms_outbox.enqueue(
+                        db, phone=p, message=msg, kind="no_show",
+                        student_id=s.id, school_id=s.school_id, job_id=job.id,
+                    )
+                enqueued += len(phones)
+
+            done = len(students) < self.chunk
+            values = {
+                "total": total,
+                "processed": SmsJob.processed + len(students),
+                "enqueued": SmsJob.enqueued + enqueued,
+                "skipped": SmsJob.skipped + skipped,
+                "lease_until": func.now() + timedelta(seconds=JOB_LEASE_SEC),
+            }
+            if students:
+                values["cursor"] = students[-1].id
+            if done:
+                values.update(status="done", finished_at=func.now(), lease_until=None)
+            row = (await db.execute(
+                update(SmsJob)
+                .where(SmsJob.id == job.id, SmsJob.lease_until == lease)
+                .values(**values)
+                .returning(SmsJob.lease_until)
+            )).first()
+            if row is None:
+                # lease muddati o'tib boshqa worker egallagan — outbox yozuvlari ham bekor
+                await db.rollback()
+                raise LeaseLost(job_id)
+            await db.commit()
+        self.chunks += 1
+        if enqueued and self.on_enqueued:
+            self.on_enqueued()
+        return done, row.lease_until
+
+    async def _note_error(self, job_id: int, lease: datetime, error: str) -> None:
+        # ish 'running' qoladi (lease tugagach cursor'dan davom etadi); JOB_MAX_ERRORS dan keyin 'failed'
+        give_up = SmsJob.errors + 1 >= JOB_MAX_ERRORS
+        async with self._session() as db:
+            status = (await db.execute(
+                update(SmsJob)
+                .where(SmsJob.id == job_id, SmsJob.lease_until == lease)
+                .values(
+                    error=error[:2000],
+                    errors=SmsJob.errors + 1,
+                    status=case((give_up, "failed"), else_=SmsJob.status),
+                    finished_at=case((give_up, func.now()), else_=SmsJob.finished_at),
+                    lease_until=case((give_up, None), else_=SmsJob.lease_until),
+                )
+                .returning(SmsJob.status)
+            )).scalar_one_or_none()
+            await db.commit()
+        if status == "failed":
+            logger.error("%s: ish #%s %s ta xatodan keyin to'xtatildi", self.name, job_id, JOB_MAX_ERRORS)
+
+    async def run_once(self) -> bool:
+        claimed = await self._claim()
+        if claimed is None:
+            return False
+        job_id, lease = claimed
+        try:
+            done = False
+            while not done:
+                done, lease = await self._chunk(job_id, lease)
+            self.jobs_done += 1
+            logger.info("%s: ish #%s tugadi", self.name, job_id)
+        except asyncio.CancelledError:
+            raise
+        except LeaseLost:
+            self.leases_lost += 1
+            logger.warning("%s: ish #%s lease'i boshqa workerga o'tdi", self.name, job_id)
+        except Exception as e:
+            logger.exception("%s: ish #%s xatosi (lease tugagach davom etadi)", self.name, job_id)
+            await self._note_error(job_id, lease, str(e))
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await self.run_once():
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.loop_errors += 1
+                logger.warning("%s: xato: %s", self.name, e)
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_sec)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "chunks": self.chunks,
+            "jobs_done": self.jobs_done,
+            "loop_errors": self.loop_errors,
+            "leases_lost": self.leases_lost,
+        }
@@ -0,0 +1,315 @@
+# app/services/sms/outbox.py
+"""
+Bardoshli SMS outbox va fon dispatcher.
+
+`enqueue()` — `sms_outbox` ga satr qo'shadi (commit qilmaydi): attendance bilan
+bitta tranzaksiyada yoziladi, worker o'lsa ham xabar yo'qolmaydi.
+
+`SmsDispatcher` — har workerda bitta fon task:
+  1) navbatdagi satrlarni `FOR UPDATE SKIP LOCKED` bilan oladi va status='sending',
+     next_attempt_at = now() + lease qilib belgilaydi (workerlar bir-birini kutmaydi);
+  2) SMS_OUTBOX_CONCURRENCY parallel, token bucket (SMS_RATE_PER_SEC) tezligida yuboradi;
+     `send_batch` berilsa SMS_BATCH_SIZE talik Eskiz send-batch so'rovlari bilan,
+     batch ichida rad etilganlari alohida yuboriladi;
+  3) natijani bitta batch UPDATE bilan yozadi: sent / qayta urinish (eksponensial
+     backoff) / failed (SMS_OUTBOX_MAX_ATTEMPTS dan keyin).
+Lease tugagan 'sending' satrlar (worker yiqilgan) qayta olinadi — at-least-once.
+`breaker` (app/services/sms/breaker.py) ochiq bo'lsa satrlar olinmaydi — sms_outbox'da
+kutib turadi; half_open paytida faqat sinov so'rovlari hajmida olinadi. Breaker
+sabab yuborilmaganlar urinish hisoblanmasdan pending'ga qaytadi.
+"""
+import os
+import json
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.sms_outbox import SmsOutbox
+from app.services.sms.breaker import CLOSED, CircuitBreaker, CircuitOpenError
+from app.services.sms.rate_limit import TokenBucket, sms_rate_limiter
+from app.services.sms.receipts import outbox_uid
+
+logger = logging.getLogger("uvicorn.error")
+
+OUTBOX_BATCH = int(os.getenv("SMS_OUTBOX_BATCH", "50"))
+OUTBOX_CONCURRENCY = int(os.getenv("SMS_OUTBOX_CONCURRENCY", "5"))
+OUTBOX_POLL_SEC = float(os.getenv("SMS_OUTBOX_POLL_SEC", "2"))
+OUTBOX_LEASE_SEC = int(os.getenv("SMS_OUTBOX_LEASE_SEC", "120"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("SMS_OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_BACKOFF_SEC = float(os.getenv("SMS_OUTBOX_BACKOFF_SEC", "30"))
+OUTBOX_BACKOFF_MAX_SEC = float(os.getenv("SMS_OUTBOX_BACKOFF_MAX_SEC", "3600"))
+
+_CLAIM_SQL = text(
+    """
+    UPDATE sms_outbox o
+       SET status = 'sending',
+           attempts = o.attempts + 1,
+           next_attempt_at = now() + make_interval(secs => :lease)
+     WHERE o.id IN (
+            SELECT id FROM sms_outbox
+             WHERE status IN ('pending', 'sending')
+               AND next_attempt_at <= now()
+             ORDER BY next_attempt_at, id
+             LIMIT :limit
+             FOR UPDATE SKIP LOCKED
+           )
+    RETURNING o.id, o.phone, o.message, o.attempts, o.payload
+    """
+)
+
+
+def enqueue(
+    db: AsyncSession,
+    *,
+    phone: str,
+    message: str,
+    kind: Optional[str] = None,
+    student_id: Optional[int] = None,
+    school_id: Optional[int] = None,
+    job_id: Optional[int] = None,
+) -> SmsOutbox:
+    """Outbox satrini sessiyaga qo'shadi; commit chaqiruvchining tranzaksiyasida."""
+    row = SmsOutbox(
+        phone=phone, message=message, kind=kind,
+        student_id=student_id, school_id=school_id, job_id=job_id,
+    )
+    db.add(row)
+    return row
+
+
+def backoff_delay(attempts: int) -> float:
+    return min(OUTBOX_BACKOFF_SEC * (2 ** max(attempts - 1, 0)), OUTBOX_BACKOFF_MAX_SEC)
+
+
+def _provider_id(resp: Any) -> Optional[str]:
+    if not isinstance(resp, dict):
+        return None
+    val = resp.get("id")
+    if val is None and isinstance(resp.get("data"), dict):
+        val = resp["data"].get("id")
+    return str(val)[:64] if val is not None else None
+
+
+class SmsDispatcher:
+    def __init__(
+        self,
+        send: Callable[[str, str], Awaitable[Any]],
+        *,
+        send_batch: Optional[Callable[[List[Tuple[str, str, str]]], Awaitable[Dict[str, dict]]]] = None,
+        batch_size: int = 1,
+        render: Optional[Callable[[Any], str]] = None,
+        session_factory=None,
+        batch: int = OUTBOX_BATCH,
+        concurrency: int = OUTBOX_CONCURRENCY,
+        poll_sec: float = OUTBOX_POLL_SEC,
+        rate: Optional[TokenBucket] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        name: str = "sms_outbox",
+    ):
+        self.send = send
+        self.send_batch = send_batch
+        self.batch_size = batch_size
+        self.render = render
+        self._session_factory = session_factory
+        self.batch = batch
+        self.concurrency = concurrency
+        self.poll_sec = poll_sec
+        self.rate = rate or sms_rate_limiter()
+        self.breaker = breaker
+        self.name = name
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        # metrikalar
+        self.claimed = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.loop_errors = 0
+        self.batch_requests = 0
+        self.batch_fallbacks = 0
+        self.parked = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _session(self):
+        if self._session_factory is None:
+            from app.db.session import async_session
+            self._session_factory = async_session
+        return self._session_factory()
+
+    def wake(self) -> None:
+        """Yangi satr commit qilindi — poll oralig'ini kutmasdan olish."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        # yuborilayotganlar lease tugagach boshqa worker tomonidan qayta olinadi
+
+    async def _claim(self) -> list:
+        async with self._session() as db:
+            # batch rejimida kamida bitta to'liq send-batch; token bucket so'rovlarni sanaydi
+            per_request = self.batch_size if self.send_batch is not None else 1
+            limit = max(self.batch, per_request)
+            # lease ichida yuborib bo'linadigan miqdordan ko'p olmaymiz
+            if self.rate.rate > 0:
+                limit = max(1, min(limit, int(self.rate.rate * OUTBOX_LEASE_SEC / 2) * per_request))
+            # half_open: faqat sinov so'rovlari hajmida
+            if self.breaker is not None and self.breaker.state != CLOSED:
+                limit = min(limit, self.breaker.probes * per_request)
+            rows = (await db.execute(_CLAIM_SQL, {"limit": limit, "lease": OUTBOX_LEASE_SEC})).all()
+            await db.commit()
+        self.claimed += len(rows)
+        return rows
+
+    def _text(self, row) -> str:
+        # birlashtirilgan satrlar (payload) matni yuborish paytida yig'iladi
+        if self.render is not None and row.payload:
+            return self.render(row)
+        return row.message
+
+    async def _send_one(self, sem: asyncio.Semaphore, row) -> dict:
+        message = self._text(row)
+        async with sem:
+            await self.rate.acquire()
+            try:
+                resp = await self.send(row.phone, message)
+            except CircuitOpenError as e:
+                return {"id": row.id, "attempts": row.attempts, "ok": False, "parked": True, "error": str(e)}
+            except Exception as e:
+                return {"id": row.id, "attempts": row.attempts, "ok": False, "error": str(e)[:1000]}
+        return {"id": row.id, "attempts": row.attempts, "ok": True, "resp": resp, "message": message}
+
+    async def _send_group(self, sem: asyncio.Semaphore, rows: list) -> List[dict]:
+        """Bitta batch so'rov (user_sms_id = "ob-<outbox id>"); rad etilgan/javobsizlar alohida yuboriladi."""
+        items: Dict[str, dict] = {}
+        async with sem:
+            await self.rate.acquire()
+            try:
+                items = await self.send_batch([(outbox_uid(r.id), r.phone, self._text(r)) for r in rows])
+                self.batch_requests += 1
+            except Exception as e:
+                logger.warning("%s: send-batch (%s ta) xatosi, alohida yuboriladi: %s", self.name, len(rows), e)
+        out, fallback = [], []
+        for r in rows:
+            item = items.get(outbox_uid(r.id))
+            if item and item.get("ok"):
+                out.append({
+                    "id": r.id, "attempts": r.attempts, "ok": True, "resp": item,
+                    "provider_id": item.get("id"), "message": self._text(r),
+                })
+            else:
+                fallback.append(r)
+        if fallback:
+            self.batch_fallbacks += len(fallback)
+            out.extend(await asyncio.gather(*(self._send_one(sem, r) for r in fallback)))
+        return out
+
+    async def _record(self, results: List[dict]) -> None:
+        now = datetime.now(timezone.utc)
+        params = []
+        for r in results:
+            if r.get("parked"):
+                # Eskiz'ga chiqilmadi: urinish qaytariladi, breaker yopilishini kutadi
+                self.parked += 1
+                retry_in = self.breaker.retry_in() if self.breaker is not None else OUTBOX_BACKOFF_SEC
+                params.append({
+                    "id": r["id"], "status": "pending", "attempts": r["attempts"] - 1,
+                    "last_error": r["error"], "coalesce_key": None,
+                    "next_attempt_at": now + timedelta(seconds=max(retry_in, self.poll_sec)),
+                })
+            elif r["ok"]:
+                self.sent += 1
+                params.append({
+                    "id": r["id"], "status": "sent", "sent_at": now, "last_error": None, "message": r["message"],
+                    "provider_message_id": r.get("provider_id") or _provider_id(r["resp"]),
+                    "provider_response": json.dumps(r["resp"], ensure_ascii=False, default=str)[:2000],
+                })
+            elif r["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+                self.failed += 1
+                params.append({"id": r["id"], "status": "failed", "last_error": r["error"]})
+            else:
+                self.retried += 1
+                params.append({
+                    # yangi hodisalar bu satrga emas, yangisiga yig'iladi (unique pending kalit)
+                    "id": r["id"], "status": "pending", "last_error": r["error"], "coalesce_key": None,
+                    "next_attempt_at": now + timedelta(seconds=backoff_delay(r["attempts"])),
+                })
+        async with self._session() as db:
+            # ORM bulk UPDATE (primary key bo'yicha executemany); kalitlar to'plami bo'yicha guruhlanadi
+            groups = {}
+            for p in params:
+                groups.setdefault(tuple(sorted(p)), []).append(p)
+            for group in groups.values():
+                await db.execute(update(SmsOutbox), group)
+            await db.commit()
+
+    async def run_once(self) -> int:
+        rows = await self._claim()
+        if not rows:
+            return 0
+        sem = asyncio.Semaphore(self.concurrency)
+        if self.send_batch is not None and self.batch_size > 1 and len(rows) > 1:
+            groups = [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+            results = [r for part in await asyncio.gather(*(self._send_group(sem, g) for g in groups)) for r in part]
+        else:
+            results = await asyncio.gather(*(self._send_one(sem, r) for r in rows))
+        await self._record(results)
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            if self.breaker is not None and not self.breaker.ready():
+                # breaker ochiq: satrlar outbox'da qoladi
+                await asyncio.sleep(max(self.breaker.retry_in(), self.poll_sec))
+                continue
+            try:
+                n = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.loop_errors += 1
+                logger.warning("%s: dispatcher xatosi: %s", self.name, e)
+                n = 0
+            if n >= self.batch:
+                continue  # navbat hali to'la
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_sec)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "claimed": self.claimed,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "loop_errors": self.loop_errors,
+            "concurrency": self.concurrency,
+            "rate": self.rate.stats(),
+            "batch_size": self.batch_size if self.send_batch is not None else 1,
+            "batch_requests": self.batch_requests,
+            "batch_fallbacks": self.batch_fallbacks,
+            "parked": self.parked,
+            "breaker": self.breaker.state if self.breaker is not None else None,
+        }
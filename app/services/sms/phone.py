@@ -0,0 +1,40 @@
+# app/services/sms/phone.py
+"""
+O'zbekiston telefon raqamlarini yagona normallashtirish.
+
+Student.parent_*_e164 ustunlari yozishda (crud/student.py) shu funksiya bilan
+to'ldiriladi; yuborish yo'llari qayta parse qilmaydi. Eskiz raqamni "+"siz
+kutadi (998XXXXXXXXX) — `eskiz_phone()` / `msisdn()`.
+
+Qabul qilinadigan ko'rinishlar (bo'shliq, qavs, tire, "+" e'tiborsiz):
+  998XXXXXXXXX, 00998XXXXXXXXX, XXXXXXXXX (9 xonali milliy), 0XXXXXXXXX.
+Boshqa hamma narsa (uzun/qisqa, boshqa davlat kodi) — None: noto'g'ri raqamga
+SMS yuborgandan ko'ra yubormagan ma'qul.
+"""
+from typing import Optional
+
+
+def normalize_uz_phone(raw: Optional[str]) -> Optional[str]:
+    """E.164: "+998XXXXXXXXX" yoki None."""
+    if not raw:
+        return None
+    digits = "".join(ch for ch in str(raw) if ch.isdigit())
+    if digits.startswith("00"):
+        digits = digits[2:]
+    if len(digits) == 10 and digits.startswith("0"):   # 0 90xxxxxxx
+        digits = digits[1:]
+    if len(digits) == 9:                                # 90xxxxxxx
+        digits = "998" + digits
+    if len(digits) != 12 or not digits.startswith("998"):
+        return None
+    return "+" + digits
+
+
+def msisdn(e164: Optional[str]) -> Optional[str]:
+    """E.164 -> Eskiz formati (998XXXXXXXXX)."""
+    return e164[1:] if e164 and e164.startswith("+") else e164
+
+
+def eskiz_phone(raw: Optional[str]) -> Optional[str]:
+    """Xom raqam -> 998XXXXXXXXX yoki None."""
+    return msisdn(normalize_uz_phone(raw))
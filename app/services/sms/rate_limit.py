@@ -0,0 +1,51 @@
+# app/services/sms/rate_limit.py
+"""
+Eskiz kvotasi uchun token bucket (shu worker bo'yicha).
+
+SMS_RATE_PER_SEC — umumiy ruxsat etilgan tezlik; gunicorn workerlari soniga
+(SMS_RATE_WORKERS, default WEB_CONCURRENCY yoki 1) bo'linadi, shunda barcha
+workerlar birgalikda kvotadan oshmaydi.
+"""
+import os
+import time
+import asyncio
+from typing import Optional
+
+SMS_RATE_PER_SEC = float(os.getenv("SMS_RATE_PER_SEC", "10"))
+SMS_RATE_BURST = float(os.getenv("SMS_RATE_BURST", "10"))
+SMS_RATE_WORKERS = max(int(os.getenv("SMS_RATE_WORKERS", os.getenv("WEB_CONCURRENCY", "1"))), 1)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = max(burst if burst is not None else rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited_sec = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Bitta token; yetmasa kerakli vaqtgacha kutadi (rate <= 0 — cheklovsiz)."""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                wait = (1 - self._tokens) / self.rate
+                self.waited_sec += wait
+                await asyncio.sleep(wait)
+                self._refill()
+            self._tokens -= 1
+
+    def stats(self) -> dict:
+        return {"rate_per_sec": self.rate, "burst": self.capacity, "waited_sec": round(self.waited_sec, 3)}
+
+
+def sms_rate_limiter() -> TokenBucket:
+    return TokenBucket(SMS_RATE_PER_SEC / SMS_RATE_WORKERS, SMS_RATE_BURST / SMS_RATE_WORKERS)
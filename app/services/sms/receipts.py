@@ -0,0 +1,217 @@
+# app/services/sms/receipts.py
+"""
+Eskiz delivery report (callback) buferi.
+
+POST /sms/eskiz/callback hisobotni `offer()` bilan xotiraga qo'yadi va darhol
+200 qaytaradi. Fon task har SMS_RECEIPT_FLUSH_SEC da (yoki bufer
+SMS_RECEIPT_BATCH_MAX ga yetganda) yig'ilganlarni `sms_outbox` ga batch UPDATE
+bilan yozadi:
+  - user_sms_id = "ob-<id>" (dispatcher batch yuborganda) — primary key bo'yicha;
+  - aks holda request_id / message_id — provider_message_id bo'yicha.
+Bir xabar uchun bir necha hisobot kelsa, oxirgisi yoziladi. Bufer faqat xotirada:
+worker yiqilsa so'nggi bir necha soniyadagi hisobotlar yo'qolishi mumkin (Eskiz
+holatni provayderda saqlaydi, bu faqat statistika uchun).
+"""
+import os
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+from sqlalchemy import text
+
+from app.core.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+RECEIPT_FLUSH_SEC = float(os.getenv("SMS_RECEIPT_FLUSH_SEC", "3"))
+RECEIPT_BATCH_MAX = int(os.getenv("SMS_RECEIPT_BATCH_MAX", "2000"))
+# bufer chegarasi: oshsa yangi hisobotlar tashlanadi (Eskiz 200 ni kutadi)
+RECEIPT_BUFFER_MAX = int(os.getenv("SMS_RECEIPT_BUFFER_MAX", "50000"))
+
+OUTBOX_UID_PREFIX = "ob-"
+
+_UPDATE_BY_ID = text(
+    "UPDATE sms_outbox SET delivery_status = :delivery_status, delivered_at = :delivered_at WHERE id = :id"
+)
+_UPDATE_BY_PROVIDER = text(
+    "UPDATE sms_outbox SET delivery_status = :delivery_status, delivered_at = :delivered_at "
+    "WHERE provider_message_id = :pid"
+)
+
+# Eskiz/SMPP holatlari -> bizning delivery_status
+_STATUS_MAP = {
+    "delivrd": "delivered",
+    "delivered": "delivered",
+    "undeliv": "undelivered",
+    "undelivered": "undelivered",
+    "rejectd": "rejected",
+    "rejected": "rejected",
+    "expired": "expired",
+    "deleted": "deleted",
+    "transmtd": "transmitted",
+    "transmitted": "transmitted",
+    "waiting": "waiting",
+    "accepted": "accepted",
+}
+
+
+def outbox_uid(outbox_id: int) -> str:
+    return f"{OUTBOX_UID_PREFIX}{outbox_id}"
+
+
+def callback_url() -> Optional[str]:
+    """Eskiz'ga beriladigan callback_url (ESKIZ_CALLBACK_URL + secret); sozlanmagan bo'lsa None."""
+    url = settings.ESKIZ_CALLBACK_URL
+    if not url:
+        return None
+    if settings.ESKIZ_CALLBACK_SECRET:
+        url += ("&" if "?" in url else "?") + urlencode({"secret": settings.ESKIZ_CALLBACK_SECRET})
+    return url
+
+
+def normalize_status(raw: Optional[str]) -> Optional[str]:
+    if not raw:
+        return None
+    key = str(raw).strip().lower()
+    return _STATUS_MAP.get(key, key[:20])
+
+
+# Eskiz status_date — Toshkent vaqti, zonasiz
+_PROVIDER_TZ = timezone(timedelta(hours=5))
+
+
+def _parse_ts(raw) -> datetime:
+    if raw:
+        s = str(raw).strip()
+        for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S"):
+            try:
+                return datetime.strptime(s[:19], fmt).replace(tzinfo=_PROVIDER_TZ)
+            except ValueError:
+                continue
+    return datetime.now(timezone.utc)
+
+
+def parse_report(data: dict) -> Optional[Tuple[Tuple[str, str], dict]]:
+    """Callback maydonlaridan ((kalit turi, kalit), qiymatlar); tanib bo'lmasa None."""
+    status = normalize_status(data.get("status"))
+    if not status:
+        return None
+    values = {"delivery_status": status, "delivered_at": _parse_ts(data.get("status_date"))}
+    uid = str(data.get("user_sms_id") or "")
+    if uid.startswith(OUTBOX_UID_PREFIX) and uid[len(OUTBOX_UID_PREFIX):].isdigit():
+        return ("id", uid[len(OUTBOX_UID_PREFIX):]), values
+    pid = data.get("request_id") or data.get("message_id") or data.get("id")
+    if pid:
+        return ("provider", str(pid)[:64]), values
+    return None
+
+
+class DeliveryReceipts:
+    def __init__(self, *, session_factory=None, flush_sec: float = RECEIPT_FLUSH_SEC,
+                 batch_max: int = RECEIPT_BATCH_MAX, buffer_max: int = RECEIPT_BUFFER_MAX):
+        self._session_factory = session_factory
+        self.flush_sec = flush_sec
+        self.batch_max = batch_max
+        self.buffer_max = buffer_max
+        self._buf: Dict[Tuple[str, str], dict] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._full: Optional[asyncio.Event] = None
+        # metrikalar
+        self.received = 0
+        self.ignored = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.updated = 0
+        self.flush_errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _session(self):
+        if self._session_factory is None:
+            from app.db.session import async_session
+            self._session_factory = async_session
+        return self._session_factory()
+
+    def offer(self, data: dict) -> bool:
+        """Hisobotni buferga qo'yadi; tanilmasa yoki bufer to'la bo'lsa False."""
+        parsed = parse_report(data)
+        if parsed is None:
+            self.ignored += 1
+            return False
+        key, values = parsed
+        if key not in self._buf and len(self._buf) >= self.buffer_max:
+            self.dropped += 1
+            return False
+        self._buf[key] = values
+        self.received += 1
+        if self._full is not None and len(self._buf) >= self.batch_max:
+            self._full.set()
+        return True
+
+    async def flush(self) -> int:
+        if not self._buf:
+            return 0
+        batch, self._buf = self._buf, {}
+        by_id = [{"id": int(k), **v} for (kind, k), v in batch.items() if kind == "id"]
+        by_provider = [{"pid": k, **v} for (kind, k), v in batch.items() if kind == "provider"]
+        try:
+            async with self._session() as db:
+                # executemany; mos satr topilmagan hisobotlar shunchaki hech narsani o'zgartirmaydi
+                if by_id:
+                    await db.execute(_UPDATE_BY_ID, by_id)
+                if by_provider:
+                    await db.execute(_UPDATE_BY_PROVIDER, by_provider)
+                await db.commit()
+        except Exception as e:
+            self.flush_errors += 1
+            logger.warning("sms receipts: %s ta hisobot yozilmadi: %s", len(batch), e)
+            # keyingi flush'da qayta urinamiz (yangilari ustun)
+            for k, v in batch.items():
+                self._buf.setdefault(k, v)
+            return 0
+        self.flushes += 1
+        self.updated += len(batch)
+        return len(batch)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name="sms_receipts")
+
+    async def stop(self) -> None:
+        if self.running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_sec)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "buffered": len(self._buf),
+            "received": self.received,
+            "ignored": self.ignored,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "updated": self.updated,
+            "flush_errors": self.flush_errors,
+        }
+
+
+delivery_receipts = DeliveryReceipts()
@@ -27,6 +27,22 @@ def sms_kelmagan(student) -> str:
         f"Bu Eskiz dan test"
     )
 
+def _hodisa_qatori(ev: dict) -> str:
+    if ev.get("kind") == "late":
+        return f"{ev.get('time')} da {ev.get('late')} daqiqa kechikib keldi"
+    if ev.get("kind") == "departed":
+        return f"{ev.get('time')} da chiqdi"
+    return f"{ev.get('time')} da keldi"
+
+def sms_jamlanma(events: list) -> str:
+    """Bir nechta hodisa (bitta o'quvchi yoki aka-ukalar) — bitta SMS."""
+    qatorlar = {}
+    for ev in events:
+        qatorlar.setdefault(ev.get("name") or "", []).append(_hodisa_qatori(ev))
+    return (
+        f"Bu Eskiz dan test"
+    )
+
 # app/services/sms_templates.py
 
 # def _fio(student) -> str:
@@ -63,3 +79,13 @@ def sms_kelmagan(student) -> str:
 #         "4. Kelmadi\n"
 #         f"Bugun farzandingiz {ism} maktabga tashrif buyurmadi. Iltimos, sababini ma’muriyatga xabar bering."
 #     )
+
+# def sms_jamlanma(events: list) -> str:
+#     qatorlar = {}
+#     for ev in events:
+#         qatorlar.setdefault(ev.get("name") or "", []).append(_hodisa_qatori(ev))
+#     matn = "\n".join(f"{ism}: " + ", ".join(q) for ism, q in qatorlar.items())
+#     return (
+#         "📌 O‘quvchi davomati (Face ID asosida)\n"
+#         f"Hurmatli ota-ona, bugungi davomat:\n{matn}"
+#     )
@@ -0,0 +1,216 @@
+# app/services/sms/token.py
+"""
+Yagona Eskiz token menejeri (face_terminal va services/sms/eskiz.py uchun).
+
+- single-flight: bir vaqtda nechta coroutine token so'rasa yoki 401 olsa ham
+  bitta login bajariladi, qolganlari o'sha natijani kutadi;
+- proaktiv yangilash: fon task token tugashidan ESKIZ_TOKEN_REFRESH_BEFORE_SEC
+  oldin yangilaydi — birinchi SMS login kechikishini to'lamaydi;
+- ESKIZ_TOKEN_BACKEND=postgres bo'lsa token `eskiz_tokens` jadvalida umumiy:
+  yangilash pg_advisory_xact_lock ostida, boshqa worker allaqachon yangilagan
+  bo'lsa shu token olinadi (butun deployment soatiga bitta login).
+  Default: memory (har worker o'zi login qiladi).
+"""
+import os
+import json
+import time
+import base64
+import random
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.models.eskiz_token import EskizToken
+from app.services.sms.gateway import sms_gateway
+
+logger = logging.getLogger("uvicorn.error")
+
+TOKEN_BACKEND = os.getenv("ESKIZ_TOKEN_BACKEND", "memory").lower()
+# JWT'da exp bo'lmasa ishlatiladigan muddat (~55 daqiqa)
+TOKEN_TTL_SEC = float(os.getenv("ESKIZ_TOKEN_TTL_SEC", str(55 * 60)))
+TOKEN_REFRESH_BEFORE_SEC = float(os.getenv("ESKIZ_TOKEN_REFRESH_BEFORE_SEC", "300"))
+TOKEN_REFRESH_JITTER_SEC = float(os.getenv("ESKIZ_TOKEN_REFRESH_JITTER_SEC", "30"))
+TOKEN_RETRY_SEC = float(os.getenv("ESKIZ_TOKEN_RETRY_SEC", "30"))
+# shu vaqtdan kam qolgan token ishlatilmaydi
+_EXPIRY_SKEW_SEC = 30.0
+
+
+def _jwt_exp(token: str) -> Optional[float]:
+    """JWT payload'idan `exp` (imzoni tekshirmasdan); bo'lmasa None."""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp else None
+    except Exception:
+        return None
+
+
+class EskizTokenManager:
+    def __init__(self, *, backend: str = TOKEN_BACKEND, key: Optional[str] = None, session_factory=None):
+        self.backend = backend
+        self.key = (key or settings.ESKIZ_EMAIL or "default")[:50]
+        self._session_factory = session_factory
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self._have_token: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # metrikalar
+        self.logins = 0
+        self.adopted = 0
+        self.coalesced = 0
+        self.refresh_errors = 0
+
+    def _session(self):
+        if self._session_factory is None:
+            from app.db.session import async_session
+            self._session_factory = async_session
+        return self._session_factory()
+
+    def _valid(self, margin: float = _EXPIRY_SKEW_SEC) -> bool:
+        return self._token is not None and time.time() < self._expires_at - margin
+
+    def _set(self, token: str, expires_at: float) -> None:
+        self._token = token
+        self._expires_at = expires_at
+        if self._have_token is not None:
+            self._have_token.set()
+
+    def reset(self) -> None:
+        """Lokal keshni tozalash (test/benchmark uchun)."""
+        self._token = None
+        self._expires_at = 0.0
+
+    # ---------- ommaviy API ----------
+    async def get(self) -> str:
+        if self._valid():
+            return self._token
+        return await self.refresh()
+
+    async def invalidate(self, rejected: str) -> str:
+        """401 olindi: token boshqa coroutine tomonidan allaqachon almashtirilgan bo'lsa yangisini qaytaradi."""
+        if self._token is not None and self._token != rejected and self._valid():
+            self.coalesced += 1
+            return self._token
+        return await self.refresh(rejected=rejected)
+
+    async def refresh(self, *, rejected: Optional[str] = None, proactive: bool = False) -> str:
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.create_task(self._refresh(rejected, proactive))
+        else:
+            self.coalesced += 1
+        # bitta kutuvchi bekor qilinsa ham login davom etadi
+        return await asyncio.shield(self._inflight)
+
+    # ---------- yangilash ----------
+    async def _login(self) -> Tuple[str, float]:
+        r = await sms_gateway.client.post(
+            "/api/auth/login",
+            data={"email": settings.ESKIZ_EMAIL, "password": settings.ESKIZ_PASSWORD},
+        )
+        if r.is_error:
+            raise RuntimeError(f"Eskiz login failed {r.status_code}: {r.text}")
+        data = r.json()
+        inner = data.get("data") or {}
+        token = inner.get("token") or inner.get("access_token") or data.get("token")
+        if not token:
+            raise RuntimeError(f"Eskiz token not found in response: {data}")
+        self.logins += 1
+        now = time.time()
+        exp = _jwt_exp(token)
+        expires_at = min(exp, now + TOKEN_TTL_SEC) if exp else now + TOKEN_TTL_SEC
+        return token, expires_at
+
+    async def _refresh(self, rejected: Optional[str], proactive: bool) -> str:
+        if self.backend == "postgres":
+            token, expires_at = await self._refresh_shared(rejected, proactive)
+        else:
+            token, expires_at = await self._login()
+        self._set(token, expires_at)
+        return token
+
+    async def _refresh_shared(self, rejected: Optional[str], proactive: bool) -> Tuple[str, float]:
+        # kerakli minimal qoldiq: proaktiv yangilashda oldindan yangilash oralig'i
+        need = TOKEN_REFRESH_BEFORE_SEC if proactive else _EXPIRY_SKEW_SEC
+        async with self._session() as db:
+            await db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:k))"), {"k": f"eskiz_token:{self.key}"})
+            row = (await db.execute(
+                select(EskizToken.token, EskizToken.expires_at).where(EskizToken.key == self.key)
+            )).first()
+            if row is not None and row.token != rejected:
+                expires_at = row.expires_at.timestamp()
+                if expires_at - time.time() > need:
+                    await db.commit()
+                    self.adopted += 1
+                    return row.token, expires_at
+
+            token, expires_at = await self._login()
+            stmt = pg_insert(EskizToken).values(
+                key=self.key, token=token,
+                expires_at=datetime.fromtimestamp(expires_at, timezone.utc),
+            )
+            await db.execute(stmt.on_conflict_do_update(
+                index_elements=[EskizToken.key],
+                set_={"token": stmt.excluded.token, "expires_at": stmt.excluded.expires_at, "updated_at": text("now()")},
+            ))
+            await db.commit()
+        return token, expires_at
+
+    # ---------- fon yangilovchi ----------
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._have_token = asyncio.Event()
+        if self._token is not None:
+            self._have_token.set()
+        self._task = asyncio.create_task(self._run(), name="eskiz_token")
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self) -> None:
+        # birinchi token talab bo'yicha olinadi (startup'da tarmoqqa chiqilmaydi)
+        await self._have_token.wait()
+        while True:
+            delay = self._expires_at - TOKEN_REFRESH_BEFORE_SEC - time.time()
+            # workerlar bir vaqtda uyg'onmasligi uchun
+            await asyncio.sleep(max(delay, 0) + random.uniform(0, TOKEN_REFRESH_JITTER_SEC))
+            try:
+                await self.refresh(proactive=True)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.refresh_errors += 1
+                logger.warning("eskiz token: proaktiv yangilash xatosi: %s", e)
+                await asyncio.sleep(TOKEN_RETRY_SEC)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "has_token": self._token is not None,
+            "expires_in_sec": round(self._expires_at - time.time(), 1) if self._token else None,
+            "logins": self.logins,
+            "adopted": self.adopted,
+            "coalesced": self.coalesced,
+            "refresh_errors": self.refresh_errors,
+            "refresher_running": self.running,
+        }
+
+
+eskiz_tokens = EskizTokenManager()
@@ -1,7 +1,8 @@
 # app/services/student_service.py
 
 from datetime import date, timedelta
-from sqlalchemy import or_
+from typing import Optional
+from sqlalchemy import or_, func
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
 from app.db.session import async_session
@@ -56,11 +57,15 @@ async def get_student_scores(student_id: int, filter: str) -> list[ScoreOut]:
 
 
 async def get_average_score(student_id: int, filter: str):
-    scores = await get_student_scores(student_id, filter)
-    if not scores:
-        return {"average_score": 0.0}
-    avg = round(sum([s.score for s in scores]) / len(scores), 2)
-    return {"average_score": avg}
+    # AVG SQL tomonda: Score satrlari (va joined student) yuklanmaydi
+    date_from = get_filter_start_date(filter)
+    async with async_session() as session:
+        avg = await session.scalar(
+            select(func.avg(Score.score))
+            .where(Score.student_id == student_id)
+            .where(Score.date >= date_from)
+        )
+    return {"average_score": round(float(avg), 2) if avg is not None else 0.0}
 
 
 async def get_attendance_records(student_id: int, filter: str) -> list[AttendanceOut]:
@@ -74,19 +79,21 @@ async def get_attendance_records(student_id: int, filter: str) -> list[Attendanc
         return result.scalars().all()
 
 
+def _percent(present: int, total: int):
+    return round((present / total) * 100, 2) if total else 0
+
+
 async def get_attendance_percentage(student_id: int, days: int):
+    # COUNT / COUNT FILTER — Attendance (lazy="joined" student/teacher bilan) yuklanmaydi
     from_date = date.today() - timedelta(days=days)
     async with async_session() as session:
-        result = await session.execute(
-            select(Attendance)
+        total, present = (await session.execute(
+            select(func.count(), func.count().filter(Attendance.is_present.is_(True)))
+            .select_from(Attendance)
             .where(Attendance.student_id == student_id)
             .where(Attendance.date >= from_date)
-        )
-        records = result.scalars().all()
-        total = len(records)
-        present = sum(1 for r in records if r.is_present)
-        percent = round((present / total) * 100, 2) if total else 0
-        return {"percentage": percent}
+        )).one()
+        return {"percentage": _percent(present, total)}
 
 
 async def get_full_report(student_id: int, filter: str):
@@ -98,6 +105,69 @@ async def get_full_report(student_id: int, filter: str):
         "bonus_points": 2.5  # optional
     }
 
+async def get_students_stats(
+    db: AsyncSession,
+    *,
+    school_id: Optional[int] = None,
+    class_id: Optional[int] = None,
+    filter: str = "monthly",
+) -> list[dict]:
+    """
+    Sinf yoki maktabdagi barcha o'quvchilar uchun o'rtacha baho va davomat foizi —
+    bitta so'rovda (har o'quvchiga alohida so'rov o'rniga). Oyna: get_full_report bilan bir xil.
+    """
+    date_from = get_filter_start_date(filter)
+    att_from = date.today() - timedelta(days=7 if filter == "weekly" else 30)
+
+    conds = []
+    if school_id is not None:
+        conds.append(Student.school_id == school_id)
+    if class_id is not None:
+        conds.append(Student.class_id == class_id)
+    # agregatlar faqat shu o'quvchilar bo'yicha (butun jadval emas)
+    ids = select(Student.id).where(*conds)
+
+    scores = (
+        select(Score.student_id, func.avg(Score.score).label("avg"), func.count().label("n"))
+        .where(Score.student_id.in_(ids), Score.date >= date_from)
+        .group_by(Score.student_id)
+        .subquery()
+    )
+    att = (
+        select(
+            Attendance.student_id,
+            func.count().label("total"),
+            func.count().filter(Attendance.is_present.is_(True)).label("present"),
+        )
+        .where(Attendance.student_id.in_(ids), Attendance.date >= att_from)
+        .group_by(Attendance.student_id)
+        .subquery()
+    )
+    stmt = (
+        select(
+            Student.id, Student.first_name, Student.last_name, Student.class_id,
+            scores.c.avg, scores.c.n, att.c.total, att.c.present,
+        )
+        .outerjoin(scores, scores.c.student_id == Student.id)
+        .outerjoin(att, att.c.student_id == Student.id)
+        .where(*conds)
+        .order_by(Student.last_name, Student.first_name, Student.id)
+    )
+    rows = (await db.execute(stmt)).all()
+    return [
+        {
+            "student_id": r.id,
+            "first_name": r.first_name,
+            "last_name": r.last_name,
+            "class_id": r.class_id,
+            "average_score": round(float(r.avg), 2) if r.avg is not None else 0.0,
+            "scores_count": r.n or 0,
+            "attendance_percentage": _percent(r.present or 0, r.total or 0),
+        }
+        for r in rows
+    ]
+
+
 DAYS = ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"]
 
 async def get_week_schedule(class_name: str, student_id: int, db: AsyncSession) -> list[dict]:
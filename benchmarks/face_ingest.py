@@ -0,0 +1,319 @@
+# benchmarks/face_ingest.py
+"""
+Face terminal yuklama generatori va ingest benchmarki.
+
+N ta Hikvision terminalini simulyatsiya qiladi: har biri ertalabki "rush" tezligida
+(Poisson oqimi) multipart (JSON + JPEG) va JSON AccessControllerEvent POST qiladi —
+haqiqiy urishlar, double-tap'lar, heartbeat va subEventType=21 shovqini bilan.
+
+    # in-process (ASGI, app bilan bir jarayonda): SQL soni va pool kutishi ham o'lchanadi
+    DATABASE_URL=postgresql://localhost/bqsrm_bench python -m benchmarks.face_ingest
+    python -m benchmarks.face_ingest --terminals 20 --rate 5 --duration 30 --route /face-terminal/logV2
+    # ishlab turgan serverga (faqat mijoz tomoni metrikalari)
+    python -m benchmarks.face_ingest --target http://127.0.0.1:8000
+
+DB: lokal Postgres (alembic upgrade head qilingan). SQLite o'rnini bosa olmaydi —
+ingest yo'li Postgres'ga xos (ON CONFLICT … partial index, xmax, UNLOGGED).
+Benchmark "__bench__" maktabi va face_terminal_id >= --id-base o'quvchilarni yaratadi,
+oxirida ularni o'chiradi (--keep bo'lsa qoldiradi). Ota-ona telefoni yo'q — SMS ketmaydi.
+
+Natijalar benchmarks/results/face_ingest.jsonl ga qo'shiladi (git commit bilan);
+oldingi xuddi shu parametrlardagi natija bilan farq chiqariladi.
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime, date, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.face_prefilter import BOUNDARY, _event, _multipart
+
+RESULTS_PATH = os.path.join(os.path.dirname(__file__), "results", "face_ingest.jsonl")
+LOCAL_TZ = timezone(timedelta(hours=int(os.getenv("LOCAL_TZ_HOURS", "5"))))
+
+
+# =========================
+#   Hodisalar
+# =========================
+def _access_event(face_id: int, name: str, sub_event: int = 75) -> dict:
+    ev = _event(sub_event)
+    ev["dateTime"] = datetime.now(LOCAL_TZ).isoformat(timespec="seconds")
+    ev["AccessControllerEvent"]["employeeNoString"] = str(face_id)
+    ev["AccessControllerEvent"]["name"] = name
+    ev["AccessControllerEvent"]["serialNo"] = random.randint(1, 10**6)
+    return ev
+
+
+def _payload(ev: dict, multipart: bool, image_kb: int):
+    if multipart:
+        return _multipart(ev, image_kb * 1024), f"multipart/form-data; boundary={BOUNDARY}"
+    return json.dumps(ev).encode(), "application/json"
+
+
+class _Stats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.status: Dict[str, int] = {}
+        self.sent = 0
+        self.access_events = 0
+
+    def add(self, ms: float, status: str) -> None:
+        self.latencies.append(ms)
+        self.status[status] = self.status.get(status, 0) + 1
+
+
+def _pct(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 2)
+
+
+async def _terminal(client: httpx.AsyncClient, idx: int, people: List[tuple], args, stats: _Stats, stop_at: float):
+    rnd = random.Random(args.seed * 1000 + idx)
+    url = f"{args.route}?device=BENCH-{idx:03d}"
+    while time.monotonic() < stop_at:
+        await asyncio.sleep(rnd.expovariate(args.rate))
+        roll = rnd.random()
+        face_id, name = rnd.choice(people)
+        if roll < args.heartbeat_ratio:
+            body, ctype = json.dumps({"eventType": "heartBeat", "dateTime": datetime.now(LOCAL_TZ).isoformat()}).encode(), "application/json"
+            repeats = 1
+        else:
+            sub = 21 if roll < args.heartbeat_ratio + args.noise_ratio else 75
+            body, ctype = _payload(_access_event(face_id, name, sub), rnd.random() < args.multipart_ratio, args.image_kb)
+            # double-tap: terminal bir necha yuz ms ichida qayta yuboradi
+            repeats = 2 if sub == 75 and rnd.random() < args.double_tap_ratio else 1
+            if sub == 75:
+                stats.access_events += repeats
+        for _ in range(repeats):
+            started = time.perf_counter()
+            try:
+                r = await client.post(url, content=body, headers={"content-type": ctype})
+                status = str(r.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            stats.add((time.perf_counter() - started) * 1000, status)
+            stats.sent += 1
+
+
+# =========================
+#   In-process o'lchovlar
+# =========================
+class _DbProbe:
+    """SQL statementlar soni va pool'dan ulanish olish vaqti (faqat in-process)."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.statements = 0
+        self.pool_waits: List[float] = []
+        sync_engine = engine.sync_engine
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _count(*_a, **_kw):
+            self.statements += 1
+
+        pool = sync_engine.pool
+        orig = pool._do_get
+
+        def _timed_get():
+            t0 = time.perf_counter()
+            try:
+                return orig()
+            finally:
+                self.pool_waits.append((time.perf_counter() - t0) * 1000)
+
+        pool._do_get = _timed_get
+
+
+async def _seed(n: int, id_base: int) -> List[tuple]:
+    from sqlalchemy import select
+    from app.db.session import async_session
+    from app.models.schools import School
+    from app.models.student import Student
+    from app.services.face_names import name_key
+
+    async with async_session() as db:
+        school = await db.scalar(select(School).where(School.name == "__bench__"))
+        if school is None:
+            school = School(name="__bench__")
+            db.add(school)
+            await db.flush()
+        await _cleanup(db, id_base, keep_school=True)
+        people = []
+        for i in range(n):
+            fid = id_base + i
+            first, last = f"Bench{i}", "Terminalov"
+            db.add(Student(
+                first_name=first, last_name=last, name_key=name_key(first, last),
+                student_code=f"BENCH{fid}", login=f"bench.{fid}", hashed_password="-",
+                face_terminal_id=fid, add_date=date.today(), school_id=school.id, is_active=True,
+            ))
+            people.append((fid, f"{first} {last}"))
+        await db.commit()
+    return people
+
+
+async def _cleanup(db, id_base: int, keep_school: bool = False) -> None:
+    from sqlalchemy import select, delete
+    from app.models.attendance import Attendance
+    from app.models.schools import School
+    from app.models.student import Student
+
+    ids = select(Student.id).where(Student.face_terminal_id >= id_base, Student.student_code.like("BENCH%"))
+    await db.execute(delete(Attendance).where(Attendance.student_id.in_(ids)))
+    await db.execute(delete(Student).where(Student.face_terminal_id >= id_base, Student.student_code.like("BENCH%")))
+    if not keep_school:
+        await db.execute(delete(School).where(School.name == "__bench__"))
+    await db.commit()
+
+
+# =========================
+#   Natijalar
+# =========================
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def _params_key(params: dict) -> str:
+    return json.dumps({k: params[k] for k in sorted(params) if k not in ("seed",)}, sort_keys=True)
+
+
+def _store(result: dict) -> Optional[dict]:
+    """Natijani yozadi; xuddi shu parametrlardagi oldingi natijani qaytaradi."""
+    os.makedirs(os.path.dirname(RESULTS_PATH), exist_ok=True)
+    previous = None
+    if os.path.exists(RESULTS_PATH):
+        with open(RESULTS_PATH, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    old = json.loads(line)
+                except ValueError:
+                    continue
+                if _params_key(old.get("params", {})) == _params_key(result["params"]):
+                    previous = old
+    with open(RESULTS_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    return previous
+
+
+def _print(result: dict, previous: Optional[dict]) -> None:
+    m = result["metrics"]
+    p = (previous or {}).get("metrics", {})
+    print(f"commit={result['commit']}  target={result['params']['target']}  route={result['params']['route']}")
+    for key in ("requests", "throughput_rps", "p50_ms", "p95_ms", "p99_ms", "drain_sec",
+                "sql_per_access_event", "pool_wait_avg_ms", "pool_wait_p95_ms"):
+        val = m.get(key)
+        old = p.get(key)
+        delta = ""
+        if isinstance(val, (int, float)) and isinstance(old, (int, float)) and old:
+            delta = f"  ({(val - old) / old * 100:+.1f}% vs {previous['commit']})"
+        print(f"  {key:22} {val}{delta}")
+    print(f"  {'status':22} {m['status']}")
+
+
+async def run(args) -> dict:
+    params = {k: v for k, v in vars(args).items() if k not in ("keep", "no_store")}
+    inproc = args.target == "inproc"
+    probe = None
+    queue = None
+
+    if inproc:
+        from app.main import app, _startup, _shutdown
+        from app.db.session import engine, async_session
+        from app.api.routes.face_terminal import ingest_queue
+        queue = ingest_queue
+        people = await _seed(args.people, args.id_base)
+        await _startup()
+        probe = _DbProbe(engine)
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30)
+    else:
+        people = [(args.id_base + i, f"Bench{i} Terminalov") for i in range(args.people)]
+        client = httpx.AsyncClient(base_url=args.target, timeout=30,
+                                   limits=httpx.Limits(max_connections=args.terminals))
+
+    stats = _Stats()
+    started = time.perf_counter()
+    stop_at = time.monotonic() + args.duration
+    try:
+        await asyncio.gather(*[
+            _terminal(client, i, people, args, stats, stop_at) for i in range(args.terminals)
+        ])
+        sent_sec = time.perf_counter() - started
+        drain_started = time.perf_counter()
+        if queue is not None:
+            # navbatdagi hodisalar yozilib bo'lishini kutamiz
+            while queue.running and queue.stats()["depth"]:
+                await asyncio.sleep(0.01)
+        drain_sec = time.perf_counter() - drain_started
+    finally:
+        await client.aclose()
+        if inproc:
+            await _shutdown()
+            if not args.keep:
+                async with async_session() as db:
+                    await _cleanup(db, args.id_base)
+
+    metrics = {
+        "requests": stats.sent,
+        "access_events": stats.access_events,
+        "throughput_rps": round(stats.sent / sent_sec, 1) if sent_sec else None,
+        "p50_ms": _pct(stats.latencies, 0.50),
+        "p95_ms": _pct(stats.latencies, 0.95),
+        "p99_ms": _pct(stats.latencies, 0.99),
+        "drain_sec": round(drain_sec, 3),
+        "status": stats.status,
+    }
+    if probe is not None:
+        metrics.update({
+            "sql_statements": probe.statements,
+            "sql_per_access_event": round(probe.statements / stats.access_events, 2) if stats.access_events else None,
+            "pool_wait_avg_ms": round(sum(probe.pool_waits) / len(probe.pool_waits), 3) if probe.pool_waits else None,
+            "pool_wait_p95_ms": _pct(probe.pool_waits, 0.95),
+            "ingest": queue.stats() if queue is not None else None,
+        })
+    return {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_rev(),
+        "params": params,
+        "metrics": metrics,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face terminal ingest load generator / benchmark")
+    parser.add_argument("--target", default="inproc", help="inproc (ASGI) yoki http://host:port")
+    parser.add_argument("--route", default="/face-terminal/log", help="/face-terminal/log | /face-terminal/logV2")
+    parser.add_argument("--terminals", type=int, default=10, help="terminallar soni")
+    parser.add_argument("--rate", type=float, default=3.0, help="har terminal uchun o'rtacha POST/s")
+    parser.add_argument("--duration", type=float, default=20.0, help="soniya")
+    parser.add_argument("--people", type=int, default=1000, help="o'quvchilar soni")
+    parser.add_argument("--id-base", type=int, default=900000, help="bench face_terminal_id boshlanishi")
+    parser.add_argument("--multipart-ratio", type=float, default=0.7)
+    parser.add_argument("--image-kb", type=int, default=40)
+    parser.add_argument("--double-tap-ratio", type=float, default=0.05)
+    parser.add_argument("--heartbeat-ratio", type=float, default=0.05)
+    parser.add_argument("--noise-ratio", type=float, default=0.05, help="subEventType=21 ulushi")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="bench ma'lumotlarini o'chirmaslik")
+    parser.add_argument("--no-store", action="store_true", help="natijani results/ ga yozmaslik")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    result = asyncio.run(run(args))
+    previous = None if args.no_store else _store(result)
+    _print(result, previous)
+
+
+if __name__ == "__main__":
+    main()
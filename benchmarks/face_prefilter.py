@@ -0,0 +1,121 @@
+# benchmarks/face_prefilter.py
+"""
+Prefilter benchmark: skip qilinadigan terminal POST'lari uchun so'rov boshiga CPU.
+
+    python -m benchmarks.face_prefilter            # default 20000 iteratsiya
+    python -m benchmarks.face_prefilter -n 5000
+
+Solishtiriladi:
+  - full     : eski yo'l — request.form() (multipart) / decode + json.loads, keyin subEventType tekshiruvi
+  - prefilter: app.services.face_prefilter.prefilter() xom bytes ustida
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from app.services import face_prefilter
+
+BOUNDARY = "----hikboundary7MA4YWxkTrZu0gW"
+
+
+def _event(sub_event: int, event_type: str = "AccessControllerEvent") -> dict:
+    return {
+        "ipAddress": "192.168.1.64",
+        "dateTime": "2025-09-17T07:55:12+05:00",
+        "activePostCount": 1,
+        "eventType": event_type,
+        "eventState": "active",
+        "eventDescription": "Access Controller Event",
+        "AccessControllerEvent": {
+            "deviceName": "Access Controller",
+            "majorEventType": 5,
+            "subEventType": sub_event,
+            "name": "Ali Valiyev",
+            "cardReaderNo": 1,
+            "employeeNoString": "1024",
+            "serialNo": 4312,
+            "userType": "normal",
+            "currentVerifyMode": "cardOrFace",
+            "mask": "no",
+        },
+    }
+
+
+def _multipart(event: dict, image_bytes: int) -> bytes:
+    parts = [
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="AccessControllerEvent"\r\n'
+        "Content-Type: application/json\r\n\r\n".encode()
+        + json.dumps(event).encode()
+        + b"\r\n",
+    ]
+    if image_bytes:
+        parts.append(
+            f"--{BOUNDARY}\r\n"
+            'Content-Disposition: form-data; name="Picture"; filename="face.jpg"\r\n'
+            "Content-Type: image/jpeg\r\n\r\n".encode()
+            + b"\xff\xd8\xff\xe0" + os.urandom(image_bytes) + b"\xff\xd9\r\n"
+        )
+    parts.append(f"--{BOUNDARY}--\r\n".encode())
+    return b"".join(parts)
+
+
+def _cases():
+    heartbeat = json.dumps({"eventType": "heartBeat", "dateTime": "2025-09-17T07:55:12+05:00"}).encode()
+    return [
+        ("json heartbeat", "application/json", heartbeat),
+        ("json subEventType=21", "application/json", json.dumps(_event(21)).encode()),
+        ("multipart subEventType=21 + 60KB jpeg", f"multipart/form-data; boundary={BOUNDARY}", _multipart(_event(21), 60_000)),
+        ("multipart subEventType=21 (no image)", f"multipart/form-data; boundary={BOUNDARY}", _multipart(_event(21), 0)),
+    ]
+
+
+async def _full_parse(body: bytes, ctype: str) -> str:
+    """receive_log'ning prefilter'dan oldingi yo'li (starlette Request orqali)."""
+    from starlette.requests import Request
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    req = Request({"type": "http", "method": "POST", "headers": [(b"content-type", ctype.encode())]}, receive)
+    if ctype.startswith("multipart/"):
+        form = await req.form()
+        part = form.get("AccessControllerEvent")
+        text = (await part.read()).decode("utf-8", errors="ignore") if hasattr(part, "read") else str(part)
+        await form.close()
+    else:
+        text = (await req.body()).decode("utf-8", errors="ignore")
+    data = json.loads(text or "{}")
+    event = data.get("AccessControllerEvent") or data
+    evt_type = event.get("eventType") or data.get("eventType")
+    if evt_type and evt_type != "AccessControllerEvent":
+        return f"eventType={evt_type}"
+    return f"subEventType={int(event.get('subEventType', -1))}"
+
+
+def _cpu_us(fn, n: int) -> float:
+    start = time.process_time()
+    for _ in range(n):
+        fn()
+    return (time.process_time() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face terminal prefilter benchmark")
+    parser.add_argument("-n", type=int, default=20000, help="iteratsiyalar soni")
+    args = parser.parse_args()
+
+    loop = asyncio.new_event_loop()
+    print(f"{'case':42} {'full µs':>10} {'prefilter µs':>13} {'saved µs':>10} {'x':>7}")
+    for name, ctype, body in _cases():
+        assert face_prefilter.prefilter(body) is not None, name
+        full = _cpu_us(lambda: loop.run_until_complete(_full_parse(body, ctype)), args.n)
+        fast = _cpu_us(lambda: face_prefilter.prefilter(body), args.n)
+        print(f"{name:42} {full:10.1f} {fast:13.2f} {full - fast:10.1f} {full / fast if fast else 0:7.0f}")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
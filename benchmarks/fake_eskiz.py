@@ -0,0 +1,279 @@
+# benchmarks/fake_eskiz.py
+"""
+Lokal Eskiz o'rinbosari (benchmark va yuklama sinovlari uchun).
+
+    python -m benchmarks.fake_eskiz --port 8765 --latency-ms 30
+    python -m benchmarks.fake_eskiz --tls          # o'z-o'zidan imzolangan sertifikat bilan
+    python -m benchmarks.fake_eskiz --error-rate 0.05 --token-ttl-sec 60 --callback-ms 500
+
+Endpointlar: POST /api/auth/login, POST /api/message/sms/send,
+POST /api/message/sms/send-batch, GET /stats.
+/stats — qabul qilingan so'rovlar va nechta alohida TCP ulanish ishlatilgani
+(mijoz host:port juftliklari) — socket qayta ishlatilishini ko'rish uchun.
+
+Nosozliklar:
+  --error-rate    — send/send-batch so'rovlarining shu ulushi 500 qaytaradi;
+  --token-ttl-sec — token shuncha soniyadan keyin eskiradi (401), 0 — cheksiz;
+  --callback-ms   — so'rovda callback_url bo'lsa, shuncha kechikish bilan
+                    delivery report (DELIVRD) POST qilinadi.
+Har raqamga nechta xabar kelgani `state.phones` da — yo'qolgan/takroriy xabarlarni
+sanash uchun (benchmarks/sms_pipeline.py).
+"""
+import os
+import ssl
+import asyncio
+import random
+import argparse
+import tempfile
+import threading
+import time
+import datetime as _dt
+from collections import Counter
+from typing import Dict, Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+class FakeEskizState:
+    def __init__(self, latency_ms: float = 0.0, *, error_rate: float = 0.0, token_ttl_sec: float = 0.0,
+                 callback_ms: Optional[float] = None, seed: int = 1):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.token_ttl_sec = token_ttl_sec
+        self.callback_ms = callback_ms
+        self.rnd = random.Random(seed)
+        self.tokens: Dict[str, float] = {}
+        self.next_id = 1
+        self.reset()
+
+    def reset(self) -> None:
+        self.logins = 0
+        self.sent = 0
+        self.requests = 0
+        self.connections = set()
+        self.phones = Counter()
+        self.errors = 0
+        self.expired = 0
+        self.callbacks = 0
+        self.callback_errors = 0
+
+    def stats(self) -> dict:
+        return {
+            "logins": self.logins, "sent": self.sent, "requests": self.requests,
+            "connections": len(self.connections), "errors": self.errors, "expired": self.expired,
+            "callbacks": self.callbacks, "callback_errors": self.callback_errors,
+        }
+
+
+def make_app(state: FakeEskizState) -> FastAPI:
+    app = FastAPI(title="Fake Eskiz")
+
+    def _track(request: Request) -> None:
+        if request.client:
+            state.connections.add((request.client.host, request.client.port))
+
+    async def _delay() -> None:
+        if state.latency_ms:
+            await asyncio.sleep(state.latency_ms / 1000)
+
+    def _reject(request: Request) -> Optional[JSONResponse]:
+        """Token eskirgan (401) yoki tasodifiy provayder xatosi (500)."""
+        if state.token_ttl_sec:
+            token = (request.headers.get("authorization") or "").removeprefix("Bearer ").strip()
+            issued = state.tokens.get(token)
+            if issued is None or time.monotonic() - issued > state.token_ttl_sec:
+                state.expired += 1
+                return JSONResponse({"message": "Expired", "status": "token-invalid"}, status_code=401)
+        if state.error_rate and state.rnd.random() < state.error_rate:
+            state.errors += 1
+            return JSONResponse({"message": "Internal server error"}, status_code=500)
+        return None
+
+    callback_client: Dict[str, httpx.AsyncClient] = {}
+
+    async def _callback(url: str, reports: list) -> None:
+        await asyncio.sleep(state.callback_ms / 1000)
+        client = callback_client.get("c")
+        if client is None:
+            client = callback_client["c"] = httpx.AsyncClient(timeout=10)
+        now = _dt.datetime.now(_dt.timezone(_dt.timedelta(hours=5))).strftime("%Y-%m-%d %H:%M:%S")
+        for report in reports:
+            try:
+                r = await client.post(url, json={**report, "status": "DELIVRD", "status_date": now})
+                r.raise_for_status()
+                state.callbacks += 1
+            except httpx.HTTPError:
+                state.callback_errors += 1
+
+    def _schedule_callback(url: Optional[str], reports: list) -> None:
+        if url and state.callback_ms is not None:
+            asyncio.get_running_loop().create_task(_callback(url, reports))
+
+    async def _body(request: Request) -> dict:
+        if "json" in (request.headers.get("content-type") or ""):
+            return await request.json()
+        return dict(await request.form())
+
+    @app.post("/api/auth/login")
+    async def login(request: Request):
+        _track(request)
+        await _delay()
+        state.logins += 1
+        token = f"fake-token-{state.logins}"
+        state.tokens[token] = time.monotonic()
+        return {"message": "token_generated", "data": {"token": token}, "token_type": "bearer"}
+
+    @app.post("/api/message/sms/send")
+    async def send(request: Request):
+        _track(request)
+        await _delay()
+        state.requests += 1
+        rejected = _reject(request)
+        if rejected is not None:
+            return rejected
+        body = await _body(request)
+        state.sent += 1
+        state.phones[str(body.get("mobile_phone"))] += 1
+        msg_id = f"fake-{state.next_id}"
+        state.next_id += 1
+        _schedule_callback(body.get("callback_url"), [{"request_id": msg_id, "message_id": msg_id}])
+        return {"id": msg_id, "message": "Waiting for SMS provider", "status": "waiting"}
+
+    @app.post("/api/message/sms/send-batch")
+    async def send_batch(request: Request):
+        _track(request)
+        await _delay()
+        state.requests += 1
+        rejected = _reject(request)
+        if rejected is not None:
+            return rejected
+        body = await request.json()
+        messages = body.get("messages") or []
+        state.sent += len(messages)
+        for m in messages:
+            state.phones[str(m.get("to"))] += 1
+        batch_id = f"fake-batch-{state.next_id}"
+        state.next_id += 1
+        _schedule_callback(body.get("callback_url"), [
+            {"request_id": batch_id, "user_sms_id": m.get("user_sms_id")} for m in messages
+        ])
+        return {"id": batch_id, "message": "Waiting for SMS provider", "status": ["waiting"] * len(messages)}
+
+    @app.get("/stats")
+    async def stats():
+        return state.stats()
+
+    return app
+
+
+def self_signed_cert(directory: str) -> tuple:
+    """127.0.0.1 uchun vaqtinchalik sertifikat (cert.pem, key.pem)."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+    import ipaddress
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = _dt.datetime.now(_dt.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - _dt.timedelta(minutes=1))
+        .not_valid_after(now + _dt.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path = os.path.join(directory, "cert.pem")
+    key_path = os.path.join(directory, "key.pem")
+    with open(cert_path, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    return cert_path, key_path
+
+
+class FakeEskizServer:
+    """Fon thread'ida ishlaydigan uvicorn; `with FakeEskizServer(...) as srv: srv.base_url`."""
+
+    def __init__(self, *, port: int = 0, latency_ms: float = 0.0, tls: bool = False, **faults):
+        self.state = FakeEskizState(latency_ms, **faults)
+        self.port = port or _free_port()
+        self.tls = tls
+        self._tmp: Optional[tempfile.TemporaryDirectory] = None
+        self.cert_path: Optional[str] = None
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"{'https' if self.tls else 'http'}://127.0.0.1:{self.port}"
+
+    def ssl_context(self):
+        """Mijoz uchun: shu sertifikatga ishonadigan SSLContext (TLS bo'lmasa True)."""
+        if not self.tls:
+            return True
+        return ssl.create_default_context(cafile=self.cert_path)
+
+    def __enter__(self):
+        kwargs = {}
+        if self.tls:
+            self._tmp = tempfile.TemporaryDirectory()
+            self.cert_path, key_path = self_signed_cert(self._tmp.name)
+            kwargs = {"ssl_certfile": self.cert_path, "ssl_keyfile": key_path}
+        config = uvicorn.Config(make_app(self.state), host="127.0.0.1", port=self.port,
+                                log_level="warning", access_log=False, **kwargs)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("fake eskiz server ishga tushmadi")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(5)
+        if self._tmp is not None:
+            self._tmp.cleanup()
+
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Eskiz stand-in server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--tls", action="store_true")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="send so'rovlarining 500 ulushi")
+    parser.add_argument("--token-ttl-sec", type=float, default=0.0, help="token muddati (0 — cheksiz)")
+    parser.add_argument("--callback-ms", type=float, default=None, help="delivery report kechikishi")
+    args = parser.parse_args()
+
+    with FakeEskizServer(port=args.port, latency_ms=args.latency_ms, tls=args.tls, error_rate=args.error_rate,
+                         token_ttl_sec=args.token_ttl_sec, callback_ms=args.callback_ms) as srv:
+        print(f"fake eskiz: {srv.base_url}  (Ctrl+C — to'xtatish)")
+        if srv.cert_path:
+            print(f"sertifikat: {srv.cert_path}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
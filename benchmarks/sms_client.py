@@ -0,0 +1,85 @@
+# benchmarks/sms_client.py
+"""
+SMS transport benchmarki: har xabar uchun yangi httpx.AsyncClient (eski yo'l)
+va yagona pool'langan sms_gateway klienti — lokal fake Eskiz serveriga qarshi.
+
+    python -m benchmarks.sms_client                  # 300 xabar, 10 parallel, TLS
+    python -m benchmarks.sms_client -n 1000 --concurrency 20 --latency-ms 20 --no-tls
+
+Ikkala rejim ham face_terminal._send_sms ni chaqiradi; farq faqat transportda.
+"""
+import time
+import asyncio
+import argparse
+
+import httpx
+
+from benchmarks.fake_eskiz import FakeEskizServer
+from app.services.sms import token as sms_token
+
+
+class _PerMessageGateway:
+    """Eski xatti-harakat: har `client` murojaatida yangi klient (yopilishi kuzatiladi)."""
+
+    def __init__(self, base_url: str, verify):
+        self.base_url = base_url
+        self.verify = verify
+        self.opened = []
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        c = httpx.AsyncClient(base_url=self.base_url, verify=self.verify, timeout=25)
+        self.opened.append(c)
+        return c
+
+    async def close(self) -> None:
+        await asyncio.gather(*(c.aclose() for c in self.opened))
+
+
+async def _run(ft, gateway, n: int, concurrency: int) -> float:
+    # face_terminal va token menejeri bir xil transportdan foydalanadi
+    ft.sms_gateway = gateway
+    sms_token.sms_gateway = gateway
+    sms_token.eskiz_tokens.reset()
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with sem:
+            await ft._send_sms(f"99890{i % 10_000_000:07d}", "Farzandingiz maktabga keldi")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    elapsed = time.perf_counter() - started
+    await gateway.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SMS gateway client benchmark")
+    parser.add_argument("-n", type=int, default=300, help="xabarlar soni")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="fake server javob kechikishi")
+    parser.add_argument("--no-tls", action="store_true", help="oddiy HTTP (TLS handshake'siz)")
+    args = parser.parse_args()
+
+    from app.api.routes import face_terminal as ft
+    from app.services.sms.gateway import SmsGateway
+
+    async def bench(srv):
+        modes = (
+            ("per-message", lambda: _PerMessageGateway(srv.base_url, srv.ssl_context())),
+            ("pooled", lambda: SmsGateway(srv.base_url, verify=srv.ssl_context(), max_connections=args.concurrency)),
+        )
+        for name, factory in modes:
+            srv.state.reset()
+            elapsed = await _run(ft, factory(), args.n, args.concurrency)
+            st = srv.state.stats()
+            print(f"{name:12} {st['sent']:6d} {elapsed:8.2f} {args.n / elapsed:8.0f} {st['connections']:6d} {st['logins']:7d}")
+
+    with FakeEskizServer(latency_ms=args.latency_ms, tls=not args.no_tls) as srv:
+        print(f"{'mode':12} {'msgs':>6} {'sec':>8} {'msg/s':>8} {'conns':>6} {'logins':>7}")
+        asyncio.run(bench(srv))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,460 @@
+# benchmarks/sms_pipeline.py
+"""
+SMS pipeline benchmarki — lokal fake Eskiz serveriga (benchmarks/fake_eskiz.py) qarshi.
+
+Ssenariylar:
+  notify  — face_terminal._notify_parents -> sms_outbox -> sms_dispatcher -> Eskiz
+            (+ delivery report: fake server -> /sms/eskiz/callback -> delivery_receipts);
+  no_show — /notify-no-show yo'li: sms_jobs.create_no_show_job + no_show_jobs + dispatcher;
+  direct  — services/sms/eskiz.send_sms to'g'ridan-to'g'ri (DB'siz);
+  kill    — outbox'ni alohida worker jarayoni yuboradi, --kill-after soniyadan keyin
+            SIGKILL; ikkinchi worker qolganini yuboradi. Yo'qolgan (Eskiz'ga umuman
+            yetmagan) va takroriy (at-least-once) xabarlar sanaladi.
+
+    DATABASE_URL=postgresql://localhost/bqsrm_bench python -m benchmarks.sms_pipeline
+    python -m benchmarks.sms_pipeline --scenarios notify,kill -n 5000 --latency-ms 30 \\
+        --error-rate 0.02 --token-ttl-sec 20 --callback-ms 200
+    python -m benchmarks.sms_pipeline --scenarios direct       # Postgres kerak emas
+
+DB: alohida bench Postgres (alembic upgrade head qilingan). no_show ssenariysi
+bazadagi bugun kelmagan BARCHA o'quvchilarga xabar qo'yadi — ishlab turgan bazada
+ishlatmang (xabarlar baribir faqat fake serverga ketadi). Benchmark "__bench_sms__"
+maktabi va face_terminal_id >= --id-base o'quvchilarni yaratadi, oxirida o'chiradi.
+
+Natija: msg/s, Eskiz so'rovlari, TCP ulanishlar (socket qayta ishlatilishi),
+loginlar, 401/500 lar, yo'qolgan/takroriy xabarlar, yetkazish hisobotlari.
+"""
+import os
+import sys
+import ssl
+import json
+import time
+import signal
+import asyncio
+import argparse
+import subprocess
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional
+
+from benchmarks.fake_eskiz import FakeEskizServer, _free_port
+
+BENCH_SCHOOL = "__bench_sms__"
+LOCAL_TZ = timezone(timedelta(hours=int(os.getenv("LOCAL_TZ_HOURS", "5"))))
+TEXT = "Farzandingiz maktabga keldi"
+
+
+def _phone(i: int) -> str:
+    return f"99890{i % 10_000_000:07d}"
+
+
+# =========================
+#   Sozlash
+# =========================
+async def _point_gateway(base_url: str, verify) -> None:
+    """Yagona sms_gateway'ni fake serverga yo'naltirish (barcha modullar shu obyektni ishlatadi)."""
+    from app.services.sms.gateway import sms_gateway
+    from app.services.sms.token import eskiz_tokens
+
+    await sms_gateway.close()
+    sms_gateway.base_url = base_url
+    sms_gateway.verify = verify
+    eskiz_tokens.reset()
+
+
+def _tune_dispatcher(args) -> None:
+    from app.api.routes import face_terminal as ft
+    from app.services.sms.rate_limit import TokenBucket
+
+    ft.sms_dispatcher.batch_size = args.batch_size
+    ft.sms_dispatcher.rate = TokenBucket(args.rate, args.rate)
+
+
+async def _seed(n: int, id_base: int) -> int:
+    from sqlalchemy import select
+    from app.db.session import async_session
+    from app.models.schools import School
+    from app.models.student import Student
+    from app.services.face_names import name_key
+
+    async with async_session() as db:
+        school = await db.scalar(select(School).where(School.name == BENCH_SCHOOL))
+        if school is None:
+            school = School(name=BENCH_SCHOOL)
+            db.add(school)
+            await db.flush()
+        await _cleanup(db, school.id, id_base)
+        for i in range(n):
+            fid = id_base + i
+            first, last = f"Sms{i}", "Benchov"
+            db.add(Student(
+                first_name=first, last_name=last, name_key=name_key(first, last),
+                student_code=f"SMSB{fid}", login=f"smsbench.{fid}", hashed_password="-",
+                face_terminal_id=fid, add_date=date.today(), school_id=school.id, is_active=True,
+                parent_father_phone=_phone(i), parent_father_e164="+" + _phone(i),
+            ))
+        await db.commit()
+        return school.id
+
+
+async def _cleanup(db, school_id: int, id_base: int, drop_school: bool = False) -> None:
+    from sqlalchemy import delete
+    from app.models.schools import School
+    from app.models.sms_outbox import SmsOutbox
+    from app.models.student import Student
+
+    await db.execute(delete(SmsOutbox).where(SmsOutbox.school_id == school_id))
+    await db.execute(delete(Student).where(
+        Student.face_terminal_id >= id_base, Student.student_code.like("SMSB%"),
+    ))
+    if drop_school:
+        await db.execute(delete(School).where(School.id == school_id))
+    await db.commit()
+
+
+async def _students(school_id: int) -> list:
+    from sqlalchemy import select
+    from app.db.session import async_session
+    from app.models.student import Student
+
+    async with async_session() as db:
+        return list((await db.execute(select(Student).where(Student.school_id == school_id))).scalars())
+
+
+async def _enqueue(school_id: int) -> int:
+    """Har o'quvchi uchun "keldi" hodisasi — face_terminal._notify_parents orqali."""
+    from app.api.routes import face_terminal as ft
+    from app.db.session import async_session
+
+    students = await _students(school_id)
+    now = datetime.now(LOCAL_TZ).time()
+    async with async_session() as db:
+        for i, st in enumerate(students, 1):
+            await ft._notify_parents(db, st, TEXT, ft._sms_event(st, "keldi", now))
+            if i % 500 == 0:
+                await db.commit()
+                ft.sms_dispatcher.wake()
+        await db.commit()
+    ft.sms_dispatcher.wake()
+    return len(students)
+
+
+async def _outbox_counts(*, school_id: Optional[int] = None, job_id: Optional[int] = None) -> dict:
+    from sqlalchemy import func, select
+    from app.db.session import async_session
+    from app.models.sms_outbox import SmsOutbox
+
+    q = select(SmsOutbox.status, func.count()).group_by(SmsOutbox.status)
+    if school_id is not None:
+        q = q.where(SmsOutbox.school_id == school_id)
+    if job_id is not None:
+        q = q.where(SmsOutbox.job_id == job_id)
+    async with async_session() as db:
+        return {status: n for status, n in (await db.execute(q)).all()}
+
+
+async def _drain(total: int, timeout: float, **where) -> dict:
+    """sent + failed = total bo'lguncha kutish."""
+    deadline = time.monotonic() + timeout
+    while True:
+        counts = await _outbox_counts(**where)
+        if counts.get("sent", 0) + counts.get("failed", 0) >= total or time.monotonic() > deadline:
+            return counts
+        await asyncio.sleep(0.2)
+
+
+async def _delivered(school_id: int) -> int:
+    from sqlalchemy import func, select
+    from app.db.session import async_session
+    from app.models.sms_outbox import SmsOutbox
+
+    async with async_session() as db:
+        return await db.scalar(select(func.count()).where(
+            SmsOutbox.school_id == school_id, SmsOutbox.delivery_status == "delivered",
+        ))
+
+
+class _CallbackReceiver:
+    """/sms/eskiz/callback ni shu event loop'da ko'taradi (haqiqiy route + delivery_receipts)."""
+
+    def __init__(self):
+        self.port = _free_port()
+        self._server = None
+        self._task = None
+
+    async def __aenter__(self):
+        import uvicorn
+        from fastapi import FastAPI
+        from app.api.routes.sms import router
+        from app.core.config import settings
+        from app.services.sms.receipts import delivery_receipts
+
+        app = FastAPI()
+        app.include_router(router)
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", access_log=False)
+        self._server = uvicorn.Server(config)
+        self._task = asyncio.create_task(self._server.serve())
+        while not self._server.started:
+            await asyncio.sleep(0.01)
+        settings.ESKIZ_CALLBACK_URL = f"http://127.0.0.1:{self.port}/sms/eskiz/callback"
+        await delivery_receipts.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        from app.core.config import settings
+        from app.services.sms.receipts import delivery_receipts
+
+        settings.ESKIZ_CALLBACK_URL = None
+        await delivery_receipts.stop()
+        self._server.should_exit = True
+        await self._task
+
+
+# =========================
+#   Ssenariylar
+# =========================
+def _row(name: str, msgs: int, elapsed: float, srv, **extra) -> dict:
+    st = srv.state.stats()
+    return {
+        "scenario": name, "msgs": msgs, "sec": round(elapsed, 2),
+        "msg_s": round(msgs / elapsed, 1) if elapsed > 0 else None,
+        **st, **extra,
+    }
+
+
+def _loss(srv, phones: List[str]) -> dict:
+    got = srv.state.phones
+    return {
+        "lost": sum(1 for p in phones if got[p] == 0),
+        "dup": sum(max(got[p] - 1, 0) for p in phones),
+    }
+
+
+async def _scenario_direct(srv, args) -> dict:
+    from app.services.sms import eskiz
+
+    srv.state.reset()
+    sem = asyncio.Semaphore(args.concurrency)
+    phones = [_phone(i) for i in range(args.n)]
+    failed = 0
+
+    async def one(p: str):
+        nonlocal failed
+        async with sem:
+            try:
+                r = await eskiz.send_sms(p, TEXT)
+                failed += 0 if r.get("ok") else 1
+            except Exception:
+                failed += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(p) for p in phones))
+    return _row("direct", args.n, time.perf_counter() - started, srv, failed=failed, **_loss(srv, phones))
+
+
+async def _scenario_notify(srv, args, school_id: int) -> dict:
+    from app.api.routes import face_terminal as ft
+
+    srv.state.reset()
+    started = time.perf_counter()
+    n = await _enqueue(school_id)
+    enqueued = time.perf_counter() - started
+    counts = await _drain(n, args.timeout, school_id=school_id)
+    elapsed = time.perf_counter() - started
+    extra = {}
+    if args.callback_ms is not None:
+        # oxirgi hisobotlar kelib, flush bo'lishi uchun
+        await asyncio.sleep(args.callback_ms / 1000 + 0.5)
+        from app.services.sms.receipts import delivery_receipts
+        await delivery_receipts.flush()
+        extra["delivered"] = await _delivered(school_id)
+    return _row(
+        "notify", n, elapsed, srv, enqueue_sec=round(enqueued, 2), outbox=counts,
+        dispatcher=ft.sms_dispatcher.stats(), **_loss(srv, [_phone(i) for i in range(n)]), **extra,
+    )
+
+
+async def _scenario_no_show(srv, args) -> dict:
+    from app.api.routes import face_terminal as ft
+    from app.db.session import async_session
+    from app.services.sms import jobs as sms_jobs
+
+    srv.state.reset()
+    started = time.perf_counter()
+    async with async_session() as db:
+        job, _ = await sms_jobs.create_no_show_job(db, datetime.now(LOCAL_TZ).date(), True)
+        job_id = job.id
+    ft.no_show_jobs.wake()
+    deadline = time.monotonic() + args.timeout
+    while True:
+        async with async_session() as db:
+            info = await sms_jobs.job_status(db, job_id)
+        if info["status"] == "done" or time.monotonic() > deadline:
+            break
+        await asyncio.sleep(0.2)
+    async with async_session() as db:
+        info = await sms_jobs.job_status(db, job_id)
+    total = info["enqueued"]
+    counts = await _drain(total, max(deadline - time.monotonic(), 0), job_id=job_id)
+    return _row("no_show", total, time.perf_counter() - started, srv, outbox=counts, job=info)
+
+
+def _spawn_worker(srv, args) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        ESKIZ_BASE_URL=srv.base_url,
+        SMS_BATCH_SIZE=str(args.batch_size),
+        SMS_RATE_PER_SEC=str(args.rate),
+        SMS_RATE_BURST=str(args.rate),
+        SMS_RATE_WORKERS="1",
+        SMS_OUTBOX_LEASE_SEC=str(args.lease_sec),
+    )
+    cmd = [sys.executable, "-m", "benchmarks.sms_pipeline", "--worker"]
+    if srv.cert_path:
+        cmd += ["--cafile", srv.cert_path]
+    return subprocess.Popen(cmd, env=env)
+
+
+async def _scenario_kill(srv, args, school_id: int) -> dict:
+    from app.api.routes import face_terminal as ft
+
+    # bu jarayonda dispatcher ishlamaydi — yuborish faqat worker jarayonlarida
+    await ft.sms_dispatcher.stop()
+    srv.state.reset()
+    started = time.perf_counter()
+    n = await _enqueue(school_id)
+    worker = _spawn_worker(srv, args)
+    await asyncio.sleep(args.kill_after)
+    worker.send_signal(signal.SIGKILL)
+    worker.wait()
+    at_kill = srv.state.sent
+    sending = (await _outbox_counts(school_id=school_id)).get("sending", 0)
+
+    worker = _spawn_worker(srv, args)
+    try:
+        counts = await _drain(n, args.timeout, school_id=school_id)
+    finally:
+        worker.terminate()
+        worker.wait()
+    elapsed = time.perf_counter() - started
+    await ft.sms_dispatcher.start()
+    return _row(
+        "kill", n, elapsed, srv, sent_before_kill=at_kill, leased_at_kill=sending, outbox=counts,
+        not_sent=n - counts.get("sent", 0), **_loss(srv, [_phone(i) for i in range(n)]),
+    )
+
+
+# =========================
+#   Worker jarayoni (kill ssenariysi)
+# =========================
+async def _worker(cafile: Optional[str]) -> None:
+    from app.api.routes import face_terminal as ft
+    from app.services.sms.gateway import sms_gateway
+
+    if cafile:
+        sms_gateway.verify = ssl.create_default_context(cafile=cafile)
+    await sms_gateway.start()
+    await ft.sms_dispatcher.start()
+    while True:
+        await asyncio.sleep(3600)
+
+
+# =========================
+#   Natijalar
+# =========================
+_COLUMNS = (
+    ("scenario", 9), ("msgs", 6), ("sec", 7), ("msg_s", 7), ("requests", 8), ("connections", 5),
+    ("logins", 6), ("expired", 5), ("errors", 5), ("lost", 5), ("dup", 5), ("delivered", 9),
+)
+_HEADERS = {"connections": "conns", "expired": "401", "errors": "500", "msg_s": "msg/s"}
+
+
+def _print(rows: List[dict], verbose: bool) -> None:
+    print(" ".join(f"{_HEADERS.get(k, k):>{w}}" for k, w in _COLUMNS))
+    for r in rows:
+        print(" ".join(f"{'-' if r.get(k) is None else r.get(k):>{w}}" for k, w in _COLUMNS))
+    if verbose:
+        for r in rows:
+            print(json.dumps(r, ensure_ascii=False, default=str))
+
+
+async def run(args) -> List[dict]:
+    from app.api.routes import face_terminal as ft
+    from app.db.session import async_session
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    rows = []
+    with FakeEskizServer(latency_ms=args.latency_ms, tls=args.tls, error_rate=args.error_rate,
+                         token_ttl_sec=args.token_ttl_sec, callback_ms=args.callback_ms) as srv:
+        await _point_gateway(srv.base_url, srv.ssl_context())
+        _tune_dispatcher(args)
+        if "direct" in scenarios:
+            rows.append(await _scenario_direct(srv, args))
+        db_scenarios = [s for s in scenarios if s != "direct"]
+        if not db_scenarios:
+            return rows
+
+        school_id = await _seed(args.n, args.id_base)
+        receiver = _CallbackReceiver() if args.callback_ms is not None else None
+        try:
+            if receiver is not None:
+                await receiver.__aenter__()
+            await ft.sms_dispatcher.start()
+            await ft.no_show_jobs.start()
+            for name in db_scenarios:
+                if name == "notify":
+                    rows.append(await _scenario_notify(srv, args, school_id))
+                elif name == "no_show":
+                    rows.append(await _scenario_no_show(srv, args))
+                elif name == "kill":
+                    rows.append(await _scenario_kill(srv, args, school_id))
+                else:
+                    raise SystemExit(f"noma'lum ssenariy: {name}")
+                # keyingi ssenariy toza outbox bilan
+                async with async_session() as db:
+                    from sqlalchemy import delete
+                    from app.models.sms_outbox import SmsOutbox
+                    await db.execute(delete(SmsOutbox).where(SmsOutbox.school_id == school_id))
+                    await db.commit()
+        finally:
+            await ft.no_show_jobs.stop()
+            await ft.sms_dispatcher.stop()
+            if receiver is not None:
+                await receiver.__aexit__(None, None, None)
+            if not args.keep:
+                async with async_session() as db:
+                    await _cleanup(db, school_id, args.id_base, drop_school=True)
+            from app.services.sms.gateway import sms_gateway
+            await sms_gateway.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SMS pipeline throughput benchmark (fake Eskiz)")
+    parser.add_argument("--scenarios", default="direct,notify,no_show,kill")
+    parser.add_argument("-n", type=int, default=2000, help="xabarlar (o'quvchilar) soni")
+    parser.add_argument("--concurrency", type=int, default=10, help="direct ssenariysi parallelligi")
+    parser.add_argument("--batch-size", type=int, default=100, help="dispatcher send-batch hajmi (1 — alohida)")
+    parser.add_argument("--rate", type=float, default=20.0, help="Eskiz so'rovlari/s (token bucket)")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="fake server javob kechikishi")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake server 500 ulushi")
+    parser.add_argument("--token-ttl-sec", type=float, default=0.0, help="fake token muddati (0 — cheksiz)")
+    parser.add_argument("--callback-ms", type=float, default=None, help="delivery report kechikishi (yo'q — o'chiq)")
+    parser.add_argument("--tls", action="store_true", help="fake server TLS bilan")
+    parser.add_argument("--kill-after", type=float, default=2.0, help="kill: worker necha soniyadan keyin o'ldiriladi")
+    parser.add_argument("--lease-sec", type=int, default=5, help="kill: worker'lar uchun SMS_OUTBOX_LEASE_SEC")
+    parser.add_argument("--timeout", type=float, default=300.0, help="har ssenariy uchun kutish chegarasi")
+    parser.add_argument("--id-base", type=int, default=800000, help="bench face_terminal_id boshlanishi")
+    parser.add_argument("--keep", action="store_true", help="bench ma'lumotlarini o'chirmaslik")
+    parser.add_argument("-v", "--verbose", action="store_true", help="to'liq natijalar (JSON)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--cafile", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(_worker(args.cafile))
+        return
+    _print(asyncio.run(run(args)), args.verbose)
+
+
+if __name__ == "__main__":
+    main()
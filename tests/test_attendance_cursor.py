@@ -0,0 +1,52 @@
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy.dialects import postgresql
+
+from app.api.routes import attendance as routes
+
+
+def test_cursor_round_trip_is_url_safe_without_padding():
+    token = routes._encode_cursor(SimpleNamespace(date=date(2025, 9, 15), id=123456))
+    assert "=" not in token and "/" not in token and "+" not in token
+    assert routes._decode_cursor(token) == (date(2025, 9, 15), 123456)
+
+
+@pytest.mark.parametrize("token", ["", "!!!", "bm90LWpzb24", "WyIyMDI1LTEzLTAxIiwxXQ", "WzFd"])
+def test_bad_cursor_is_400(token):
+    with pytest.raises(HTTPException) as e:
+        routes._decode_cursor(token)
+    assert e.value.status_code == 400
+
+
+def test_keyset_page_filters_by_row_value_and_fetches_one_extra():
+    seen = []
+
+    class Db:
+        async def execute(self, stmt):
+            seen.append(str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})))
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: []))
+
+    token = routes._encode_cursor(SimpleNamespace(date=date(2025, 9, 15), id=42))
+    resp = Response()
+    out = asyncio.run(routes._keyset_page(Db(), resp, [], limit=50, cursor=token, estimate=False))
+    assert out == [] and "X-Next-Cursor" not in resp.headers
+    sql = seen[0]
+    assert "(attendance.date, attendance.id) < ('2025-09-15', 42)" in sql
+    assert "ORDER BY attendance.date DESC, attendance.id DESC" in sql
+    assert "LIMIT 51" in sql and "OFFSET" not in sql
+
+
+def test_page_query_skips_person_joins_without_deprecated_noload(recwarn):
+    class Db:
+        async def execute(self, stmt):
+            seen.append(str(stmt.compile(dialect=postgresql.dialect())))
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: []))
+
+    seen = []
+    asyncio.run(routes._keyset_page(Db(), Response(), [], limit=10, cursor=None, estimate=False))
+    assert "JOIN students" not in seen[0] and "JOIN teachers" not in seen[0]
+    assert not [w for w in recwarn if "noload" in str(w.message)]
@@ -0,0 +1,70 @@
+import asyncio
+import csv
+import io
+import xml.etree.ElementTree as ET
+import zipfile
+from datetime import date, time
+
+import pytest
+
+from app.services import attendance_export as exp
+
+_NS = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+ROW = (1, date(2025, 9, 15), "student", 7, None, "Aliyev <Ali> & Co", 3, 1,
+       time(8, 12), None, 12, True, "late", "present")
+
+
+@pytest.fixture
+def parts(monkeypatch):
+    chunks = [[ROW] * 3, [ROW] * 2]
+
+    async def fake(conditions):
+        for part in chunks:
+            yield part
+
+    monkeypatch.setattr(exp, "_partitions", fake)
+    return chunks
+
+
+def _collect(gen):
+    async def go():
+        return [c async for c in gen]
+    return asyncio.run(go())
+
+
+def test_csv_has_bom_header_and_formatted_cells(parts):
+    body = b"".join(_collect(exp.csv_stream([]))).decode("utf-8")
+    assert body.startswith("﻿")
+    rows = list(csv.reader(io.StringIO(body.lstrip("﻿"))))
+    assert tuple(rows[0]) == exp.COLUMNS and len(rows) == 6
+    assert rows[1][1] == "2025-09-15" and rows[1][8] == "08:12" and rows[1][9] == ""
+
+
+def test_xlsx_is_a_valid_workbook_streamed_in_pieces(parts):
+    chunks = _collect(exp.xlsx_stream([]))
+    assert len(chunks) >= 2
+    zf = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert zf.testzip() is None
+    assert {"[Content_Types].xml", "_rels/.rels", "xl/workbook.xml",
+            "xl/_rels/workbook.xml.rels", "xl/worksheets/sheet1.xml"} <= set(zf.namelist())
+    for name in zf.namelist():
+        ET.fromstring(zf.read(name))           # har bir qism to'g'ri XML
+
+    rows = ET.fromstring(zf.read("xl/worksheets/sheet1.xml")).findall("m:sheetData/m:row", _NS)
+    assert len(rows) == 6
+    header = [c.findtext("m:is/m:t", namespaces=_NS) for c in rows[0]]
+    assert tuple(header) == exp.COLUMNS
+
+    cells = list(rows[1])
+    assert cells[0].findtext("m:v", namespaces=_NS) == "1"
+    assert cells[5].findtext("m:is/m:t", namespaces=_NS) == "Aliyev <Ali> & Co"
+    assert cells[8].findtext("m:is/m:t", namespaces=_NS) == "08:12"
+    assert cells[9].find("m:v", _NS) is None                      # None -> bo'sh katak
+    assert cells[11].get("t") == "b" and cells[11].findtext("m:v", namespaces=_NS) == "1"
+
+
+def test_xlsx_row_types():
+    xml = exp._xlsx_row([None, False, 2.5, "a&b"])
+    assert xml == ('<row><c/><c t="b"><v>0</v></c><c><v>2.5</v></c>'
+                   '<c t="inlineStr"><is><t>a&amp;b</t></is></c></row>')
@@ -0,0 +1,125 @@
+import asyncio
+from datetime import date, time
+from types import SimpleNamespace
+
+from app.crud import student as crud_student
+from app.services import attendance_summary
+
+
+def _row(**kw):
+    base = dict(is_present=True, arrival_time=time(8, 5), late_minutes=5, departure_time=None)
+    base.update(kw)
+    return SimpleNamespace(**base)
+
+
+def test_contrib_late_arrival():
+    assert attendance_summary.contrib(_row()) == {"present": 1, "late": 1, "left_count": 0, "late_minutes_sum": 5}
+
+
+def test_contrib_absent_row_counts_nothing_but_departure():
+    c = attendance_summary.contrib(_row(is_present=False, departure_time=time(15, 0)))
+    assert c == {"present": 0, "late": 0, "left_count": 1, "late_minutes_sum": 0}
+
+
+def test_contrib_on_time_has_no_late_minutes():
+    c = attendance_summary.contrib(_row(arrival_time=time(7, 50), late_minutes=0))
+    assert c["present"] == 1 and c["late"] == 0 and c["late_minutes_sum"] == 0
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+
+class _Db:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.calls = []
+
+    async def execute(self, stmt, params=None):
+        self.calls.append((str(stmt), params))
+        return _Result(self.rows)
+
+
+def test_month_view_absent_comes_from_roster():
+    # sinf 3 da hech kim kelmagan — yig'indi satri yo'q, lekin ro'yxatdan kutilgan
+    rows = [
+        SimpleNamespace(key=2, present=18, late=2, left_count=0, late_minutes_sum=12, expected=20, days=1),
+        SimpleNamespace(key=3, present=0, late=0, left_count=0, late_minutes_sum=0, expected=25, days=1),
+    ]
+    db = _Db(rows)
+    out = asyncio.run(attendance_summary.month_view(
+        db, school_id=1, date_from=date(2025, 9, 1), date_to=date(2025, 9, 30), group_by="class",
+    ))
+    assert [r["absent"] for r in out] == [2, 25]
+    assert out[0]["avg_late_minutes"] == 6.0 and out[1]["attendance_rate"] == 0.0
+    sql, _ = db.calls[0]
+    assert "FROM students st" in sql and "FULL JOIN facts" in sql
+
+
+def test_delete_student_forgets_summary_before_delete(monkeypatch):
+    order = []
+    student = SimpleNamespace(id=5, face_terminal_id=None)
+
+    class Db:
+        async def execute(self, stmt, params=None):
+            class R:
+                def scalar_one_or_none(self_inner):
+                    return student
+            return R()
+
+        async def delete(self, obj):
+            order.append("delete")
+
+        async def commit(self):
+            order.append("commit")
+
+    async def forget(db, student_id=None):
+        order.append(("forget", student_id))
+
+    monkeypatch.setattr(attendance_summary, "forget_students", forget)
+    monkeypatch.setattr(crud_student.face_identity, "invalidate", lambda *a: None)
+    monkeypatch.setattr(crud_student.face_names, "remove", lambda *a: None)
+    asyncio.run(crud_student.delete_student(Db(), 5))
+    assert order == [("forget", 5), "delete", "commit"]
+
+
+def _calls(coro_fn):
+    db = _Db()
+
+    async def execute(stmt, params=None):
+        db.calls.append((str(stmt), params))
+        return SimpleNamespace(rowcount=0, all=lambda: [])
+
+    db.execute = execute
+    asyncio.run(coro_fn(db))
+    return db.calls
+
+
+def test_school_rebuild_locks_each_day_before_touching_rows():
+    calls = _calls(lambda db: attendance_summary.rebuild(db, date(2025, 9, 1), date(2025, 9, 2), school_id=4))
+    locks = [(sql.split("(")[0].split()[-1], p["k"]) for sql, p in calls if "advisory" in sql]
+    assert locks == [
+        ("pg_advisory_xact_lock_shared", "attendance_summary:*:2025-09-01"),
+        ("pg_advisory_xact_lock", "attendance_summary:4:2025-09-01"),
+        ("pg_advisory_xact_lock_shared", "attendance_summary:*:2025-09-02"),
+        ("pg_advisory_xact_lock", "attendance_summary:4:2025-09-02"),
+    ]
+    assert all("advisory" in sql for sql, _ in calls[:4])
+    assert calls[4][0].lstrip().startswith("DELETE") and "INSERT INTO" in calls[5][0]
+
+
+def test_all_schools_rebuild_takes_the_day_lock_exclusively():
+    calls = _calls(lambda db: attendance_summary.rebuild(db, date(2025, 9, 1), date(2025, 9, 1)))
+    assert [p["k"] for sql, p in calls if "advisory" in sql] == ["attendance_summary:*:2025-09-01"]
+    assert "lock_shared" not in calls[0][0]
+
+
+def test_rebuild_insert_upserts_over_live_buckets():
+    sql = " ".join(attendance_summary._REBUILD_SQL.text.split())
+    assert "ON CONFLICT (school_id, class_id, date, user_type) DO UPDATE" in sql
+    for col in ("present", "late", "left_count", "late_minutes_sum", "expected"):
+        assert f"{col} = EXCLUDED.{col}" in sql
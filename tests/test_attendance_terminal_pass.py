@@ -0,0 +1,103 @@
+import asyncio
+from datetime import date, time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.crud import attendance as crud_attendance
+
+DAY = date(2025, 9, 15)
+
+
+class _Db:
+    """1-execute: upsert (RETURNING satri yoki None); 2-execute: skip yo'lidagi SELECT."""
+
+    def __init__(self, returning=None, existing=None):
+        self.results = [returning, existing]
+        self.sql = []
+        self.commits = 0
+
+    async def execute(self, stmt):
+        self.sql.append(str(stmt.compile(dialect=postgresql.dialect())))
+        row = self.results.pop(0)
+        return SimpleNamespace(first=lambda: row)
+
+    async def commit(self):
+        self.commits += 1
+
+
+@pytest.fixture
+def deltas(monkeypatch):
+    seen = []
+
+    async def apply_delta(db, **kw):
+        seen.append(kw["delta"])
+
+    monkeypatch.setattr(crud_attendance.attendance_summary, "apply_delta", apply_delta)
+    return seen
+
+
+def _pass(db, *, student=True, tm=time(8, 10)):
+    return asyncio.run(crud_attendance.record_terminal_pass(
+        db, student_id=5 if student else None, teacher_id=None if student else 6,
+        day=DAY, tm=tm, late_minutes=10, arrival_status="late", school_id=1,
+        user_type="student" if student else "teacher", block_minutes=4,
+    ))
+
+
+def _ret(**kw):
+    base = dict(inserted=False, school_id=1, is_present=True, arrival_time=time(8, 10),
+                late_minutes=10, departure_time=None)
+    base.update(kw)
+    return SimpleNamespace(**base)
+
+
+def test_upsert_statement_shape(deltas):
+    db = _Db(returning=_ret(inserted=True))
+    _pass(db)
+    sql = " ".join(db.sql[0].split())
+    assert "ON CONFLICT (student_id, date) WHERE student_id IS NOT NULL DO UPDATE" in sql
+    # WHERE or_(arrival_missing, can_leave)
+    where = sql.split("DO UPDATE SET", 1)[1].split(" WHERE ", 1)[1]
+    assert where.startswith("attendance.arrival_time IS NULL AND attendance.departure_time IS NULL OR ")
+    assert "excluded.arrival_time - attendance.arrival_time >=" in where
+    assert sql.endswith("(xmax = 0) AS inserted")
+
+
+def test_teacher_conflict_target(deltas):
+    db = _Db(returning=_ret(inserted=True))
+    _pass(db, student=False)
+    assert "ON CONFLICT (teacher_id, date) WHERE teacher_id IS NOT NULL" in db.sql[0]
+
+
+def test_inserted_row_is_arrived(deltas):
+    db = _Db(returning=_ret(inserted=True))
+    outcome, row, diff = _pass(db)
+    assert outcome == "arrived" and row is not None and diff is None
+    assert deltas == [{"present": 1, "late": 1, "left_count": 0, "late_minutes_sum": 10}]
+    assert db.commits == 1
+
+
+def test_filled_missing_arrival_is_arrival_fixed(deltas):
+    outcome, _, _ = _pass(_Db(returning=_ret()))
+    assert outcome == "arrival_fixed" and deltas[0]["present"] == 1
+
+
+@pytest.mark.parametrize("student", [True, False])
+def test_departure_after_block_is_departed(deltas, student):
+    outcome, row, _ = _pass(_Db(returning=_ret(departure_time=time(15, 0))), student=student, tm=time(15, 0))
+    assert outcome == "departed" and deltas == [{"left_count": 1}]
+
+
+def test_within_block_reports_minutes_without_writing(deltas):
+    db = _Db(existing=SimpleNamespace(arrival_time=time(8, 10), departure_time=None))
+    outcome, row, diff = _pass(db, tm=time(8, 12))
+    assert (outcome, row, diff) == ("block_minutes", None, 2)
+    assert deltas == [] and db.commits == 0
+
+
+def test_departure_already_set(deltas):
+    db = _Db(existing=SimpleNamespace(arrival_time=time(8, 10), departure_time=time(15, 0)))
+    assert _pass(db, tm=time(16, 0)) == ("already_set", None, None)
+    assert deltas == []
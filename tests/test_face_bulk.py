@@ -0,0 +1,89 @@
+import asyncio
+import json
+from datetime import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes import face_terminal
+from app.crud import attendance as crud_attendance
+
+
+class _FakeRequest:
+    def __init__(self, body: bytes, ctype: str = "application/json", chunk: int = 7, length: bool = False):
+        self.headers = {"content-type": ctype}
+        if length:
+            self.headers["content-length"] = str(len(body))
+        self._body = body
+        self._chunk = chunk
+
+    async def stream(self):
+        for i in range(0, len(self._body), self._chunk):
+            yield self._body[i:i + self._chunk]
+
+
+def _read(req):
+    return asyncio.run(face_terminal._read_bulk_items(req))
+
+
+def test_json_array():
+    body = json.dumps([{"a": 1}, {"b": 2}]).encode()
+    assert _read(_FakeRequest(body)) == [{"a": 1}, {"b": 2}]
+
+
+def test_ndjson_lines_split_across_chunks():
+    body = b'{"a": 1}\n\nnot json\n{"b": 2}'
+    items = _read(_FakeRequest(body, ctype="application/x-ndjson", chunk=3))
+    assert items == [{"a": 1}, None, {"b": 2}]
+
+
+def test_body_over_byte_cap_is_rejected_while_streaming(monkeypatch):
+    monkeypatch.setattr(face_terminal, "BULK_MAX_BYTES", 64)
+    body = json.dumps([{"x": i} for i in range(50)]).encode()
+    with pytest.raises(HTTPException) as e:
+        _read(_FakeRequest(body))
+    assert e.value.status_code == 413
+
+
+def test_declared_content_length_over_cap(monkeypatch):
+    monkeypatch.setattr(face_terminal, "BULK_MAX_BYTES", 10)
+    with pytest.raises(HTTPException) as e:
+        _read(_FakeRequest(b"[" + b" " * 20 + b"]", length=True))
+    assert e.value.status_code == 413
+
+
+def test_too_many_events(monkeypatch):
+    monkeypatch.setattr(face_terminal, "BULK_MAX_EVENTS", 2)
+    with pytest.raises(HTTPException) as e:
+        _read(_FakeRequest(b"{}\n{}\n{}\n", ctype="application/x-ndjson"))
+    assert e.value.status_code == 413
+
+
+def test_calc_late_uses_single_cutoff(monkeypatch):
+    monkeypatch.setattr(crud_attendance, "LATE_CUTOFF", time(8, 0))
+    assert crud_attendance._calc_late(time(7, 59)) == ("on_time", 0)
+    assert crud_attendance._calc_late(time(8, 0)) == ("on_time", 0)
+    assert crud_attendance._calc_late(time(8, 17, 40)) == ("late", 17)
+    assert crud_attendance._calc_late(time(9, 5)) == ("late", 65)
+
+
+def test_malformed_items_are_per_event_invalid(monkeypatch):
+    items = [
+        {"subEventType": None},                          # TypeError
+        {"AccessControllerEvent": ["not", "a", "dict"]},  # AttributeError
+        {"subEventType": "x"},                           # ValueError
+        {"subEventType": 75, "employeeNoString": "1"},   # dateTime yo'q -> 400
+        [1, 2],
+    ]
+
+    async def read_items(request):
+        return items
+
+    async def resolve_many(db, ids):
+        return {}
+
+    monkeypatch.setattr(face_terminal, "_read_bulk_items", read_items)
+    monkeypatch.setattr(face_terminal.face_identity, "resolve_many", resolve_many)
+    out = asyncio.run(face_terminal.receive_log_bulk(None, db=None))
+    outcomes = [r["outcome"] for r in out["results"]]
+    assert outcomes == ["invalid"] * 4 + ["invalid_json"]
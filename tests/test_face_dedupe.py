@@ -0,0 +1,53 @@
+import asyncio
+
+from app.services.face_dedupe import DedupeStore, MemoryDedupe
+
+
+def test_repeat_inside_window_is_duplicate():
+    d = MemoryDedupe(window_sec=4, max_keys=100)
+    assert d.seen("ali|7", now=1000.0) is False
+    assert d.seen("ali|7", now=1002.5) is True
+    assert d.seen("vali|8", now=1002.5) is False
+    assert d.hits == 1 and d.misses == 2
+
+
+def test_key_is_fresh_again_after_window():
+    d = MemoryDedupe(window_sec=4, max_keys=100)
+    assert d.seen("ali|7", now=1000.0) is False
+    assert d.seen("ali|7", now=1004.0) is False
+    # yangilangan belgi yana oyna ochadi
+    assert d.seen("ali|7", now=1006.0) is True
+
+
+def test_expired_slots_are_dropped():
+    d = MemoryDedupe(window_sec=4, max_keys=100)
+    for i in range(10):
+        d.seen(f"k{i}", now=1000.0)
+    assert d.stats()["keys"] == 10
+    d.seen("later", now=1100.0)
+    assert d.stats()["keys"] == 1
+    assert d.evictions == 10
+
+
+def test_max_keys_evicts_oldest_slot_first():
+    d = MemoryDedupe(window_sec=10, max_keys=3)
+    d.seen("a", now=1000.0)
+    d.seen("b", now=1001.0)
+    d.seen("c", now=1002.0)
+    d.seen("d", now=1003.0)
+    st = d.stats()
+    assert st["keys"] <= 3
+    assert st["forced_evictions"] >= 1
+    # eng eskisi tashlangan, yangilari hali takror
+    assert d.seen("a", now=1003.5) is False
+    assert d.seen("d", now=1003.5) is True
+
+
+def test_memory_backend_store():
+    store = DedupeStore(backend="memory")
+
+    async def run():
+        return [await store.seen("x"), await store.seen("x")]
+
+    assert asyncio.run(run()) == [False, True]
+    assert store.stats()["backend"] == "memory"
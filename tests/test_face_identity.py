@@ -0,0 +1,130 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.crud import student as crud_student
+from app.services import face_identity as fi
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(fi._time, "monotonic", lambda: now[0])
+    return now
+
+
+def _row(role="student", pid=1, face_id=101, school_id=7):
+    return SimpleNamespace(_mapping={
+        "role": role, "id": pid, "face_terminal_id": face_id, "school_id": school_id,
+        "first_name": "Ali", "last_name": None, "parent_father_e164": "+998901234567",
+        "parent_mother_e164": None,
+    })
+
+
+class _Db:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.queries = 0
+
+    async def execute(self, stmt):
+        self.queries += 1
+        rows = self.results.pop(0)
+        return SimpleNamespace(all=lambda: list(rows))
+
+
+def _resolve(cache, db, face_id):
+    return asyncio.run(cache.resolve(db, face_id))
+
+
+def test_hit_until_ttl_then_reload(clock):
+    cache = fi.FaceIdentityCache(ttl=60, negative_ttl=5)
+    db = _Db([_row()], [_row(school_id=8)])
+    p = _resolve(cache, db, 101)
+    assert (p.role, p.id, p.school_id, p.last_name) == ("student", 1, 7, "")
+    clock[0] += 59
+    assert _resolve(cache, db, 101) is p and db.queries == 1
+    clock[0] += 2
+    assert _resolve(cache, db, 101).school_id == 8 and db.queries == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_unknown_face_is_negative_cached_briefly(clock):
+    cache = fi.FaceIdentityCache(ttl=60, negative_ttl=5)
+    db = _Db([], [], [_row(face_id=999)])
+    assert _resolve(cache, db, 999) is None
+    clock[0] += 4
+    assert _resolve(cache, db, 999) is None and db.queries == 1      # salbiy hit
+    clock[0] += 2
+    assert _resolve(cache, db, 999) is None and db.queries == 2      # salbiy muddat tugadi
+    cache.invalidate(999)
+    assert _resolve(cache, db, 999).id == 1 and db.queries == 3
+
+
+def test_student_wins_over_teacher_with_same_face_id(clock):
+    cache = fi.FaceIdentityCache()
+    p = _resolve(cache, _Db([_row(role="teacher", pid=9), _row()]), 101)
+    assert p.role == "student"
+
+
+def test_lru_eviction(clock):
+    cache = fi.FaceIdentityCache(maxsize=2)
+    db = _Db([_row(face_id=1)], [_row(face_id=2)], [_row(face_id=3)])
+    for fid in (1, 2):
+        _resolve(cache, db, fid)
+    _resolve(cache, db, 1)               # 1 — eng so'nggi ishlatilgan
+    _resolve(cache, db, 3)
+    assert set(cache._data) == {1, 3} and cache.evictions == 1
+
+
+def test_resolve_many_queries_only_missing(clock):
+    cache = fi.FaceIdentityCache()
+    _resolve(cache, _Db([_row(face_id=1)]), 1)
+    db = _Db([_row(face_id=2, pid=2)])
+    out = asyncio.run(cache.resolve_many(db, [1, 2, 3, 3]))
+    assert out[1].id == 1 and out[2].id == 2 and out[3] is None and db.queries == 1
+
+
+class _StudentDb:
+    def __init__(self, student):
+        self.student = student
+        self.calls = 0
+
+    async def execute(self, stmt, params=None):
+        self.calls += 1
+        found = self.student if self.calls == 1 else None
+        return SimpleNamespace(scalar_one_or_none=lambda: found)
+
+    async def delete(self, obj):
+        pass
+
+    async def commit(self):
+        pass
+
+
+@pytest.fixture
+def cached(monkeypatch, clock):
+    cache = fi.FaceIdentityCache()
+    for fid in (101, 202):
+        cache._put(fid, fi.FacePerson(role="student", id=1, school_id=7))
+    monkeypatch.setattr(crud_student, "face_identity", cache)
+    monkeypatch.setattr(crud_student.face_names, "put", lambda *a: None)
+    monkeypatch.setattr(crud_student.face_names, "remove", lambda *a: None)
+    return cache
+
+
+def test_update_student_invalidates_old_and_new_face_id(cached):
+    student = SimpleNamespace(id=1, school_id=7, face_terminal_id=101, first_name="Ali", last_name="Valiyev",
+                              parent_father_phone=None, parent_mother_phone=None)
+    data = SimpleNamespace(model_dump=lambda exclude_unset: {"face_terminal_id": 202})
+    asyncio.run(crud_student.update_student(_StudentDb(student), 1, data))
+    assert 101 not in cached._data and 202 not in cached._data
+
+
+def test_delete_student_invalidates_face_id(cached, monkeypatch):
+    async def forget(db, student_id=None):
+        pass
+
+    monkeypatch.setattr(crud_student.attendance_summary, "forget_students", forget)
+    asyncio.run(crud_student.delete_student(_StudentDb(SimpleNamespace(id=1, face_terminal_id=101)), 1))
+    assert 101 not in cached._data and 202 in cached._data
@@ -0,0 +1,100 @@
+import asyncio
+
+from app.services.face_ingest import IngestQueue
+
+
+def test_offer_rejects_when_not_running():
+    async def apply(batch):
+        pass
+
+    q = IngestQueue(apply)
+    assert q.offer(1) is False and q.rejected == 0
+
+
+def test_full_queue_rejects_until_writer_drains():
+    batches = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def apply(batch):
+            await release.wait()
+            batches.append(list(batch))
+
+        q = IngestQueue(apply, maxsize=3, batch_max=1, flush_ms=1)
+        await q.start()
+        assert q.offer("a")
+        await asyncio.sleep(0.01)                 # writer "a" ni olib, apply'da kutmoqda
+        assert all(q.offer(x) for x in "bcd")
+        assert q.offer("e") is False               # navbat to'la -> route 503 beradi
+        release.set()
+        await q.stop(timeout=1)
+        return q
+
+    q = asyncio.run(run())
+    assert batches == [["a"], ["b"], ["c"], ["d"]]
+    s = q.stats()
+    assert (s["enqueued"], s["rejected"], s["applied"], s["batches"]) == (4, 1, 4, 4)
+    assert not s["running"]
+
+
+def test_batch_size_caps_a_burst():
+    batches = []
+
+    async def run():
+        async def apply(batch):
+            batches.append(len(batch))
+
+        q = IngestQueue(apply, maxsize=100, batch_max=4, flush_ms=200)
+        await q.start()
+        for i in range(10):
+            assert q.offer(i)
+        await q.stop(timeout=2)
+        return q
+
+    q = asyncio.run(run())
+    assert batches == [4, 4, 2]
+    assert q.stats()["max_batch_size"] == 4 and q.stats()["avg_batch_size"] == round(10 / 3, 2)
+
+
+def test_linger_flushes_a_partial_batch():
+    flushed = []
+
+    async def run():
+        async def apply(batch):
+            flushed.append(list(batch))
+
+        q = IngestQueue(apply, batch_max=100, flush_ms=30)
+        await q.start()
+        q.offer(1)
+        await asyncio.sleep(0.01)
+        q.offer(2)                               # linger oynasi ichida — bitta batch
+        await asyncio.sleep(0.1)
+        assert flushed == [[1, 2]]               # batch_max ga yetmasa ham flush_ms dan keyin
+        q.offer(3)
+        await asyncio.sleep(0.1)
+        await q.stop(timeout=1)
+
+    asyncio.run(run())
+    assert flushed == [[1, 2], [3]]
+
+
+def test_failed_batch_is_counted_and_writer_keeps_going():
+    seen = []
+
+    async def run():
+        async def apply(batch):
+            seen.append(list(batch))
+            if batch == ["bad"]:
+                raise RuntimeError("db down")
+
+        q = IngestQueue(apply, batch_max=1, flush_ms=1)
+        await q.start()
+        q.offer("bad")
+        q.offer("ok")
+        await q.stop(timeout=1)
+        return q
+
+    q = asyncio.run(run())
+    assert seen == [["bad"], ["ok"]]
+    assert q.failed_batches == 1 and q.applied == 1 and q.batches == 2
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import time
+
+from app.services.face_journal import FaceJournal, encode_record, iter_segment, record_body
+
+
+def _segments(path):
+    return sorted(os.path.join(path, n) for n in os.listdir(path) if n.endswith(".ndjson.gz"))
+
+
+def test_encode_record_roundtrip_text_and_binary():
+    import json
+    rec = json.loads(encode_record(b'{"a": 1}', content_type="application/json", ip="1.2.3.4"))
+    assert rec["body"] == '{"a": 1}' and rec["content_length"] == 8
+    assert record_body(rec) == b'{"a": 1}'
+    raw = b"\xff\xd8\xff"
+    rec = json.loads(encode_record(raw))
+    assert "body_b64" in rec and record_body(rec) == raw
+
+
+def test_stop_flushes_queue_and_compresses_segment(tmp_path):
+    async def run():
+        j = FaceJournal(str(tmp_path), fsync_ms=50)
+        await j.start()
+        for i in range(20):
+            assert j.append(f'{{"n": {i}}}'.encode())
+        await j.stop()
+        return j
+
+    j = asyncio.run(run())
+    assert not j.running and j.written == 20
+    segs = _segments(tmp_path)
+    assert len(segs) == 1
+    assert [record_body(r) for r in iter_segment(segs[0])][-1] == b'{"n": 19}'
+
+
+def test_stop_timeout_waits_for_write_in_thread(tmp_path):
+    events = []
+
+    class SlowJournal(FaceJournal):
+        def _write_batch(self, lines):
+            events.append("write-start")
+            time.sleep(0.3)
+            super()._write_batch(lines)
+            events.append("write-end")
+
+        def _close_segment(self):
+            events.append("close")
+            super()._close_segment()
+
+    async def run():
+        j = SlowJournal(str(tmp_path), fsync_ms=50)
+        await j.start()
+        j.append(b'{"slow": true}')
+        await asyncio.sleep(0.05)
+        await j.stop(timeout=0.05)
+
+    asyncio.run(run())
+    assert events[:3] == ["write-start", "write-end", "close"]
+    assert len(_segments(tmp_path)) == 1
+
+
+def test_stop_timeout_waits_for_idle_tick_in_thread(tmp_path):
+    events = []
+
+    class SlowIdleJournal(FaceJournal):
+        def _idle_tick(self):
+            if "idle-start" in events:
+                return
+            events.append("idle-start")
+            time.sleep(0.3)
+            super()._idle_tick()
+            events.append("idle-end")
+
+        def _close_segment(self):
+            events.append("close")
+            super()._close_segment()
+
+    async def run():
+        j = SlowIdleJournal(str(tmp_path), fsync_ms=50)
+        await j.start()
+        j.append(b'{"n": 1}')
+        await asyncio.sleep(0.15)          # yozildi, writer jim — idle tick thread'da
+        await j.stop(timeout=0.05)
+        return j
+
+    j = asyncio.run(run())
+    assert events[:3] == ["idle-start", "idle-end", "close"]
+    assert j._inflight is None and j.written == 1
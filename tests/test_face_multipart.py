@@ -0,0 +1,77 @@
+import asyncio
+
+from app.services import face_multipart
+from app.services.face_multipart import JSON_FIELDS, MultipartParser, _PartCollector
+
+BOUNDARY = "XyZb0undary"
+CTYPE = f"multipart/form-data; boundary={BOUNDARY}"
+
+
+def _part(name: str, body: bytes, *, filename: str = None, ctype: str = None) -> bytes:
+    disp = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+    head = f"--{BOUNDARY}\r\nContent-Disposition: {disp}\r\n"
+    if ctype:
+        head += f"Content-Type: {ctype}\r\n"
+    return head.encode() + b"\r\n" + body + b"\r\n"
+
+
+def _body(*parts: bytes) -> bytes:
+    return b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+
+
+def _extract(body: bytes, fields=JSON_FIELDS, chunk: int = 5):
+    async def chunks():
+        for i in range(0, len(body), chunk):
+            yield body[i:i + chunk]
+
+    return asyncio.run(face_multipart.extract_event_bytes(chunks(), CTYPE, fields))
+
+
+def _collect(body: bytes, fields=JSON_FIELDS, keep_images: bool = False) -> _PartCollector:
+    collector = _PartCollector(fields, keep_images=keep_images)
+    parser = MultipartParser(BOUNDARY.encode(), collector.callbacks())
+    parser.write(body)
+    parser.finalize()
+    return collector
+
+
+EVENT = b'{"AccessControllerEvent": {"subEventType": 75, "employeeNoString": "12"}}'
+JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 200
+
+
+def test_json_field_only():
+    assert _extract(_body(_part("AccessControllerEvent", EVENT))) == EVENT
+
+
+def test_json_field_sent_with_filename_is_not_an_image():
+    body = _body(
+        _part("AccessControllerEvent", EVENT, filename="event.json", ctype="application/json"),
+        _part("Picture", JPEG, filename="pic.jpg", ctype="image/jpeg"),
+    )
+    assert _extract(body) == EVENT
+    assert _extract(body, fields=("AccessControllerEvent", "json", "payload")) == EVENT
+
+
+def test_event_log_preferred_even_when_it_comes_second():
+    log = b'{"event_log": 1}'
+    body = _body(_part("AccessControllerEvent", EVENT), _part("event_log", log))
+    assert _extract(body) == log
+
+
+def test_stops_only_after_highest_priority_field():
+    c = _collect(_body(_part("AccessControllerEvent", EVENT)))
+    assert c.done is False
+    c = _collect(_body(_part("event_log", EVENT)))
+    assert c.done is True
+
+
+def test_images_collected_only_when_kept():
+    body = _body(_part("Picture", JPEG, filename="pic.jpg", ctype="image/jpeg"), _part("json", EVENT))
+    assert _collect(body).images == []
+    kept = _collect(body, keep_images=True)
+    assert kept.images == [JPEG]
+    assert kept.event_bytes() == EVENT
+
+
+def test_missing_json_returns_none():
+    assert _extract(_body(_part("other", b"x"))) is None
@@ -0,0 +1,73 @@
+import asyncio
+import importlib.util
+import pathlib
+
+import pytest
+
+from app.services.face_names import FaceNameIndex, name_key, name_tokens
+
+_MIGRATION = pathlib.Path(__file__).resolve().parents[1] / "app/db/migrations/versions/c5d2e8f91a37_person_name_key.py"
+
+
+@pytest.mark.parametrize("a, b", [
+    ("Ali Valiyev", "Валиев Али"),
+    ("Xo'jayev Shohruh", "Хўжаев Шоҳрух"),
+    ("G‘ulomov Qodir", "Gulomov Kodir"),
+    ("Abdullayev  Jasur", "abdulayev jasur"),
+])
+def test_spellings_share_a_key(a, b):
+    assert name_key(a) == name_key(b)
+
+
+def test_tokens_sorted_and_empty():
+    assert name_key("Vali", "Ali") == "ali vali"
+    assert name_tokens("O'g'il") == ("ogil",)
+    assert name_key(None, "  ", "'") is None
+
+
+def test_migration_keeps_a_frozen_copy():
+    spec = importlib.util.spec_from_file_location("mig_c5d2", _MIGRATION)
+    src = _MIGRATION.read_text(encoding="utf-8")
+    assert "from app" not in src and "import app" not in src
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    for parts in [("Ali", "Valiyev"), ("Шоҳрух", "Хўжаев"), ("", None)]:
+        assert mod._name_key(*parts) == name_key(*parts)
+
+
+def test_index_put_remove_and_pick():
+    idx = FaceNameIndex()
+    idx.put("student", 1, 10, "Ali", "Valiyev")
+    idx.put("teacher", 2, 10, "Ali", "Valiyev")
+    assert idx._pick(idx._by_school[10][name_key("Ali Valiyev")]) == (("student", 1), False)
+    idx.put("student", 3, 10, "Ali", "Valiyev")
+    assert idx._pick(idx._by_school[10][name_key("Ali Valiyev")]) == (None, True)
+    # qayta put — eski kalitlar olib tashlanadi
+    idx.put("student", 3, 10, "Vali", "Aliyev")
+    assert ("student", 3) not in idx._all[name_key("Ali Valiyev")]
+    idx.remove("student", 1)
+    idx.remove("student", 3)
+    idx.remove("teacher", 2)
+    assert idx.stats()["keys"] == 0 and idx.stats()["people"] == 0
+
+
+def test_stale_index_refreshes_in_background_once(monkeypatch):
+    idx = FaceNameIndex(refresh_sec=0)
+    calls = []
+
+    async def fake_refresh():
+        calls.append("refresh")
+        await asyncio.sleep(0.01)
+
+    async def run():
+        idx.put("student", 1, None, "Ali", "Valiyev")
+        idx._loaded_at = 0.0           # yuklangan, lekin eskirgan
+        monkeypatch.setattr(idx, "_refresh", fake_refresh)
+        monkeypatch.setattr(idx, "_fuzzy", None)
+        results = await asyncio.gather(*(idx.lookup(None, "Ali Valiyev") for _ in range(20)))
+        await idx._task
+        return results
+
+    results = asyncio.run(run())
+    assert all(r == (("student", 1), False) for r in results)
+    assert calls == ["refresh"]
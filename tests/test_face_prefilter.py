@@ -0,0 +1,44 @@
+from app.services import face_prefilter
+from app.services.face_prefilter import prefilter
+
+
+def test_heartbeat_event_type_is_skipped():
+    assert prefilter(b'{"eventType": "heartBeat", "dateTime": "x"}') == "eventType=heartBeat"
+
+
+def test_other_sub_event_is_skipped():
+    body = b'{"eventType":"AccessControllerEvent","AccessControllerEvent":{"subEventType": 21}}'
+    assert prefilter(body) == "subEventType=21"
+
+
+def test_face_pass_needs_full_parse():
+    body = b'{"eventType":"AccessControllerEvent","AccessControllerEvent":{"subEventType":75}}'
+    assert prefilter(body) is None
+
+
+def test_unknown_shapes_fall_through():
+    assert prefilter(b"") is None
+    assert prefilter(b'{"AccessControllerEvent": {"name": "Ali"}}') is None
+    # marker bor, lekin qiymat raqam emas — shubha: to'liq parse
+    assert prefilter(b'{"subEventType": "75"}') is None
+
+
+def test_event_type_filter_can_be_disabled():
+    assert prefilter(b'{"eventType": "heartBeat"}', event_types=None) is None
+
+
+def test_markers_beyond_scan_window_are_ignored(monkeypatch):
+    monkeypatch.setattr(face_prefilter, "SCAN_BYTES", 32)
+    body = b'{"pad": "' + b"x" * 64 + b'", "subEventType": 21}'
+    assert prefilter(body) is None
+
+
+def test_skip_counters():
+    face_prefilter.skip_counts.clear()
+    prefilter(b'{"subEventType": 21}')
+    prefilter(b'{"subEventType": 21}')
+    face_prefilter.record_parsed_skip("employeeNoString missing")
+    assert face_prefilter.stats() == {
+        "prefilter": {"subEventType=21": 2},
+        "parsed": {"employeeNoString missing": 1},
+    }
@@ -0,0 +1,51 @@
+import asyncio
+
+from app.services.face_telemetry import FaceTelemetry, Histogram
+
+
+def test_histogram_buckets_and_quantiles():
+    h = Histogram(buckets=(10, 100))
+    for v in (1, 5, 50, 500):
+        h.observe(v)
+    assert h.counts == [2, 1, 1]
+    assert h.quantile(0.5) == 10.0
+    assert h.quantile(0.99) == float("inf")
+
+
+def test_queued_request_is_counted_once():
+    t = FaceTelemetry()
+
+    async def request():
+        return {"ok": True, "queued": True}
+
+    async def run():
+        for _ in range(3):
+            await t.observe("dev1", request())
+
+    asyncio.run(run())
+    # navbat writer'i (observe kontekstidan tashqarida)
+    for outcome in ("arrived", "arrived", "departed"):
+        t.applied("dev1", outcome)
+
+    dev = t.devices["dev1"]
+    assert sum(dev.outcomes.values()) == dev.latency.n == 3
+    assert dev.outcomes == {"queued": 3}
+    assert dev.events == {"inserted": 2, "departed": 1}
+
+    text = t.prometheus()
+    assert 'face_terminal_requests_total{device="dev1",outcome="queued"} 3' in text
+    assert 'face_terminal_events_total{device="dev1",outcome="inserted"} 2' in text
+    assert 'face_terminal_requests_total{device="dev1",outcome="inserted"}' not in text
+
+
+def test_sync_mode_outcome_is_the_request_outcome():
+    t = FaceTelemetry()
+
+    async def request():
+        t.applied("dev1", "arrived")
+        return {"ok": True}
+
+    asyncio.run(t.observe("dev1", request()))
+    dev = t.devices["dev1"]
+    assert dev.outcomes == {"inserted": 1}
+    assert not dev.events
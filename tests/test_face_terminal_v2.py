@@ -0,0 +1,79 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes import face_terminalV2 as v2
+from app.services.face_telemetry import FaceTelemetry
+
+
+def _request(evt: dict):
+    body = json.dumps({"AccessControllerEvent": evt}).encode()
+
+    async def read_body():
+        return body
+
+    return SimpleNamespace(headers={"content-type": "application/json"}, query_params={}, body=read_body)
+
+
+@pytest.fixture
+def unknown_face(monkeypatch):
+    async def resolve(db, face_id):
+        return None
+
+    monkeypatch.setattr(v2.face_identity, "resolve", resolve)
+
+
+def _evt(**kw):
+    evt = {"subEventType": 75, "employeeNoString": "99999", "dateTime": "2025-09-15T08:10:00+05:00"}
+    evt.update(kw)
+    return evt
+
+
+def test_unknown_employee_without_name_is_404_and_counted(unknown_face, monkeypatch):
+    tel = FaceTelemetry()
+    monkeypatch.setattr(v2, "face_telemetry", tel)
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(tel.observe("dev", v2._receive_log(_request(_evt()), None, "dev")))
+    assert e.value.status_code == 404
+    assert tel.devices["dev"].outcomes["unknown_user"] == 1
+
+
+def test_stale_name_index_entry_is_404_and_dropped(unknown_face, monkeypatch):
+    removed = []
+
+    async def lookup(db, name, school_id=None):
+        return ("student", 9), False
+
+    class Db:
+        async def get(self, model, pk):
+            return None          # odam o'chirilgan, indeks hali eslab turibdi
+
+    monkeypatch.setattr(v2.face_names, "lookup", lookup)
+    monkeypatch.setattr(v2.face_names, "remove", lambda role, pid: removed.append((role, pid)))
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(v2._receive_log(_request(_evt(name="Ali Valiyev")), Db(), "dev"))
+    assert e.value.status_code == 404 and removed == [("student", 9)]
+
+
+def test_late_and_block_match_the_log_route(monkeypatch):
+    from app.api.routes import face_terminal
+
+    seen = {}
+    person = SimpleNamespace(id=3, role="student", school_id=1, first_name="Ali", last_name="Valiyev")
+
+    async def resolve(db, face_id):
+        return person
+
+    async def record(db, **kw):
+        seen.update(kw)
+        return "block_minutes", None, 0
+
+    monkeypatch.setattr(v2.face_identity, "resolve", resolve)
+    monkeypatch.setattr(v2.crud_attendance, "record_terminal_pass", record)
+    asyncio.run(v2._receive_log(_request(_evt(dateTime="2025-09-15T08:17:00+05:00")), None, "dev"))
+    tm = seen["tm"]
+    assert (seen["arrival_status"], seen["late_minutes"]) == v2.crud_attendance._calc_late(tm)
+    assert seen["block_minutes"] == face_terminal.BLOCK_MINUTES == v2.crud_attendance.BLOCK_MINUTES
@@ -0,0 +1,129 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.sms import breaker as br
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(br.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _breaker(**kw):
+    opts = dict(window_sec=60, window_calls=10, min_calls=4, error_rate=0.5, slow_sec=5,
+                slow_rate=0.5, open_sec=30, open_max_sec=100, probes=2)
+    opts.update(kw)
+    return br.CircuitBreaker(**opts)
+
+
+def test_opens_on_error_rate_only_after_min_calls(clock):
+    b = _breaker()
+    for _ in range(3):
+        b.record(True, 0.1)
+    assert b.state == br.CLOSED          # min_calls gacha qaror yo'q
+    b.record(False, 0.1)
+    assert b.state == br.OPEN and b.opened == 1
+    assert not b.allow() and b.rejected == 1
+    assert b.retry_in() == 30
+
+
+def test_opens_on_slow_rate(clock):
+    b = _breaker()
+    for _ in range(2):
+        b.record(False, 0.1)
+    for _ in range(2):
+        b.record(False, 6.0)
+    assert b.state == br.OPEN
+
+
+def test_old_calls_fall_out_of_the_window(clock):
+    b = _breaker()
+    for _ in range(3):
+        b.record(True, 0.1)
+    clock[0] += 61
+    b.record(True, 0.1)
+    assert b.state == br.CLOSED and b.stats()["window_calls"] == 1
+
+
+def test_half_open_limits_probes_and_closes_after_successes(clock):
+    b = _breaker()
+    for _ in range(4):
+        b.record(True, 0.1)
+    clock[0] += 30
+    assert b.ready()
+    assert b.allow() and b.allow()
+    assert b.state == br.HALF_OPEN
+    assert not b.allow() and not b.ready()     # faqat 2 ta sinov
+    b.record(False, 0.1)
+    assert b.state == br.HALF_OPEN
+    b.record(False, 0.1)
+    assert b.state == br.CLOSED and b.retry_in() == 0
+
+
+def test_failed_probe_reopens_with_doubled_backoff_capped(clock):
+    b = _breaker()
+    for _ in range(4):
+        b.record(True, 0.1)
+    for expected in (60, 100, 100):
+        clock[0] += b.retry_in()
+        assert b.allow()
+        b.record(True, 0.1)
+        assert b.state == br.OPEN and b.retry_in() == expected
+
+
+def test_release_frees_probe_slot(clock):
+    b = _breaker(probes=1)
+    for _ in range(4):
+        b.record(True, 0.1)
+    clock[0] += 30
+    assert b.allow() and not b.allow()
+    b.release()
+    assert b.allow()
+
+
+def test_late_result_while_open_is_ignored(clock):
+    b = _breaker()
+    for _ in range(4):
+        b.record(True, 0.1)
+    b.record(False, 0.1)
+    assert b.state == br.OPEN and b.stats()["window_calls"] == 0
+
+
+def test_latency_timeout_static_until_enough_samples():
+    t = br.LatencyTracker(max_sec=10, min_sec=2, factor=3, min_samples=5)
+    assert t.timeout() == 10
+    for _ in range(5):
+        t.add(0.1)
+    assert t.timeout() == 2                     # pastki chegara
+    for _ in range(100):
+        t.add(1.0)
+    assert t.timeout() == 3.0
+    for _ in range(500):
+        t.add(9.0)
+    assert t.timeout() == 10                    # yuqori chegara
+
+
+def test_transport_rejects_when_open_without_calling_inner(clock):
+    calls = []
+
+    class Inner(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request):
+            calls.append(request)
+            return httpx.Response(503)
+
+    b = _breaker()
+    tr = br.BreakerTransport(Inner(), b, br.LatencyTracker(max_sec=10, min_samples=1))
+
+    async def go():
+        async with httpx.AsyncClient(transport=tr, base_url="http://eskiz") as c:
+            for _ in range(4):
+                assert (await c.get("/x")).status_code == 503
+            with pytest.raises(br.CircuitOpenError):
+                await c.get("/x")
+
+    asyncio.run(go())
+    assert len(calls) == 4 and b.state == br.OPEN
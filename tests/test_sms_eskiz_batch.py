@@ -0,0 +1,26 @@
+from app.services.sms.eskiz import _batch_item_results
+
+IDS = ["ob-1", "ob-2"]
+
+
+def test_status_array_in_message_order():
+    out = _batch_item_results({"id": "b9", "status": ["waiting", "rejected"]}, IDS)
+    assert out["ob-1"] == {"ok": True, "id": "b9", "error": None}
+    assert out["ob-2"]["ok"] is False and out["ob-2"]["error"] == "batch status=rejected"
+
+
+def test_per_message_list():
+    data = {"messages": [
+        {"user_sms_id": "ob-2", "message_id": 55, "status": "accepted"},
+        {"user_sms_id": "other", "status": "accepted"},
+    ]}
+    out = _batch_item_results(data, IDS)
+    # ob-1 javobda yo'q — chaqiruvchi alohida yuboradi
+    assert out == {"ob-2": {"ok": True, "id": "55", "error": None}}
+
+
+def test_unparseable_response_is_unknown():
+    assert _batch_item_results({}, IDS) == {}
+    assert _batch_item_results({"id": "b9", "message": "ok"}, IDS) == {}
+    assert _batch_item_results({"id": "b9", "status": ["waiting"]}, IDS) == {}
+    assert _batch_item_results({"status": "waiting"}, IDS) == {}
@@ -0,0 +1,46 @@
+import asyncio
+
+from app.services.sms.jobs import LeaseLost, NoShowJobs
+
+
+def _jobs(chunks):
+    """chunks: _chunk natijalari ketma-ketligi (tuple yoki Exception)."""
+    j = NoShowJobs(lambda s: "msg")
+    calls = {"leases": [], "errors": []}
+
+    async def claim():
+        return (7, "lease-0")
+
+    async def chunk(job_id, lease):
+        calls["leases"].append(lease)
+        r = chunks.pop(0)
+        if isinstance(r, Exception):
+            raise r
+        return r
+
+    async def note_error(job_id, lease, error):
+        calls["errors"].append((job_id, lease, error))
+
+    j._claim, j._chunk, j._note_error = claim, chunk, note_error
+    return j, calls
+
+
+def test_lease_token_is_threaded_through_chunks():
+    j, calls = _jobs([(False, "lease-1"), (False, "lease-2"), (True, None)])
+    assert asyncio.run(j.run_once()) is True
+    assert calls["leases"] == ["lease-0", "lease-1", "lease-2"]
+    assert j.jobs_done == 1 and not calls["errors"]
+
+
+def test_lost_lease_stops_without_recording_an_error():
+    j, calls = _jobs([(False, "lease-1"), LeaseLost(7)])
+    asyncio.run(j.run_once())
+    assert j.leases_lost == 1 and j.jobs_done == 0
+    assert calls["errors"] == []
+
+
+def test_error_is_recorded_with_current_lease():
+    j, calls = _jobs([(False, "lease-1"), RuntimeError("db down")])
+    asyncio.run(j.run_once())
+    assert calls["errors"] == [(7, "lease-1", "db down")]
+
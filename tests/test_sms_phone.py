@@ -0,0 +1,42 @@
+import importlib.util
+import pathlib
+
+import pytest
+
+from app.services.sms.phone import eskiz_phone, msisdn, normalize_uz_phone
+
+_MIGRATION = pathlib.Path(__file__).resolve().parents[1] / "app/db/migrations/versions/c7f05e2a9d48_student_parent_e164.py"
+
+CASES = [
+    ("+998 (90) 123-45-67", "+998901234567"),
+    ("998901234567", "+998901234567"),
+    ("00998901234567", "+998901234567"),
+    ("901234567", "+998901234567"),
+    ("0901234567", "+998901234567"),
+    ("90 123 45 6", None),             # qisqa
+    ("+7 912 345 67 89", None),        # boshqa davlat
+    ("9989012345678", None),           # uzun
+    ("", None),
+    (None, None),
+]
+
+
+@pytest.mark.parametrize("raw, expected", CASES)
+def test_normalize(raw, expected):
+    assert normalize_uz_phone(raw) == expected
+
+
+def test_eskiz_format():
+    assert eskiz_phone("90 123 45 67") == "998901234567"
+    assert msisdn("+998901234567") == "998901234567"
+    assert msisdn(None) is None and eskiz_phone("x") is None
+
+
+def test_migration_keeps_a_frozen_copy():
+    src = _MIGRATION.read_text(encoding="utf-8")
+    assert "from app" not in src and "import app" not in src
+    spec = importlib.util.spec_from_file_location("mig_c7f0", _MIGRATION)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    for raw, expected in CASES:
+        assert mod._normalize_uz_phone(raw) == expected